@@ -0,0 +1,172 @@
+# backend/benchmarks/bench_llm.py
+
+"""
+Benchmark des pipelines LLM (histoire Story Bot, labyrinthe famille) :
+latence p50 / p95 / p99, débit et taux d'erreur.
+
+Par défaut, démarre le faux serveur Ollama (benchmarks/fake_ollama.py)
+dans le même processus. Avec --ollama-url, vise un serveur déjà lancé
+(vrai Ollama ou fake_ollama dans un autre processus, plus fidèle).
+
+Lancement (depuis backend/) :
+    python -m benchmarks.bench_llm --target story --requests 50 --concurrency 8
+    python -m benchmarks.bench_llm --target labyrinth --error-rate 0.1 --malformed-rate 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+THEMES = ["l'amitié", "l'école", "la plage", "le souk", "la famille", "le courage"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_load(
+    job: Callable[[int], Awaitable[object]], requests: int, concurrency: int
+) -> Dict:
+    """
+    Lance `requests` appels de `job` avec au plus `concurrency` en parallèle.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            try:
+                await job(i)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "ok": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "elapsed": elapsed,
+    }
+
+
+def print_report(name: str, report: Dict):
+    print(
+        f"{name:<22} ok={report['ok']:<4} err={report['errors']:<4} "
+        f"p50={report['p50']:.2f}s p95={report['p95']:.2f}s p99={report['p99']:.2f}s "
+        f"débit={report['throughput']:.2f} req/s ({report['elapsed']:.1f}s)"
+    )
+
+
+async def start_fake_server(port: int, args):
+    import uvicorn
+    from benchmarks import fake_ollama
+
+    fake_ollama.configure(
+        tokens_per_second=args.tokens_per_second,
+        ttft=args.ttft,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        ramble_rate=args.ramble_rate,
+        replay=args.replay,
+        seed=args.seed,
+    )
+    server = uvicorn.Server(
+        uvicorn.Config(fake_ollama.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def main_async(args):
+    fake = None
+    if args.ollama_url:
+        os.environ["OLLAMA_URL"] = args.ollama_url
+    else:
+        os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{args.port}"
+        fake = await start_fake_server(args.port, args)
+
+    # les traductions du benchmark ne doivent pas enrichir la vraie mémoire
+    os.environ.setdefault("TM_LEARNED_PATH", os.devnull)
+    # on mesure Ollama, pas le cache disque (LLM_CACHE_ENABLED=1 pour le mesurer)
+    os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+
+    # import après la config : llm_gateway lit OLLAMA_URL à l'import
+    import llm_gateway
+    from family_llm_service import generate_labyrinth_with_llm
+    from story_bot.service import generate_story_with_llm
+
+    rng = random.Random(args.seed)
+
+    async def story_job(i: int):
+        await generate_story_with_llm(rng.choice(THEMES), rng.choice((1, 2)), args.mode)
+
+    async def labyrinth_job(i: int):
+        await generate_labyrinth_with_llm(rng.choice((1, 2, 3)))
+
+    try:
+        if args.target in ("story", "all"):
+            report = await run_load(story_job, args.requests, args.concurrency)
+            print_report(f"story ({args.mode})", report)
+        if args.target in ("labyrinth", "all"):
+            report = await run_load(labyrinth_job, args.requests, args.concurrency)
+            print_report("labyrinth", report)
+        for call_type, totals in llm_gateway.PROMPT_STATS.stats().items():
+            print(
+                f"prompt {call_type:<15} appels={totals['calls']:<4} "
+                f"tokens évalués/appel={totals['avg_prompt_eval_count']:.0f}"
+            )
+    finally:
+        await llm_gateway.close_client()
+        if fake is not None:
+            server, task = fake
+            server.should_exit = True
+            await task
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des pipelines LLM")
+    parser.add_argument("--target", choices=("story", "labyrinth", "all"), default="all")
+    parser.add_argument(
+        "--mode",
+        choices=("sequential", "pipeline", "single"),
+        default="sequential",
+        help="mode du pipeline d'histoire",
+    )
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ollama-url", help="serveur déjà lancé (sinon fake_ollama intégré)")
+    parser.add_argument("--port", type=int, default=11435, help="port du fake_ollama intégré")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--ramble-rate", type=float, default=0.3,
+        help="fake_ollama : part des traductions de phrase répondues par une histoire entière",
+    )
+    parser.add_argument("--replay", help="réponses enregistrées à rejouer")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# backend/benchmarks/bench_replacements.py
+
+"""
+Compare l'ancienne boucle de str.replace et MultiReplacer (Aho–Corasick)
+sur des dictionnaires de 1k à 10k entrées.
+
+Lancement (depuis backend/) :
+    python -m benchmarks.bench_replacements
+"""
+
+import random
+import string
+import time
+
+from multi_replace import MultiReplacer
+from story_bot.service import FALLBACK_STORY_FR, REPLACEMENTS_FR
+
+SIZES = (1_000, 2_000, 5_000, 10_000)
+REPEAT = 20
+
+
+def loop_replace(text: str, replacements: dict) -> str:
+    """
+    Ancienne implémentation (simplify_french_story avant MultiReplacer).
+    """
+    for src, tgt in replacements.items():
+        text = text.replace(src, tgt)
+        text = text.replace(src.capitalize(), tgt)
+    return text
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+
+
+def build_dictionary(size: int, rng: random.Random) -> dict:
+    replacements = dict(REPLACEMENTS_FR)
+    while len(replacements) < size:
+        replacements[random_word(rng)] = random_word(rng)
+    return replacements
+
+
+def build_text(replacements: dict, rng: random.Random) -> str:
+    """
+    Une histoire "réaliste" (~10 lignes) avec quelques mots du dictionnaire.
+    """
+    words = FALLBACK_STORY_FR.split() * 3
+    words += rng.sample(list(replacements), 15)
+    rng.shuffle(words)
+    return "\n".join(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(*args)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'entrées':>8} | {'build (ms)':>10} | {'boucle (ms)':>11} | {'automate (ms)':>13} | gain")
+    print("-" * 62)
+    for size in SIZES:
+        replacements = build_dictionary(size, rng)
+        text = build_text(replacements, rng)
+
+        start = time.perf_counter()
+        replacer = MultiReplacer(replacements, ignore_case=True)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        loop_ms = timed(loop_replace, text, replacements)
+        ac_ms = timed(replacer.replace, text)
+        print(
+            f"{size:>8} | {build_ms:>10.1f} | {loop_ms:>11.3f} | {ac_ms:>13.3f} | x{loop_ms / ac_ms:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# backend/benchmarks/fake_ollama.py
+
+"""
+Faux serveur Ollama pour les benchmarks et les tests de non-régression,
+sans GPU ni modèle.
+
+Implémente /api/generate et /api/chat (stream et non-stream) :
+- rejoue des réponses enregistrées (--replay) ou les synthétise à partir
+  des jeux de données (data/fr_tn_pairs.jsonl, data/stories_dataset.jsonl)
+- peut enregistrer les réponses d'un vrai Ollama (--record --upstream URL)
+- simule la latence (time-to-first-token, tokens/s), des erreurs 500,
+  du JSON mal formé et un petit modèle qui, au lieu de traduire une
+  phrase, raconte toute une histoire (--ramble-rate)
+
+Lancement (depuis backend/) :
+    python -m benchmarks.fake_ollama --port 11435 --tokens-per-second 25 --ttft 0.4
+puis OLLAMA_URL=http://localhost:11435 pour le backend ou le benchmark.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+# Configuration courante (modifiée par la ligne de commande ou configure())
+SETTINGS = {
+    "tokens_per_second": 30.0,
+    "ttft": 0.3,
+    "error_rate": 0.0,
+    "malformed_rate": 0.0,
+    "ramble_rate": 0.3,
+    "replay": None,
+    "record": False,
+    "upstream": "http://localhost:11434",
+    "seed": None,
+}
+
+_rng = random.Random()
+_recordings: Dict[str, str] = {}
+
+
+def configure(**settings):
+    """
+    Met à jour la configuration (utilisé par benchmarks/bench_llm.py).
+    """
+    SETTINGS.update(settings)
+    _rng.seed(SETTINGS["seed"])
+    _recordings.clear()
+    if SETTINGS["replay"] and Path(SETTINGS["replay"]).exists():
+        with open(SETTINGS["replay"], encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    _recordings[entry["key"]] = entry["response"]
+
+
+# ================== DONNEES POUR LA SYNTHESE ==================
+
+
+def _load_jsonl(path: Path) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+PAIRS = _load_jsonl(DATA_DIR / "fr_tn_pairs.jsonl")
+STORIES = _load_jsonl(DATA_DIR / "stories_dataset.jsonl")
+
+
+def synth_french_story() -> str:
+    """
+    2 à 4 phrases : chaque phrase mélange le début d'une phrase du jeu de données
+    et la fin d'une autre (pour ne pas tomber pile dans la mémoire de traduction).
+    """
+    lines = []
+    for _ in range(_rng.randint(2, 4)):
+        a = _rng.choice(PAIRS)["fr"].rstrip(".!?").split()
+        b = _rng.choice(PAIRS)["fr"].split()
+        lines.append(" ".join(a[: max(len(a) // 2, 1)] + b[len(b) // 2:]))
+    return "\n".join(lines)
+
+
+def synth_tunisian(prompt: str) -> str:
+    """
+    Une phrase tunisienne par ligne du texte français à traduire
+    (une histoire entière pour une phrase seule, avec la probabilité ramble_rate).
+    """
+    match = re.search(r'"""(.*?)"""', prompt, flags=re.DOTALL)
+    source = match.group(1) if match else ""
+    n_lines = max(len([l for l in source.split("\n") if l.strip()]), 1)
+    if n_lines == 1 and _rng.random() < SETTINGS["ramble_rate"]:
+        return _rng.choice(STORIES)["output_story"]
+    return "\n".join(_rng.choice(PAIRS)["tn"] for _ in range(n_lines))
+
+
+def _reachable(grid, start):
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        r, c = queue.popleft()
+        for nr, nc in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+            if 0 <= nr < 7 and 0 <= nc < 7 and grid[nr][nc] == 0 and (nr, nc) not in seen:
+                seen.add((nr, nc))
+                queue.append((nr, nc))
+    return seen
+
+
+def synth_labyrinth(prompt: str) -> str:
+    """
+    Labyrinthe 7x7 aléatoire dans le format demandé, avec à peu près
+    le nombre de murs / cases rouges du prompt. Comme un petit modèle,
+    il ne respecte pas toujours toutes les règles de validation.
+    """
+    walls = re.search(r"entre (\d+) et (\d+) murs", prompt)
+    wall_counts = [int(x) for x in walls.groups()] if walls else [5, 8]
+    dangers = re.search(r"entre (\d+) et (\d+) cases rouges", prompt)
+    danger_counts = [int(x) for x in dangers.groups()] if dangers else [0, 0]
+
+    grid = [[0] * 7 for _ in range(7)]
+    cells = [(r, c) for r in range(7) for c in range(7) if (r, c) != (0, 0)]
+    _rng.shuffle(cells)
+    n_walls = _rng.randint(*wall_counts)
+    n_dangers = _rng.randint(*danger_counts)
+    for r, c in cells[:n_walls]:
+        grid[r][c] = 1
+    for r, c in cells[n_walls:n_walls + n_dangers]:
+        grid[r][c] = 2
+
+    reachable = sorted(_reachable(grid, (0, 0)), key=lambda p: -(p[0] + p[1]))
+    members = [("book", "بوك", "ton père"), ("ommik", "أمّك", "ta mère"), ("khouk", "خوك", "ton frère")]
+    targets = {}
+    for (member_id, name_ar, name_fr), pos in zip(members, reachable[: _rng.randint(1, 3)]):
+        targets[member_id] = {"name_ar": name_ar, "name_fr": name_fr, "pos": list(pos)}
+
+    return json.dumps({"grid": grid, "start": [0, 0], "targets": targets})
+
+
+def synth_bilingual(prompt: str) -> str:
+    """
+    Réponse JSON du mode "single" : paires FR / tounsi du jeu de données.
+    """
+    budget = re.search(r"Au plus (\d+) phrases", prompt)
+    n_pairs = _rng.randint(1, int(budget.group(1)) if budget else 2)
+    pairs = [_rng.choice(PAIRS) for _ in range(n_pairs)]
+    return json.dumps(
+        {"phrases": [{"fr": p["fr"], "tn": p["tn"]} for p in pairs]}, ensure_ascii=False
+    )
+
+
+def synthesize(prompt: str) -> str:
+    if '"phrases"' in prompt:
+        return synth_bilingual(prompt)
+    if "labyrinthe" in prompt:
+        return synth_labyrinth(prompt)
+    if "ترجم" in prompt:
+        return synth_tunisian(prompt)
+    return synth_french_story()
+
+
+# ================== SERVEUR ==================
+
+app = FastAPI(title="fake-ollama")
+
+
+def _prompt_text(path: str, body: dict) -> str:
+    if path == "/api/chat":
+        return "\n".join(m.get("content", "") for m in body.get("messages", []))
+    return body.get("prompt", "")
+
+
+def _recording_key(path: str, body: dict) -> str:
+    material = {
+        "path": path,
+        "model": body.get("model"),
+        "prompt": body.get("prompt"),
+        "messages": body.get("messages"),
+    }
+    return hashlib.sha256(
+        json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+async def _record_from_upstream(path: str, body: dict, key: str) -> str:
+    async with httpx.AsyncClient(base_url=SETTINGS["upstream"], timeout=300) as client:
+        resp = await client.post(path, json={**body, "stream": False})
+        resp.raise_for_status()
+        data = resp.json()
+    text = data["message"]["content"] if path == "/api/chat" else data.get("response", "")
+    _recordings[key] = text
+    with open(SETTINGS["replay"], "a", encoding="utf-8") as f:
+        f.write(json.dumps({"key": key, "path": path, "response": text}, ensure_ascii=False) + "\n")
+    return text
+
+
+async def _response_text(path: str, body: dict) -> str:
+    key = _recording_key(path, body)
+    if key in _recordings:
+        return _recordings[key]
+    if SETTINGS["record"]:
+        return await _record_from_upstream(path, body, key)
+    return synthesize(_prompt_text(path, body))
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+# Dernier préfixe "system" évalué par modèle : comme Ollama (cache KV),
+# un préfixe identique à l'appel précédent n'est pas réévalué.
+_last_prefix: Dict[str, str] = {}
+
+
+def _prompt_eval_count(path: str, body: dict, model: str) -> int:
+    if path != "/api/chat":
+        return len(_tokens(body.get("prompt", "")))
+    messages = body.get("messages", [])
+    prefix = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    rest = "\n".join(m.get("content", "") for m in messages if m.get("role") != "system")
+    count = len(_tokens(rest))
+    if _last_prefix.get(model) != prefix:
+        count += len(_tokens(prefix))
+        _last_prefix[model] = prefix
+    return count
+
+
+def _chunk(path: str, model: str, text: str, done: bool, extra: Optional[dict] = None) -> dict:
+    data = {"model": model, "done": done}
+    if path == "/api/chat":
+        data["message"] = {"role": "assistant", "content": text}
+    else:
+        data["response"] = text
+    data.update(extra or {})
+    return data
+
+
+async def _handle(path: str, request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+
+    if _rng.random() < SETTINGS["error_rate"]:
+        await asyncio.sleep(SETTINGS["ttft"])
+        return JSONResponse({"error": "fake-ollama: erreur injectée"}, status_code=500)
+
+    text = await _response_text(path, body)
+    tokens = _tokens(text)
+    num_predict = (body.get("options") or {}).get("num_predict")
+    if num_predict:
+        tokens = tokens[:num_predict]
+    delay = 1.0 / SETTINGS["tokens_per_second"]
+    malformed = _rng.random() < SETTINGS["malformed_rate"]
+    stats = {
+        "prompt_eval_count": _prompt_eval_count(path, body, model),
+        "eval_count": len(tokens),
+    }
+
+    if not body.get("stream", True):
+        await asyncio.sleep(SETTINGS["ttft"] + delay * len(tokens))
+        payload = json.dumps(_chunk(path, model, "".join(tokens), True, stats), ensure_ascii=False)
+        if malformed:
+            return PlainTextResponse(payload[: len(payload) // 2], media_type="application/json")
+        return PlainTextResponse(payload, media_type="application/json")
+
+    async def stream():
+        await asyncio.sleep(SETTINGS["ttft"])
+        for i, token in enumerate(tokens):
+            if malformed and i == len(tokens) // 2:
+                yield '{"response": "\n'
+                return
+            yield json.dumps(_chunk(path, model, token, False), ensure_ascii=False) + "\n"
+            await asyncio.sleep(delay)
+        yield json.dumps(_chunk(path, model, "", True, stats)) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/generate")
+async def api_generate(request: Request):
+    return await _handle("/api/generate", request)
+
+
+@app.post("/api/chat")
+async def api_chat(request: Request):
+    return await _handle("/api/chat", request)
+
+
+@app.get("/api/tags")
+async def api_tags():
+    return {"models": [{"name": "fake"}]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur Ollama")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-second", type=float, default=SETTINGS["tokens_per_second"])
+    parser.add_argument("--ttft", type=float, default=SETTINGS["ttft"], help="time-to-first-token (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--ramble-rate", type=float, default=SETTINGS["ramble_rate"],
+        help="probabilité de répondre une histoire entière à la traduction d'une phrase",
+    )
+    parser.add_argument("--replay", help="fichier jsonl de réponses enregistrées")
+    parser.add_argument("--record", action="store_true", help="enregistre les réponses de --upstream")
+    parser.add_argument("--upstream", default=SETTINGS["upstream"])
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.record and not args.replay:
+        parser.error("--record nécessite --replay (fichier où enregistrer)")
+
+    configure(
+        tokens_per_second=args.tokens_per_second,
+        ttft=args.ttft,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        ramble_rate=args.ramble_rate,
+        replay=args.replay,
+        record=args.record,
+        upstream=args.upstream,
+        seed=args.seed,
+    )
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# backend/coalescing.py
+
+"""
+Éviter les générations LLM en double :
+- SingleFlight : les requêtes identiques simultanées partagent
+  une seule génération en cours
+- IdempotencyStore : une requête rejouée avec le même en-tête
+  `Idempotency-Key` reçoit le résultat déjà calculé
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Durée de conservation des résultats associés à une Idempotency-Key
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+
+# Nombre maximal de clés gardées en mémoire (les plus anciennes sont oubliées)
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+
+class IdempotencyConflict(Exception):
+    """La même Idempotency-Key a déjà servi pour une requête différente."""
+
+
+class SingleFlight:
+    """
+    Une seule exécution en cours par clé ; les appels concurrents
+    avec la même clé attendent le même résultat.
+    L'exécution est annulée quand plus aucun appelant ne l'attend.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Lance `fn` ou rejoint l'exécution déjà en cours pour `key`.
+        """
+        task = self._inflight.get(key)
+
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        # shield : si un client abandonne, l'exécution continue pour les autres...
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # ... et s'arrête si c'était le dernier
+            if self._waiters[key] == 1 and not task.done():
+                task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
+
+
+class IdempotencyStore:
+    """
+    Résultats par (portée, Idempotency-Key), avec TTL et taille bornée.
+    Utilisable depuis les endpoints async et sync (verrou).
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+        max_keys: int = IDEMPOTENCY_MAX_KEYS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[Hashable, Tuple[float, Hashable, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.replays = 0
+
+    def get(self, key: Hashable, fingerprint: Hashable) -> Optional[Any]:
+        """
+        Renvoie le résultat stocké pour la clé, ou None.
+        Lève IdempotencyConflict si la clé a servi pour une autre requête.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, stored_fingerprint, result = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            if stored_fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+            self.replays += 1
+            return result
+
+    def put(self, key: Hashable, fingerprint: Hashable, result: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, fingerprint, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {"keys": len(self._entries), "replays": self.replays}
+
+
+SINGLE_FLIGHT = SingleFlight()
+IDEMPOTENCY = IdempotencyStore()
+
+
+async def run_once(
+    scope: str,
+    request_key: Hashable,
+    idempotency_key: Optional[str],
+    fn: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Exécute `fn` au plus une fois pour :
+    - toutes les requêtes simultanées avec la même `request_key`
+    - toutes les requêtes rejouées avec la même `idempotency_key`
+    (tant que le résultat n'a pas expiré).
+    """
+    if idempotency_key:
+        stored = IDEMPOTENCY.get((scope, idempotency_key), request_key)
+        if stored is not None:
+            return stored
+
+    # un retry qui arrive pendant la génération d'origine la rejoint aussi ici
+    result = await SINGLE_FLIGHT.do((scope, request_key), fn)
+
+    if idempotency_key:
+        IDEMPOTENCY.put((scope, idempotency_key), request_key, result)
+    return result
@@ -1,11 +1,34 @@
 # backend/create_tables.py
 
+from sqlalchemy import text
+
 from db import Base, engine
-import db_models  # important : pour que User, QuizQuestion, Story, GameLog soient chargés
+import db_models  # important : pour que User, QuizQuestion, Story, GameLog, GenerationJob, FamilyLabyrinthState soient chargés
 
 def create_all_tables():
     Base.metadata.create_all(bind=engine)
 
+
+def upgrade_tables():
+    """
+    Ajoute aux tables existantes les colonnes / index apparus après leur création
+    (create_all ne modifie pas une table qui existe déjà).
+    """
+    statements = [
+        "ALTER TABLE stories ADD COLUMN IF NOT EXISTS level INTEGER",
+        "ALTER TABLE stories ADD COLUMN IF NOT EXISTS theme_key VARCHAR(255)",
+        "CREATE INDEX IF NOT EXISTS ix_stories_theme_key_level ON stories (theme_key, level)",
+        "ALTER TABLE game_logs ADD COLUMN IF NOT EXISTS model_name VARCHAR(255)",
+        "ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS owner VARCHAR(64)",
+        "ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP",
+        "ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS attempt INTEGER",
+    ]
+    with engine.begin() as conn:
+        for sql in statements:
+            conn.execute(text(sql))
+
+
 if __name__ == "__main__":
     create_all_tables()
+    upgrade_tables()
     print("✅ Tables créées")
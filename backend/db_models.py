@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ARRAY, TIMESTAMP,DateTime, func
+from sqlalchemy import Column, Integer, String, Text, ARRAY, TIMESTAMP,DateTime, Index, func
 from db import Base
 from datetime import datetime
 class QuizQuestion(Base):
@@ -15,10 +15,17 @@ class Story(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     child_theme = Column(Text, nullable=False)
-    # ❌ plus de niveau ici, pour coller à la DB
+    # niveau + thème normalisé : permettent de réutiliser les histoires déjà générées
+    # (nullable pour les anciennes lignes créées sans ces colonnes)
+    level = Column(Integer, nullable=True)
+    theme_key = Column(String(255), nullable=True)
     generated_story = Column(Text, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_stories_theme_key_level", "theme_key", "level"),
+    )
+
 
 class GameLog(Base):
     __tablename__ = "game_logs"
@@ -27,7 +34,45 @@ class GameLog(Base):
     game_name = Column(String(50), nullable=False)
     child_input = Column(Text)
     model_output = Column(Text)
+    # modèle(s) LLM qui ont produit model_output (séparés par des virgules)
+    model_name = Column(String(255), nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class GenerationJob(Base):
+    """
+    Génération longue lancée via /api/jobs (histoire ou labyrinthe) :
+    permet de relire le résultat après un redémarrage du serveur.
+    """
+    __tablename__ = "generation_jobs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(20), nullable=False)
+    params = Column(Text)  # JSON
+    status = Column(String(20), nullable=False)
+    stage = Column(String(50), nullable=True)
+    attempt = Column(Integer, nullable=True)
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    # bail du worker qui exécute le job (jobs.py) ; heartbeat_at vide une fois terminé
+    owner = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+
+class FamilyLabyrinthState(Base):
+    """
+    Labyrinthe "Cherche la famille" en cours de partie (family_store.py,
+    FAMILY_STORE_BACKEND=database) : partagé entre workers et machines.
+    """
+    __tablename__ = "family_labyrinths"
+
+    id = Column(String(16), primary_key=True)
+    data = Column(Text, nullable=False)  # encode_labyrinth
+    last_used = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -0,0 +1,95 @@
+# backend/disconnect.py
+
+"""
+Arrêter les générations LLM dont le client est parti.
+
+- cancel_on_disconnect : exécute la génération d'un endpoint et surveille
+  la connexion HTTP ; si l'enfant quitte la page, la génération est annulée
+  (connexion vers Ollama fermée, étapes suivantes et retries sautés)
+- DisconnectStats : générations annulées et temps de génération économisé
+  (estimé avec la durée médiane des générations terminées du même type)
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict
+
+from fastapi import Request
+
+# Intervalle de vérification de la connexion du client (secondes)
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+# Durées de génération gardées par type, pour estimer le temps économisé
+DISCONNECT_WINDOW = 50
+
+
+class ClientDisconnected(Exception):
+    """Le client HTTP est parti avant la fin de la génération."""
+
+
+class DisconnectStats:
+    """
+    Par type de génération ("storybot", "family", ...) : durées des générations
+    terminées, nombre d'annulations et temps économisé estimé.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, Deque[float]] = {}
+        self.cancelled: Dict[str, int] = {}
+        self.saved_seconds: Dict[str, float] = {}
+
+    def typical(self, scope: str) -> float:
+        """
+        Durée médiane des générations terminées (0 sans mesure).
+        """
+        window = sorted(self.durations.get(scope, ()))
+        return window[len(window) // 2] if window else 0.0
+
+    def record_done(self, scope: str, seconds: float):
+        self.durations.setdefault(scope, deque(maxlen=DISCONNECT_WINDOW)).append(seconds)
+
+    def record_cancel(self, scope: str, elapsed: float):
+        saved = max(self.typical(scope) - elapsed, 0.0)
+        self.cancelled[scope] = self.cancelled.get(scope, 0) + 1
+        self.saved_seconds[scope] = self.saved_seconds.get(scope, 0.0) + saved
+        print(f"[disconnect] {scope} annulé après {elapsed:.1f}s (~{saved:.1f}s économisées)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cancelled": dict(self.cancelled),
+            "saved_seconds": {k: round(v, 1) for k, v in self.saved_seconds.items()},
+            "total_saved_seconds": round(sum(self.saved_seconds.values()), 1),
+        }
+
+
+DISCONNECT_STATS = DisconnectStats()
+
+
+async def cancel_on_disconnect(request: Request, scope: str, work: Awaitable[Any]) -> Any:
+    """
+    Attend `work` en vérifiant toutes les DISCONNECT_POLL_SECONDS que le client
+    est toujours là. S'il est parti : annule `work` et lève ClientDisconnected.
+    """
+    task = asyncio.ensure_future(work)
+    started_at = time.monotonic()
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                result = task.result()
+                DISCONNECT_STATS.record_done(scope, time.monotonic() - started_at)
+                return result
+            if await request.is_disconnected():
+                break
+    finally:
+        # client parti, ou endpoint lui-même annulé (arrêt du serveur)
+        task.cancel()
+
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass  # terminée ou en erreur juste avant l'annulation : personne ne lira le résultat
+    DISCONNECT_STATS.record_cancel(scope, time.monotonic() - started_at)
+    raise ClientDisconnected(scope)
@@ -1,9 +1,13 @@
 # backend/family_llm_service.py
 
 import json
+import os
 import re
-from collections import deque
-import requests
+import threading
+from collections import OrderedDict, deque
+
+import llm_gateway
+from progress import report_stage
 
 # ==========================
 # CONSTANTES DE LA GRILLE
@@ -21,9 +25,15 @@ DANGER = 2  # case rouge (interdite)
 # CONFIG OLLAMA
 # ==========================
 
-OLLAMA_URL = "http://localhost:11434"
-# 👉 modèle rapide que tu as déjà
-OLLAMA_MODEL = "qwen2.5:1.5b-instruct"
+# URL et modèle : voir llm_gateway.py (OLLAMA_URL, OLLAMA_LABYRINTH_MODEL)
+# 👉 par défaut le modèle rapide qwen2.5:1.5b-instruct
+
+LABYRINTH_OPTIONS = {
+    # ⚠️ on augmente fortement num_predict pour éviter la coupure
+    "num_predict": 512,
+    "temperature": 0.2,
+    "top_p": 0.8,
+}
 
 
 # ==========================
@@ -68,6 +78,66 @@ def bfs_path(grid, start, goal):
     return path
 
 
+def distance_field(grid, start):
+    """
+    Un seul BFS depuis start, jusqu'au bout : distance et parent de chaque
+    case accessible, et ordre de visite.
+    Retourne {"dist": {case: n}, "parent": {case: case}, "order": [case, ...]}.
+    """
+    dist = {start: 0}
+    parent = {start: None}
+    order = []
+    queue = deque([start])
+
+    while queue:
+        cur = queue.popleft()
+        order.append(cur)
+        for nb in neighbors(grid, *cur):
+            if nb not in dist:
+                dist[nb] = dist[cur] + 1
+                parent[nb] = cur
+                queue.append(nb)
+
+    return {"dist": dist, "parent": parent, "order": order}
+
+
+def field_path(field, goal):
+    """Chemin le plus court start -> goal lu dans les parents, ou [] si impossible."""
+    if goal not in field["parent"]:
+        return []
+    path = []
+    cur = goal
+    while cur is not None:
+        path.append(cur)
+        cur = field["parent"][cur]
+    path.reverse()
+    return path
+
+
+# Champs de distance des derniers labyrinthes validés : calculés une fois
+# à la validation, relus pour les chemins et les métriques
+FAMILY_FIELD_CACHE_SIZE = int(os.getenv("FAMILY_FIELD_CACHE_SIZE", "1024"))
+
+_FIELDS = OrderedDict()
+_FIELDS_LOCK = threading.Lock()
+
+
+def labyrinth_field(grid, start):
+    """distance_field mémorisé par (grille, départ). Résultat en lecture seule."""
+    key = (tuple(map(tuple, grid)), tuple(start))
+    with _FIELDS_LOCK:
+        field = _FIELDS.get(key)
+        if field is not None:
+            _FIELDS.move_to_end(key)
+            return field
+    field = distance_field(grid, tuple(start))
+    with _FIELDS_LOCK:
+        _FIELDS[key] = field
+        while len(_FIELDS) > FAMILY_FIELD_CACHE_SIZE:
+            _FIELDS.popitem(last=False)
+    return field
+
+
 # ==========================
 # PROMPTS
 # ==========================
@@ -193,30 +263,24 @@ def extract_json(text: str) -> str:
 # APPEL AU LLM
 # ==========================
 
-def call_ollama_for_labyrinth(difficulty: int) -> dict:
+async def call_ollama_for_labyrinth(difficulty: int, cache: bool = True) -> dict:
     """
-    Appelle Ollama et renvoie le dict Python du JSON renvoyé par le modèle.
+    Appelle Ollama (via llm_gateway) et renvoie le dict Python
+    du JSON renvoyé par le modèle.
+    Seuls les labyrinthes valides sont servis depuis le cache / enregistrés ;
+    cache=False force une nouvelle génération.
     """
-    payload = {
-        "model": OLLAMA_MODEL,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": build_user_prompt(difficulty)},
-        ],
-        "stream": False,
-        "options": {
-            # ⚠️ on augmente fortement num_predict pour éviter la coupure
-            "num_predict": 512,
-            "temperature": 0.2,
-            "top_p": 0.8,
-        },
-    }
-
-    resp = requests.post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=60)
-    resp.raise_for_status()
-    data = resp.json()
-
-    content = data["message"]["content"]
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_prompt(difficulty)},
+    ]
+    content = await llm_gateway.chat(
+        messages,
+        "labyrinth",
+        LABYRINTH_OPTIONS,
+        cache=cache,
+        cacheable=lambda text: is_valid_labyrinth_content(text, difficulty),
+    )
 
     # debug optionnel
     print("========== OLLAMA CONTENT ==========")
@@ -234,6 +298,15 @@ def call_ollama_for_labyrinth(difficulty: int) -> dict:
 # ==========================
 # VALIDATION DU LABYRINTHE
 # ==========================
+
+def is_valid_labyrinth_content(content: str, difficulty: int) -> bool:
+    """Vrai si la réponse brute du LLM donne un labyrinthe jouable."""
+    try:
+        validate_and_fix_labyrinth(json.loads(extract_json(content)), difficulty)
+        return True
+    except Exception:
+        return False
+
 def validate_and_fix_labyrinth(raw: dict, difficulty: int):
     """
     Vérifie que le JSON du LLM est correct et jouable.
@@ -333,18 +406,18 @@ def validate_and_fix_labyrinth(raw: dict, difficulty: int):
         raise ValueError("aucune cible valide dans targets")
 
     # --- accessibilité des cibles ---
-    start_tuple = (sr, sc)
+    # un seul BFS depuis start pour toutes les cibles (champ gardé pour /path)
+    field = labyrinth_field(grid, start)
     reachable = False
     best_len = None
     reachable_targets_count = 0
 
     for t in clean_targets.values():
-        goal = tuple(t["pos"])
-        path = bfs_path(grid, start_tuple, goal)
-        if path:
+        d = field["dist"].get(tuple(t["pos"]))
+        if d is not None:
             reachable = True
             reachable_targets_count += 1
-            L = len(path)
+            L = d + 1  # longueur du chemin en cases, départ compris
             if best_len is None or L < best_len:
                 best_len = L
 
@@ -375,11 +448,14 @@ def validate_and_fix_labyrinth(raw: dict, difficulty: int):
 # FONCTION PRINCIPALE
 # ==========================
 
-def generate_labyrinth_with_llm(difficulty: int, max_tries: int = 3):
+async def generate_labyrinth_with_llm(difficulty: int, max_tries: int = 3):
     for attempt in range(max_tries):
         try:
             print(f"[family_llm] tentative {attempt+1} pour difficulty={difficulty}")
-            raw = call_ollama_for_labyrinth(difficulty)
+            report_stage("generation", attempt=attempt + 1)
+            # après un échec, on ne relit pas le cache
+            raw = await call_ollama_for_labyrinth(difficulty, cache=attempt == 0)
+            report_stage("validation", attempt=attempt + 1)
             grid, start, targets = validate_and_fix_labyrinth(raw, difficulty)
             print("[family_llm] labyrinthe valide obtenu ✅")
             return grid, start, targets
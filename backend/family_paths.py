@@ -0,0 +1,113 @@
+# backend/family_paths.py
+
+"""
+Chemins et métriques des labyrinthes "Cherche la famille".
+
+- BFS : lu dans le champ de distance du labyrinthe (family_llm_service.labyrinth_field),
+  calculé une seule fois pour toutes les cibles ; l'ordre de visite est
+  celui du BFS, arrêté au membre demandé
+- DFS et A* : vraie recherche (quiz/algorithms.py), avec leur ordre de visite
+- résultats mémorisés par (labyrinthe, membre, algo)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from family_llm_service import field_path, labyrinth_field
+from quiz.algorithms import astar, dfs
+
+# ================== CONFIG CHEMINS ==================
+
+# Algorithmes acceptés par /api/family-labyrinth/path ("a*" = "astar")
+FAMILY_PATH_ALGOS = ("bfs", "dfs", "astar")
+
+# Nombre de chemins mémorisés
+FAMILY_PATH_CACHE_SIZE = int(os.getenv("FAMILY_PATH_CACHE_SIZE", "4096"))
+
+
+def normalize_algo(algo: str) -> str:
+    algo = (algo or "bfs").strip().lower()
+    return "astar" if algo in ("a*", "a-star", "a_star") else algo
+
+
+def labyrinth_metrics(grid: List[List[int]], start: List[int], targets: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Métriques de difficulté tirées du champ de distance :
+    longueur (en cases, départ compris) du chemin vers chaque membre,
+    plus court / plus long, nombre de cases accessibles.
+    """
+    field = labyrinth_field(grid, start)
+    lengths = {}
+    for member_id, info in targets.items():
+        d = field["dist"].get(tuple(info["pos"]))
+        lengths[member_id] = d + 1 if d is not None else None
+    reachable = [L for L in lengths.values() if L is not None]
+    return {
+        "path_lengths": lengths,
+        "shortest_path": min(reachable) if reachable else None,
+        "longest_path": max(reachable) if reachable else None,
+        "reachable_cells": len(field["dist"]),
+    }
+
+
+class PathFinder:
+    """
+    Chemins mémorisés (LRU) par (labyrinth_id, membre, algo).
+    """
+
+    def __init__(self, max_entries: int = FAMILY_PATH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._paths: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _search(self, grid, start, goal, algo: str):
+        if algo == "bfs":
+            field = labyrinth_field(grid, start)
+            order = field["order"]
+            if goal not in field["dist"]:
+                return order, []
+            return order[: order.index(goal) + 1], field_path(field, goal)
+        if algo == "dfs":
+            return dfs(grid, start, goal)
+        return astar(grid, start, goal)
+
+    def find(
+        self, lab_id: str, grid: List[List[int]], start: List[int], goal: List[int], member_id: str, algo: str
+    ) -> Dict[str, Any]:
+        """
+        {"visited": [[r, c], ...], "path": [[r, c], ...]} ; path vide si le membre
+        est inaccessible.
+        """
+        key = (lab_id, member_id, algo)
+        with self._lock:
+            result = self._paths.get(key)
+            if result is not None:
+                self._paths.move_to_end(key)
+                self.hits += 1
+                return result
+
+        visited, path = self._search(grid, tuple(start), tuple(goal), algo)
+        result = {
+            "visited": [[r, c] for (r, c) in visited],
+            "path": [[r, c] for (r, c) in path],
+        }
+        with self._lock:
+            self.misses += 1
+            self._paths[key] = result
+            while len(self._paths) > self.max_entries:
+                self._paths.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._paths),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+PATH_FINDER = PathFinder()
@@ -0,0 +1,245 @@
+# backend/family_pool.py
+
+"""
+Réserve de labyrinthes "Cherche la famille" déjà validés, par difficulté.
+
+- remplie en arrière-plan depuis le LLM, le générateur procédural, ou les deux
+  (FAMILY_POOL_SOURCES, essayées dans l'ordre), à raison d'un labyrinthe
+  toutes les FAMILY_POOL_REFILL_SECONDS au plus
+- un labyrinthe n'est pas consommé : il est resservi (à d'autres sessions)
+  jusqu'à FAMILY_POOL_MAX_SERVES fois, puis remplacé par un nouveau
+- une session ne reçoit pas deux fois le même labyrinthe
+- enregistrée dans un fichier JSON : après un redémarrage,
+  la réserve sert tout de suite
+"""
+
+import asyncio
+import json
+import os
+import random
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+import llm_gateway
+from family_llm_service import generate_labyrinth_with_llm
+from family_procedural import generate_procedural_labyrinth
+from family_store import labyrinth_id
+from llm_scheduler import job_priority
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+# ================== CONFIG RESERVE DE LABYRINTHES ==================
+
+# Active le producteur en arrière-plan (démarré par le lifespan de main.py)
+FAMILY_POOL_ENABLED = os.getenv("FAMILY_POOL_ENABLED", "1") == "1"
+
+# Nombre de labyrinthes gardés par difficulté
+FAMILY_POOL_DEPTH = int(os.getenv("FAMILY_POOL_DEPTH", "8"))
+
+# Sources connues
+SOURCES = ("llm", "procedural")
+
+# Sources, essayées dans l'ordre : "llm", "procedural" (séparées par des virgules)
+FAMILY_POOL_SOURCES = [
+    s.strip() for s in os.getenv("FAMILY_POOL_SOURCES", "llm,procedural").split(",") if s.strip()
+]
+
+# Délai minimal entre deux labyrinthes produits (débit de remplissage)
+FAMILY_POOL_REFILL_SECONDS = float(os.getenv("FAMILY_POOL_REFILL_SECONDS", "5"))
+
+# Nombre de fois qu'un labyrinthe est servi avant d'être remplacé
+FAMILY_POOL_MAX_SERVES = int(os.getenv("FAMILY_POOL_MAX_SERVES", "20"))
+
+# Fichier de sauvegarde de la réserve
+FAMILY_POOL_PATH = Path(os.getenv("FAMILY_POOL_PATH", DATA_DIR / "family_pool.json"))
+
+# Sessions suivies (les plus anciennes sont oubliées) et labyrinthes retenus par session
+FAMILY_POOL_MAX_SESSIONS = 1000
+FAMILY_POOL_SESSION_MEMORY = 50
+
+DIFFICULTIES = (1, 2, 3)
+
+
+class LabyrinthPool:
+    """
+    Labyrinthes prêts par difficulté : dicts {"id", "grid", "start", "targets",
+    "source", "seed", "serves"}.
+    """
+
+    def __init__(
+        self,
+        depth: int = FAMILY_POOL_DEPTH,
+        sources: List[str] = FAMILY_POOL_SOURCES,
+        path: Path = FAMILY_POOL_PATH,
+    ):
+        unknown = [source for source in sources if source not in SOURCES]
+        if unknown:
+            raise ValueError(
+                f"FAMILY_POOL_SOURCES : source(s) inconnue(s) {', '.join(unknown)} "
+                f"(attendu : {', '.join(SOURCES)})"
+            )
+        self.depth = depth
+        self.sources = sources
+        self.path = path
+        self.labyrinths: Dict[int, List[Dict[str, Any]]] = {d: [] for d in DIFFICULTIES}
+        self._sessions: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.generated = {source: 0 for source in SOURCES}
+        self.failures = 0
+
+    # ---------- sauvegarde ----------
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[family pool] lecture de {self.path} impossible : {e}")
+            return
+        for difficulty in DIFFICULTIES:
+            self.labyrinths[difficulty] = data.get(str(difficulty), [])[: self.depth]
+        print(f"[family pool] {len(self)} labyrinthe(s) rechargé(s)")
+
+    def save(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(
+                json.dumps({str(d): labs for d, labs in self.labyrinths.items()}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            tmp.replace(self.path)
+        except OSError as e:
+            print(f"[family pool] écriture de {self.path} impossible : {e}")
+
+    def __len__(self) -> int:
+        return sum(len(labs) for labs in self.labyrinths.values())
+
+    # ---------- côté requêtes ----------
+
+    def pop(
+        self, difficulty: int, session_id: Optional[str] = None, source: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Labyrinthe prêt pour cette difficulté (le moins servi parmi ceux que
+        la session n'a pas encore vus ; `source` : "llm" / "procedural"
+        pour n'accepter qu'une source), ou None (miss).
+        """
+        seen = self._sessions.get(session_id, ()) if session_id else ()
+        candidates = [
+            lab for lab in self.labyrinths.get(difficulty, [])
+            if lab["id"] not in seen and (source is None or lab["source"] == source)
+        ]
+        if not candidates:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        lab = min(candidates, key=lambda lab: lab["serves"])
+        lab["serves"] += 1
+        if lab["serves"] >= FAMILY_POOL_MAX_SERVES:
+            self.labyrinths[difficulty].remove(lab)
+        self._dirty = True
+        if session_id:
+            self.remember(session_id, lab["id"])
+        return lab
+
+    def remember(self, session_id: str, lab_id: str):
+        """
+        Note qu'une session a reçu ce labyrinthe (réserve ou génération en direct).
+        """
+        seen = self._sessions.pop(session_id, None) or deque(maxlen=FAMILY_POOL_SESSION_MEMORY)
+        seen.append(lab_id)
+        self._sessions[session_id] = seen
+        while len(self._sessions) > FAMILY_POOL_MAX_SESSIONS:
+            self._sessions.popitem(last=False)
+
+    # ---------- producteur ----------
+
+    def neediest(self) -> Optional[int]:
+        """
+        Difficulté dont la réserve est la plus vide, ou None si tout est plein.
+        """
+        difficulty = min(DIFFICULTIES, key=lambda d: len(self.labyrinths[d]))
+        return difficulty if len(self.labyrinths[difficulty]) < self.depth else None
+
+    async def _produce(self, difficulty: int, source: str):
+        if source == "llm":
+            if not llm_gateway.is_available():
+                raise ValueError("LLM indisponible")
+            # les requêtes des enfants passent avant la réserve dans la file LLM
+            with job_priority("prefetch"), llm_gateway.fresh_variants():
+                grid, start, targets = await generate_labyrinth_with_llm(difficulty)
+            return grid, start, targets, None
+        seed = random.randrange(2 ** 31)
+        grid, start, targets = generate_procedural_labyrinth(difficulty, seed)
+        return grid, start, targets, seed
+
+    async def fill_one(self, difficulty: int) -> bool:
+        """
+        Ajoute un labyrinthe (première source qui réussit) ; faux si aucune
+        source n'a donné de labyrinthe nouveau.
+        """
+        for source in self.sources:
+            try:
+                grid, start, targets, seed = await self._produce(difficulty, source)
+            except Exception as e:
+                print(f"[family pool] source {source} KO pour difficulty={difficulty} :", e)
+                continue
+            lab_id = labyrinth_id(grid, start, targets)
+            if any(lab["id"] == lab_id for lab in self.labyrinths[difficulty]):
+                continue  # déjà en réserve (ex. réponse LLM en cache)
+            self.labyrinths[difficulty].append({
+                "id": lab_id,
+                "grid": grid,
+                "start": start,
+                "targets": targets,
+                "source": source,
+                "seed": seed,
+                "serves": 0,
+            })
+            self.generated[source] += 1
+            self._dirty = True
+            return True
+        self.failures += 1
+        return False
+
+    async def run(self):
+        """
+        Boucle du producteur : un labyrinthe pour la difficulté la plus vide,
+        au plus un toutes les FAMILY_POOL_REFILL_SECONDS ; sauvegarde
+        du fichier quand la réserve a changé.
+        """
+        try:
+            while True:
+                difficulty = self.neediest()
+                if difficulty is not None:
+                    await self.fill_one(difficulty)
+                await asyncio.to_thread(self.save)
+                await asyncio.sleep(FAMILY_POOL_REFILL_SECONDS)
+        finally:
+            self.save()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": FAMILY_POOL_ENABLED,
+            "depth": self.depth,
+            "sources": self.sources,
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+            "failures": self.failures,
+            "sizes": {d: len(labs) for d, labs in self.labyrinths.items()},
+            "sessions": len(self._sessions),
+        }
+
+
+FAMILY_POOL = LabyrinthPool()
+FAMILY_POOL.load()
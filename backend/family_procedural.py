@@ -0,0 +1,103 @@
+# backend/family_procedural.py
+
+"""
+Générateur procédural des labyrinthes "Cherche la famille" (sans LLM).
+
+Mêmes contrats que les labyrinthes du LLM (voir build_user_prompt et
+validate_and_fix_labyrinth dans family_llm_service.py), par difficulté :
+- nombre de murs et de cases rouges dans les fourchettes du prompt
+- départ [0, 0], toutes les cibles atteignables
+- chemin le plus court vers chaque cible assez long
+- au moins 2 cibles au niveau 3
+Même structure de `targets` (name_ar / name_fr).
+
+Déterministe : une même graine donne le même labyrinthe.
+Quelques millisecondes au plus (tirages rejetés tant que les contrats
+ne sont pas respectés).
+"""
+
+import random
+from typing import Optional
+
+from family_llm_service import (
+    COLS,
+    DANGER,
+    EMPTY,
+    ROWS,
+    WALL,
+    distance_field,
+    validate_and_fix_labyrinth,
+)
+
+# Membres de la famille : identifiant (emoji côté front), nom tunisien, nom français
+FAMILY_MEMBERS = [
+    ("book", "بوك", "ton père"),
+    ("ommik", "أمّك", "ta mère"),
+    ("khouk", "خوك", "ton frère"),
+    ("okhtik", "أختك", "ta sœur"),
+    ("jeddek", "جدّك", "ton grand-père"),
+    ("jeddekta", "جدّتك", "ta grand-mère"),
+]
+
+# Contrats par difficulté : (murs min, max), (cases rouges min, max),
+# longueur minimale du chemin (en cases, départ compris), (cibles min, max)
+DIFFICULTY_RULES = {
+    1: {"walls": (5, 8), "dangers": (0, 0), "min_path": 3, "targets": (1, 3)},
+    2: {"walls": (8, 12), "dangers": (3, 5), "min_path": 5, "targets": (1, 3)},
+    3: {"walls": (12, 16), "dangers": (6, 10), "min_path": 7, "targets": (2, 3)},
+}
+
+# Nombre maximal de tirages avant d'abandonner (jamais atteint en pratique)
+MAX_DRAWS = 1000
+
+START = (0, 0)
+
+
+def _draw(rng: random.Random, rules: dict):
+    """
+    Un tirage : murs et cases rouges au hasard, puis cibles parmi les cases
+    assez loin du départ. Renvoie (grid, targets) ou None si le tirage échoue.
+    """
+    cells = [(r, c) for r in range(ROWS) for c in range(COLS) if (r, c) != START]
+    n_walls = rng.randint(*rules["walls"])
+    n_dangers = rng.randint(*rules["dangers"])
+    blocked = rng.sample(cells, n_walls + n_dangers)
+
+    grid = [[EMPTY] * COLS for _ in range(ROWS)]
+    for i, (r, c) in enumerate(blocked):
+        grid[r][c] = WALL if i < n_walls else DANGER
+
+    dist = distance_field(grid, START)["dist"]
+    # longueur du chemin en cases = distance + 1
+    far = sorted(pos for pos, d in dist.items() if d + 1 >= rules["min_path"])
+    n_targets = rng.randint(*rules["targets"])
+    if len(far) < n_targets:
+        return None
+
+    members = rng.sample(FAMILY_MEMBERS, n_targets)
+    targets = {
+        member_id: {"name_ar": name_ar, "name_fr": name_fr, "pos": list(pos)}
+        for (member_id, name_ar, name_fr), pos in zip(members, rng.sample(far, n_targets))
+    }
+    return grid, targets
+
+
+def generate_procedural_labyrinth(difficulty: int, seed: Optional[int] = None):
+    """
+    Labyrinthe 7x7 pour la difficulté donnée (1 à 3).
+    Retourne (grid, start, targets) comme generate_labyrinth_with_llm,
+    déjà passé par validate_and_fix_labyrinth.
+    """
+    rules = DIFFICULTY_RULES[max(1, min(3, difficulty))]
+    rng = random.Random(seed)
+
+    for _ in range(MAX_DRAWS):
+        drawn = _draw(rng, rules)
+        if drawn is None:
+            continue
+        grid, targets = drawn
+        return validate_and_fix_labyrinth(
+            {"grid": grid, "start": list(START), "targets": targets}, difficulty
+        )
+
+    raise ValueError(f"aucun labyrinthe procédural trouvé pour difficulty={difficulty}")
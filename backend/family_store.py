@@ -0,0 +1,351 @@
+# backend/family_store.py
+
+"""
+Labyrinthes "Cherche la famille" en cours de partie, par identifiant
+(remplace le "dernier labyrinthe généré" global de main.py) :
+/api/family-labyrinth renvoie un labyrinth_id, /api/family-labyrinth/path le reprend.
+
+- identifiant = empreinte du contenu : deux parties sur le même labyrinthe
+  (ex. servi par la réserve) partagent la même entrée
+- nombre d'entrées borné (les moins récemment utilisées partent) et TTL ;
+  en SQLite / base, la purge tourne au plus toutes les FAMILY_STORE_PURGE_SECONDS
+  (pas à chaque écriture)
+- grille encodée en chaîne compacte ("0010000/0100200/...")
+- stockage au choix (FAMILY_STORE_BACKEND) :
+  "memory" (un seul processus), "sqlite" (plusieurs workers sur une machine),
+  "database" (base SQLAlchemy de l'application : plusieurs machines)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from db_models import FamilyLabyrinthState
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+# ================== CONFIG STOCKAGE DES LABYRINTHES ==================
+
+# "memory", "sqlite" ou "database"
+FAMILY_STORE_BACKEND = os.getenv("FAMILY_STORE_BACKEND", "memory")
+
+# Durée de vie d'un labyrinthe depuis sa dernière utilisation (secondes)
+FAMILY_STORE_TTL_SECONDS = float(os.getenv("FAMILY_STORE_TTL_SECONDS", "7200"))
+
+# Nombre maximal de labyrinthes gardés
+FAMILY_STORE_MAX_ENTRIES = int(os.getenv("FAMILY_STORE_MAX_ENTRIES", "10000"))
+
+# Intervalle minimal entre deux purges (TTL + nombre d'entrées) en SQLite / base
+FAMILY_STORE_PURGE_SECONDS = float(os.getenv("FAMILY_STORE_PURGE_SECONDS", "60"))
+
+# Fichier SQLite (backend "sqlite")
+FAMILY_STORE_PATH = Path(os.getenv("FAMILY_STORE_PATH", DATA_DIR / "family_store.sqlite3"))
+
+Labyrinth = Tuple[List[List[int]], List[int], Dict[str, Any]]
+
+
+def labyrinth_id(grid: List[List[int]], start: List[int], targets: Dict[str, Any]) -> str:
+    """
+    Empreinte d'un labyrinthe (deux labyrinthes identiques ont le même id).
+    """
+    material = json.dumps(
+        {"grid": grid, "start": start, "targets": targets}, sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_labyrinth(grid: List[List[int]], start: List[int], targets: Dict[str, Any]) -> str:
+    """
+    Forme compacte : une chaîne de chiffres par ligne de la grille.
+    """
+    return json.dumps(
+        {
+            "g": "/".join("".join(str(cell) for cell in row) for row in grid),
+            "s": start,
+            "t": targets,
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def decode_labyrinth(data: str) -> Labyrinth:
+    raw = json.loads(data)
+    grid = [[int(cell) for cell in row] for row in raw["g"].split("/")]
+    return grid, raw["s"], raw["t"]
+
+
+class MemoryLabyrinthStore:
+    """
+    Dans le processus : OrderedDict en ordre d'utilisation (LRU).
+    """
+
+    backend = "memory"
+
+    def __init__(
+        self,
+        ttl_seconds: float = FAMILY_STORE_TTL_SECONDS,
+        max_entries: int = FAMILY_STORE_MAX_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _put(self, lab_id: str, data: str):
+        with self._lock:
+            self._entries.pop(lab_id, None)
+            self._entries[lab_id] = (data, time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get(self, lab_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(lab_id)
+            if entry is None:
+                return None
+            data, used_at = entry
+            if used_at < time.time() - self.ttl_seconds:
+                del self._entries[lab_id]
+                return None
+            self._entries.move_to_end(lab_id)
+            self._entries[lab_id] = (data, time.time())
+            return data
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteLabyrinthStore:
+    """
+    Fichier SQLite partagé par les workers d'une même machine.
+    """
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        path: Path = FAMILY_STORE_PATH,
+        ttl_seconds: float = FAMILY_STORE_TTL_SECONDS,
+        max_entries: int = FAMILY_STORE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._next_purge = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            # lectures pendant les écritures des autres workers
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS family_labyrinths ("
+                " id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_family_labyrinths_last_used"
+                " ON family_labyrinths (last_used)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _put(self, lab_id: str, data: str):
+        with self._lock:
+            conn = self._connection()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO family_labyrinths (id, data, last_used) VALUES (?, ?, ?)",
+                (lab_id, data, now),
+            )
+            if now >= self._next_purge:
+                self._next_purge = now + FAMILY_STORE_PURGE_SECONDS
+                self._purge(conn, now)
+            conn.commit()
+
+    def _purge(self, conn: sqlite3.Connection, now: float):
+        conn.execute(
+            "DELETE FROM family_labyrinths WHERE last_used < ?", (now - self.ttl_seconds,)
+        )
+        (count,) = conn.execute("SELECT COUNT(*) FROM family_labyrinths").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM family_labyrinths WHERE id IN ("
+                " SELECT id FROM family_labyrinths ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def _get(self, lab_id: str) -> Optional[str]:
+        with self._lock:
+            conn = self._connection()
+            now = time.time()
+            row = conn.execute(
+                "SELECT data FROM family_labyrinths WHERE id = ? AND last_used >= ?",
+                (lab_id, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE family_labyrinths SET last_used = ? WHERE id = ?", (now, lab_id)
+            )
+            conn.commit()
+            return row[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection().execute(
+                "SELECT COUNT(*) FROM family_labyrinths"
+            ).fetchone()
+            return count
+
+
+class DatabaseLabyrinthStore:
+    """
+    Table family_labyrinths de la base de l'application (Postgres) :
+    partagée par toutes les machines.
+    """
+
+    backend = "database"
+
+    def __init__(
+        self,
+        ttl_seconds: float = FAMILY_STORE_TTL_SECONDS,
+        max_entries: int = FAMILY_STORE_MAX_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._next_purge = 0.0
+
+    def _put(self, lab_id: str, data: str):
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            db.merge(FamilyLabyrinthState(id=lab_id, data=data, last_used=now))
+            if time.time() >= self._next_purge:
+                self._next_purge = time.time() + FAMILY_STORE_PURGE_SECONDS
+                self._purge(db, now)
+            db.commit()
+        finally:
+            db.close()
+
+    def _purge(self, db: Session, now: datetime):
+        db.query(FamilyLabyrinthState).filter(
+            FamilyLabyrinthState.last_used < now - timedelta(seconds=self.ttl_seconds)
+        ).delete(synchronize_session=False)
+        overflow = db.query(FamilyLabyrinthState).count() - self.max_entries
+        if overflow > 0:
+            oldest = (
+                db.query(FamilyLabyrinthState.id)
+                .order_by(FamilyLabyrinthState.last_used)
+                .limit(overflow)
+                .subquery()
+            )
+            db.query(FamilyLabyrinthState).filter(
+                FamilyLabyrinthState.id.in_(oldest.select())
+            ).delete(synchronize_session=False)
+
+    def _get(self, lab_id: str) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            row = db.get(FamilyLabyrinthState, lab_id)
+            if row is None or row.last_used < now - timedelta(seconds=self.ttl_seconds):
+                return None
+            row.last_used = now
+            db.commit()
+            return row.data
+        finally:
+            db.close()
+
+    def __len__(self) -> int:
+        db = SessionLocal()
+        try:
+            return db.query(FamilyLabyrinthState).count()
+        finally:
+            db.close()
+
+
+class LabyrinthStore:
+    """
+    Façade commune aux trois stockages : put / get en (grid, start, targets).
+    Méthodes bloquantes (SQLite / base) : à appeler hors de la boucle async.
+    """
+
+    def __init__(self, backend: str = FAMILY_STORE_BACKEND):
+        if backend == "sqlite":
+            self._store = SQLiteLabyrinthStore()
+        elif backend == "database":
+            self._store = DatabaseLabyrinthStore()
+        else:
+            self._store = MemoryLabyrinthStore()
+        self.puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def put(
+        self, grid: List[List[int]], start: List[int], targets: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Enregistre le labyrinthe et renvoie son labyrinth_id,
+        ou None si l'écriture a échoué (l'id serait inconnu de get()).
+        """
+        lab_id = labyrinth_id(grid, start, targets)
+        try:
+            self._store._put(lab_id, encode_labyrinth(grid, start, targets))
+        except Exception as e:
+            self.errors += 1
+            print(f"[family store] écriture du labyrinthe {lab_id} impossible : {e}")
+            return None
+        self.puts += 1
+        return lab_id
+
+    def get(self, lab_id: str) -> Optional[Labyrinth]:
+        """
+        (grid, start, targets), ou None si l'id est inconnu ou expiré.
+        """
+        try:
+            data = self._store._get(lab_id)
+        except Exception as e:
+            self.errors += 1
+            print(f"[family store] lecture du labyrinthe {lab_id} impossible : {e}")
+            return None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return decode_labyrinth(data)
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entries = len(self._store)
+        except Exception:
+            entries = None
+        return {
+            "backend": self._store.backend,
+            "entries": entries,
+            "ttl_seconds": self._store.ttl_seconds,
+            "max_entries": self._store.max_entries,
+            "puts": self.puts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+FAMILY_STORE = LabyrinthStore()
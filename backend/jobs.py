@@ -0,0 +1,350 @@
+# backend/jobs.py
+
+"""
+Jobs asynchrones pour les générations longues (histoire, labyrinthe),
+plus longues que le timeout de certains proxys :
+
+- submit() renvoie tout de suite un identifiant ; la génération tourne
+  en tâche de fond
+- get() : statut, étape en cours (signalée via progress.py) et résultat
+- subscribe() : un instantané à chaque changement (abonnement SSE)
+- chaque job est enregistré en base (GenerationJob) : un résultat terminé
+  survit à un redémarrage
+- un job en cours appartient au worker qui l'exécute (owner) : ce worker
+  renouvelle son bail (heartbeat_at, avec le statut, l'étape et la
+  tentative) toutes les JOB_HEARTBEAT_SECONDS ; un job dont le bail a
+  expiré (worker arrêté) est marqué en erreur (recover, au démarrage puis à chaque battement)
+- un job exécuté par un autre worker est suivi en relisant la base
+- les jobs terminés sont gardés JOB_TTL_SECONDS
+"""
+
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import or_
+
+from db import SessionLocal
+from db_models import GenerationJob
+from progress import track_progress
+
+# Durée de conservation d'un job terminé (secondes)
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "86400"))
+
+# Renouvellement du bail d'un job en cours, et durée après laquelle
+# un bail non renouvelé est considéré comme abandonné (secondes)
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "5"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+
+# Relecture en base d'un job exécuté par un autre worker (abonnement SSE)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+FINISHED_STATUSES = ("done", "error")
+
+# Identifiant de ce processus dans la colonne owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _is_expired(job: Dict[str, Any]) -> bool:
+    finished_at = job.get("finished_at")
+    return finished_at is not None and (
+        finished_at + timedelta(seconds=JOB_TTL_SECONDS) < datetime.utcnow()
+    )
+
+
+def _row_to_job(row: GenerationJob) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "kind": row.kind,
+        "params": json.loads(row.params) if row.params else {},
+        "status": row.status,
+        "stage": row.stage,
+        "attempt": row.attempt,
+        "result": json.loads(row.result) if row.result else None,
+        "error": row.error,
+        "created_at": row.created_at,
+        "finished_at": row.finished_at,
+    }
+
+
+def snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copie d'un job sérialisable en JSON (dates ISO).
+    """
+    data = dict(job)
+    for field in ("created_at", "finished_at"):
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    return data
+
+
+class JobStore:
+    """
+    Jobs en mémoire (ceux de ce processus) + table generation_jobs.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    # ---------- base de données (appelé dans un thread) ----------
+
+    def _save(self, job: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            finished = job["status"] in FINISHED_STATUSES
+            db.merge(
+                GenerationJob(
+                    id=job["id"],
+                    kind=job["kind"],
+                    params=json.dumps(job["params"], ensure_ascii=False),
+                    status=job["status"],
+                    stage=job["stage"],
+                    attempt=job["attempt"],
+                    result=(
+                        json.dumps(job["result"], ensure_ascii=False)
+                        if job["result"] is not None
+                        else None
+                    ),
+                    error=job["error"],
+                    created_at=job["created_at"],
+                    finished_at=job["finished_at"],
+                    owner=WORKER_ID,
+                    heartbeat_at=None if finished else datetime.utcnow(),
+                )
+            )
+            db.commit()
+        except Exception as e:
+            print(f"[jobs] enregistrement du job {job['id']} impossible : {e}")
+        finally:
+            db.close()
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            row = db.get(GenerationJob, job_id)
+            return _row_to_job(row) if row is not None else None
+        except Exception as e:
+            print(f"[jobs] lecture du job {job_id} impossible : {e}")
+            return None
+        finally:
+            db.close()
+
+    def _heartbeat(self, jobs: List[Dict[str, Any]]):
+        """
+        Renouvelle le bail des jobs en cours de ce worker
+        (et enregistre leur statut / étape / tentative, pour les autres workers).
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            for job in jobs:
+                db.query(GenerationJob).filter(
+                    GenerationJob.id == job["id"],
+                    GenerationJob.owner == WORKER_ID,
+                    GenerationJob.status.notin_(FINISHED_STATUSES),
+                ).update(
+                    {
+                        "status": job["status"],
+                        "stage": job["stage"],
+                        "attempt": job["attempt"],
+                        "heartbeat_at": now,
+                    },
+                    synchronize_session=False,
+                )
+            db.commit()
+        except Exception as e:
+            print(f"[jobs] renouvellement des baux impossible : {e}")
+        finally:
+            db.close()
+
+    def recover(self):
+        """
+        Les jobs "queued" / "running" dont le bail a expiré ont été interrompus
+        par l'arrêt de leur worker : marqués en erreur. Les jobs des autres
+        workers encore vivants ne sont pas touchés. Les jobs expirés sont supprimés.
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            lease_limit = now - timedelta(seconds=JOB_LEASE_SECONDS)
+            interrupted = (
+                db.query(GenerationJob)
+                .filter(
+                    GenerationJob.status.notin_(FINISHED_STATUSES),
+                    or_(GenerationJob.heartbeat_at.is_(None), GenerationJob.heartbeat_at < lease_limit),
+                )
+                .update(
+                    {
+                        "status": "error",
+                        "error": "interrompu par l'arrêt du serveur",
+                        "finished_at": now,
+                        "heartbeat_at": None,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            expired = (
+                db.query(GenerationJob)
+                .filter(GenerationJob.finished_at < now - timedelta(seconds=JOB_TTL_SECONDS))
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            if interrupted or expired:
+                print(f"[jobs] {interrupted} job(s) interrompu(s), {expired} expiré(s) supprimé(s)")
+        finally:
+            db.close()
+
+    async def run(self):
+        """
+        Boucle des baux : renouvelle ceux des jobs de ce worker et
+        marque en erreur les jobs abandonnés par un worker arrêté.
+        """
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            running = [self.jobs[job_id] for job_id in self._tasks if job_id in self.jobs]
+            if running:
+                await asyncio.to_thread(self._heartbeat, running)
+            try:
+                await asyncio.to_thread(self.recover)
+            except Exception as e:
+                print("[jobs] reprise impossible :", e)
+
+    # ---------- cycle de vie ----------
+
+    async def submit(
+        self, kind: str, params: Dict[str, Any], fn: Callable[[], Awaitable[Any]]
+    ) -> Dict[str, Any]:
+        """
+        Enregistre le job et lance `fn()` en tâche de fond ;
+        son résultat (JSON) devient le résultat du job.
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": params,
+            "status": "queued",
+            "stage": None,
+            "attempt": None,
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "finished_at": None,
+        }
+        for expired in [jid for jid, j in self.jobs.items() if _is_expired(j)]:
+            del self.jobs[expired]
+        self.jobs[job["id"]] = job
+        self.submitted += 1
+        await asyncio.to_thread(self._save, job)
+
+        task = asyncio.create_task(self._run(job, fn))
+        self._tasks[job["id"]] = task
+        task.add_done_callback(lambda t: self._tasks.pop(job["id"], None))
+        return snapshot(job)
+
+    def _update(self, job: Dict[str, Any], **fields: Any):
+        job.update(fields)
+        state = snapshot(job)
+        for queue in self._subscribers.get(job["id"], []):
+            queue.put_nowait(state)
+
+    async def _run(self, job: Dict[str, Any], fn: Callable[[], Awaitable[Any]]):
+        self._update(job, status="running")
+
+        def on_stage(stage: str, details: Dict[str, Any]):
+            self._update(job, stage=stage, attempt=details.get("attempt"))
+
+        try:
+            with track_progress(on_stage):
+                result = await fn()
+        except Exception as e:
+            print(f"[jobs] job {job['id']} ({job['kind']}) KO :", e)
+            self.failed += 1
+            final = {"status": "error", "error": str(e) or type(e).__name__}
+        else:
+            self.completed += 1
+            final = {"status": "done", "result": result}
+
+        job.update(final, finished_at=datetime.utcnow())
+        # enregistré avant d'annoncer la fin : un client qui relit trouve le résultat
+        await asyncio.to_thread(self._save, job)
+        self._update(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Instantané du job, ou None s'il est inconnu ou expiré.
+        Mémoire pour les jobs de ce worker et les jobs terminés ; un job
+        en cours sur un autre worker est relu en base à chaque appel.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = await asyncio.to_thread(self._load, job_id)
+            if job is None:
+                return None
+            if job["status"] in FINISHED_STATUSES:
+                self.jobs[job_id] = job
+        if _is_expired(job):
+            self.jobs.pop(job_id, None)
+            return None
+        return snapshot(job)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Instantané courant, puis un instantané à chaque changement,
+        jusqu'à la fin du job. Un job d'un autre worker est relu en base
+        toutes les JOB_POLL_SECONDS.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        try:
+            state = await self.get(job_id)
+            while state is not None:
+                yield state
+                if state["status"] in FINISHED_STATUSES:
+                    return
+                if job_id in self._tasks:
+                    state = await queue.get()
+                else:
+                    state = await self._poll(job_id, state)
+        finally:
+            self._subscribers[job_id].remove(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    async def _poll(self, job_id: str, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Attend qu'un job d'un autre worker change en base (statut, étape ou tentative).
+        """
+        while True:
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            current = await self.get(job_id)
+            if current is None or (current["status"], current["stage"], current["attempt"]) != (
+                state["status"],
+                state["stage"],
+                state["attempt"],
+            ):
+                return current
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker": WORKER_ID,
+            "running": len(self._tasks),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+JOBS = JobStore()
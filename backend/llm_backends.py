@@ -0,0 +1,172 @@
+# backend/llm_backends.py
+
+"""
+Répartition des appels LLM entre plusieurs serveurs Ollama (OLLAMA_URLS).
+
+- le choix du serveur de chaque appel revient à LLMScheduler (llm_scheduler.py)
+- contrôle de santé passif : un serveur qui enchaîne les erreurs est écarté
+  pendant LLM_BACKEND_DOWN_SECONDS, puis retenté
+- latences récentes par type d'appel, pour le délai des requêtes "hedgées"
+  (voir llm_gateway._send_hedged)
+"""
+
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+# ================== CONFIG REPARTITION ==================
+
+# Erreurs consécutives (réseau, 5xx) avant d'écarter un serveur
+LLM_BACKEND_MAX_FAILURES = int(os.getenv("LLM_BACKEND_MAX_FAILURES", "2"))
+
+# Durée pendant laquelle un serveur en erreur est écarté
+LLM_BACKEND_DOWN_SECONDS = float(os.getenv("LLM_BACKEND_DOWN_SECONDS", "15"))
+
+# Requêtes "hedgées" : si la réponse tarde, une copie part vers un 2e serveur
+# et la première réponse gagne (l'autre requête est annulée)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+
+# Délai avant la copie : ce percentile des latences récentes du type d'appel...
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+
+# ... jamais moins que ce délai (secondes)
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+
+# Pas de copie tant qu'on n'a pas assez de mesures pour estimer le percentile
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Nombre de latences gardées par type d'appel
+LLM_LATENCY_WINDOW = 200
+
+
+class Backend:
+    """
+    Un serveur Ollama : son client HTTP (pool keep-alive)
+    et son état (requêtes en cours, erreurs consécutives).
+    """
+
+    def __init__(self, url: str, client_factory: Callable[[str], httpx.AsyncClient]):
+        self.url = url
+        self._client_factory = client_factory
+        self._client: Optional[httpx.AsyncClient] = None
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.down_until = 0.0
+        # appelé quand le serveur est écarté ou revient (voir BackendPool.on_health_change)
+        self.on_health_change: Optional[Callable[["Backend"], None]] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._client_factory(self.url)
+        return self._client
+
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def _health_changed(self):
+        if self.on_health_change is not None:
+            self.on_health_change(self)
+
+    def record_success(self):
+        was_down = self.down_until > 0
+        self.failures = 0
+        self.down_until = 0.0
+        if was_down:
+            self._health_changed()
+
+    def record_failure(self):
+        self.errors += 1
+        self.failures += 1
+        if self.failures >= LLM_BACKEND_MAX_FAILURES:
+            was_healthy = self.is_healthy()
+            if was_healthy:
+                print(f"[LLM] serveur {self.url} écarté {LLM_BACKEND_DOWN_SECONDS:.0f}s")
+            self.down_until = time.monotonic() + LLM_BACKEND_DOWN_SECONDS
+            if was_healthy:
+                self._health_changed()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.is_healthy(),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class BackendPool:
+    """
+    Ensemble des serveurs Ollama ; le serveur de chaque appel
+    est choisi par LLMScheduler.
+    """
+
+    def __init__(self, urls: List[str], client_factory: Callable[[str], httpx.AsyncClient]):
+        self.backends = [Backend(url, client_factory) for url in urls]
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def on_health_change(self, callback: Callable[[Backend], None]):
+        """
+        `callback(backend)` à chaque serveur écarté ou revenu.
+        """
+        for backend in self.backends:
+            backend.on_health_change = callback
+
+    @contextmanager
+    def track(self, backend: Backend):
+        """
+        Compte une requête en cours sur `backend` pendant le bloc.
+        """
+        backend.outstanding += 1
+        backend.requests += 1
+        try:
+            yield backend
+        finally:
+            backend.outstanding -= 1
+
+    def record_latency(self, call_type: str, seconds: float):
+        window = self.latencies.setdefault(call_type, deque(maxlen=LLM_LATENCY_WINDOW))
+        window.append(seconds)
+
+    def hedge_delay(self, call_type: str) -> Optional[float]:
+        """
+        Délai avant d'envoyer une copie de la requête, ou None s'il ne faut pas de copie
+        (désactivé, un seul serveur, pas assez de mesures).
+        """
+        window = self.latencies.get(call_type)
+        if not LLM_HEDGE_ENABLED or len(self.backends) < 2:
+            return None
+        if window is None or len(window) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(window)
+        index = min(int(len(ordered) * LLM_HEDGE_PERCENTILE / 100), len(ordered) - 1)
+        return max(ordered[index], LLM_HEDGE_MIN_DELAY)
+
+    async def close(self):
+        for backend in self.backends:
+            await backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backends": [b.stats() for b in self.backends],
+            "hedging": LLM_HEDGE_ENABLED,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
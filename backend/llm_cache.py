@@ -0,0 +1,202 @@
+# backend/llm_cache.py
+
+"""
+Cache disque des réponses LLM, adressé par le contenu de la requête :
+clé = hash de (modèle, endpoint, prompt / messages, options, format).
+
+Utilisé par llm_gateway.py, donc sous tous les appelants d'Ollama
+(story_bot/service.py, family_llm_service.py).
+
+- SQLite (bibliothèque standard) : survit aux redémarrages
+- taille bornée, éviction LRU (dernière utilisation)
+- TTL optionnel
+- une fraction des requêtes ignore le cache pour garder de la variété
+  (le résultat frais remplace alors l'entrée)
+- mode lecture seule pour les tests hors ligne (rien n'est écrit)
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+# ================== CONFIG CACHE LLM ==================
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+
+# Fichier SQLite du cache
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", DATA_DIR / "llm_cache.sqlite3"))
+
+# Nombre maximal de réponses gardées (les moins récemment utilisées partent)
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Durée de vie d'une réponse en secondes (0 = pas d'expiration)
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "0"))
+
+# Lecture seule : on sert les réponses connues, on n'écrit rien
+LLM_CACHE_READ_ONLY = os.getenv("LLM_CACHE_READ_ONLY", "0") == "1"
+
+# Part des requêtes qui ignorent le cache (variété), par type d'appel.
+# Surchargeable via LLM_CACHE_BYPASS_<TYPE>.
+LLM_CACHE_BYPASS_RATES = {
+    call_type: float(os.getenv(f"LLM_CACHE_BYPASS_{call_type.upper()}", rate))
+    for call_type, rate in (
+        ("story", 0.3),
+        ("translation", 0.0),
+        ("labyrinth", 0.3),
+    )
+}
+
+
+def make_key(path: str, payload: Dict[str, Any]) -> str:
+    """
+    Clé du cache pour une requête Ollama (sans le champ "stream" :
+    une réponse streamée et une réponse complète sont interchangeables).
+    """
+    material = {
+        "path": path,
+        "model": payload.get("model"),
+        "prompt": payload.get("prompt"),
+        "messages": payload.get("messages"),
+        "options": payload.get("options") or {},
+        "format": payload.get("format"),
+    }
+    return hashlib.sha256(
+        json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+class LLMCache:
+    """
+    Réponses LLM par clé, dans une base SQLite.
+    Une seule connexion partagée, protégée par un verrou
+    (les appels viennent de la boucle async et de threads).
+    """
+
+    def __init__(
+        self,
+        path: Path = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        read_only: bool = LLM_CACHE_READ_ONLY,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.writes = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            if self.read_only:
+                if not self.path.exists():
+                    return None
+                uri = f"{self.path.resolve().as_uri()}?mode=ro"
+                self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            else:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY,"
+                    " response TEXT NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " last_used REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used"
+                    " ON llm_cache (last_used)"
+                )
+                self._conn.commit()
+        return self._conn
+
+    def should_bypass(self, call_type: str) -> bool:
+        """
+        Tirage "variété" : vrai si cette requête doit ignorer le cache.
+        """
+        if random.random() < LLM_CACHE_BYPASS_RATES.get(call_type, 0.0):
+            self.bypassed += 1
+            return True
+        return False
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            try:
+                conn = self._connection()
+                if conn is None:
+                    self.misses += 1
+                    return None
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or (
+                    self.ttl_seconds and row[1] < time.time() - self.ttl_seconds
+                ):
+                    self.misses += 1
+                    return None
+                if not self.read_only:
+                    conn.execute(
+                        "UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key)
+                    )
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"[LLM cache] lecture impossible : {e}")
+                return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, response: str):
+        if self.read_only or not response.strip():
+            return
+        with self._lock:
+            try:
+                conn = self._connection()
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_used)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, response, now, now),
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+                if count > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN ("
+                        " SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"[LLM cache] écriture impossible : {e}")
+                return
+        self.writes += 1
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "read_only": self.read_only,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "writes": self.writes,
+        }
+
+
+LLM_CACHE = LLMCache()
@@ -0,0 +1,799 @@
+# backend/llm_gateway.py
+
+"""
+Passerelle LLM partagée par tous les appelants d'Ollama
+(story_bot/service.py, family_llm_service.py, endpoints FastAPI).
+
+- un client HTTP asynchrone (httpx) avec pool keep-alive par serveur Ollama,
+  appels répartis entre les serveurs (llm_backends.py)
+- configuration unique (URL, modèles) lue depuis les variables d'environnement
+- timeout et nombre de retries par type d'appel ("story", "translation", "labyrinth")
+- disjoncteur (circuit breaker) : quand Ollama est en panne ou trop lent,
+  les appels échouent tout de suite au lieu d'attendre le timeout
+- cache disque des réponses (llm_cache.py) devant tous les appels
+- routage par niveaux de modèles : passage à un modèle plus petit quand
+  la latence dépasse l'objectif (SLO), retour au grand modèle ensuite
+- keep_alive explicite (modèle gardé en mémoire) et suivi des tokens de prompt
+  évalués par Ollama, pour mesurer les gains du cache de préfixe
+- nombre d'appels simultanés borné par serveur, file à priorités
+  (llm_scheduler.py)
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from llm_backends import Backend, BackendPool
+from llm_cache import LLM_CACHE, LLM_CACHE_ENABLED, make_key
+from llm_scheduler import LLM_CONCURRENCY_PER_BACKEND, LLMScheduler
+
+# ================== CONFIG OLLAMA ==================
+
+# URL du serveur Ollama
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+
+# Plusieurs serveurs Ollama, séparés par des virgules (défaut : OLLAMA_URL seul)
+OLLAMA_URLS = [
+    url.strip() for url in os.getenv("OLLAMA_URLS", OLLAMA_URL).split(",") if url.strip()
+]
+
+# Modèle utilisé pour chaque type d'appel
+MODELS = {
+    "story": os.getenv("OLLAMA_STORY_MODEL", os.getenv("OLLAMA_MODEL", "qwen2.5:7b-instruct")),
+    "translation": os.getenv(
+        "OLLAMA_TRANSLATION_MODEL", os.getenv("OLLAMA_MODEL", "qwen2.5:7b-instruct")
+    ),
+    "labyrinth": os.getenv("OLLAMA_LABYRINTH_MODEL", "qwen2.5:1.5b-instruct"),
+}
+
+# Niveaux de modèles par type d'appel, du plus grand au plus petit.
+# LLM_MODEL_TIERS_<TYPE>, séparés par des virgules, ex :
+#   LLM_MODEL_TIERS_STORY=qwen2.5:7b-instruct,qwen2.5:3b-instruct,qwen2.5:1.5b-instruct
+# Par défaut un seul niveau (le modèle de MODELS) : pas de déclassement.
+MODEL_TIERS = {
+    call_type: [
+        m.strip() for m in os.getenv(f"LLM_MODEL_TIERS_{call_type.upper()}", model).split(",")
+        if m.strip()
+    ]
+    for call_type, model in MODELS.items()
+}
+
+# Objectif de latence (p95, secondes) par type d'appel.
+# Surchargeable via LLM_SLO_<TYPE>.
+LATENCY_SLO = {
+    call_type: float(os.getenv(f"LLM_SLO_{call_type.upper()}", slo))
+    for call_type, slo in (("story", 20), ("translation", 20), ("labyrinth", 10))
+}
+
+# Mesures nécessaires avant de juger un modèle, et taille de la fenêtre
+LLM_ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "10"))
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "50"))
+
+# Délai minimal entre deux changements de niveau pour un type d'appel
+LLM_ROUTER_COOLDOWN = float(os.getenv("LLM_ROUTER_COOLDOWN", "60"))
+
+# On remonte d'un niveau quand le p95 du niveau courant passe sous SLO x ce ratio
+LLM_ROUTER_UPGRADE_RATIO = float(os.getenv("LLM_ROUTER_UPGRADE_RATIO", "0.5"))
+
+# Timeout (secondes) et nombre de retries pour chaque type d'appel.
+# Surchargeables via LLM_TIMEOUT_<TYPE> et LLM_RETRIES_<TYPE>.
+CALL_CONFIG = {
+    call_type: {
+        "timeout": float(os.getenv(f"LLM_TIMEOUT_{call_type.upper()}", timeout)),
+        "retries": int(os.getenv(f"LLM_RETRIES_{call_type.upper()}", retries)),
+    }
+    for call_type, timeout, retries in (
+        ("story", 120, 1),
+        ("translation", 120, 1),
+        ("labyrinth", 60, 0),
+    )
+}
+
+# Taille du pool de connexions vers chaque serveur Ollama
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+# Délai de base entre deux tentatives (doublé à chaque retry)
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+
+# Durée pendant laquelle Ollama garde le modèle (et son cache de préfixe)
+# en mémoire après un appel (format Ollama : "30m", "1h", "-1" = toujours)
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+
+
+# Disjoncteur : nombre d'échecs consécutifs avant ouverture
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+
+# Un appel plus long que ça compte comme un échec (Ollama surchargé)
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "60"))
+
+# Durée pendant laquelle le disjoncteur reste ouvert avant un appel de test
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+
+class LLMError(Exception):
+    """L'appel au LLM a échoué après toutes les tentatives."""
+
+
+class LLMUnavailable(LLMError):
+    """Le disjoncteur est ouvert : l'appel n'a pas été tenté."""
+
+
+# ================== DISJONCTEUR ==================
+
+
+class CircuitBreaker:
+    """
+    Trois états :
+    - "closed" : les appels passent ; LLM_BREAKER_FAILURES échecs (ou appels
+      trop lents) consécutifs ouvrent le disjoncteur
+    - "open" : les appels échouent immédiatement (LLMUnavailable)
+    - "half_open" : après LLM_BREAKER_OPEN_SECONDS, un seul appel de test passe ;
+      s'il réussit on referme, sinon on rouvre pour une nouvelle période
+      (si l'appel de test est abandonné, un autre est autorisé
+      après LLM_BREAKER_SLOW_SECONDS)
+    """
+
+    def __init__(
+        self,
+        max_failures: int = LLM_BREAKER_FAILURES,
+        slow_seconds: float = LLM_BREAKER_SLOW_SECONDS,
+        open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+    ):
+        self.max_failures = max_failures
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+
+    def _probe_allowed(self) -> bool:
+        now = time.monotonic()
+        if self.state == "open":
+            return now - self.opened_at >= self.open_seconds
+        return now - self.probe_started_at >= self.slow_seconds
+
+    def is_available(self) -> bool:
+        """
+        Vrai si un appel a une chance de passer (sans rien réserver).
+        """
+        return self.state == "closed" or self._probe_allowed()
+
+    def before_call(self):
+        """
+        À appeler avant chaque tentative ; lève LLMUnavailable si ouvert.
+        """
+        if self.state == "closed":
+            return
+        if self._probe_allowed():
+            # cet appel sert de test ; les autres échouent en attendant son résultat
+            self.state = "half_open"
+            self.probe_started_at = time.monotonic()
+            return
+        self.rejected += 1
+        raise LLMUnavailable("Ollama indisponible (disjoncteur ouvert)")
+
+    def record_success(self, duration: float):
+        if duration > self.slow_seconds:
+            self.record_failure()
+            return
+        if self.state != "closed":
+            print("[LLM] disjoncteur refermé, Ollama répond de nouveau")
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.max_failures:
+            if self.state != "open":
+                self.trips += 1
+                print(f"[LLM] disjoncteur ouvert pour {self.open_seconds:.0f}s")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+BREAKER = CircuitBreaker()
+
+
+def is_available() -> bool:
+    """
+    Faux quand le disjoncteur est ouvert : inutile d'appeler Ollama,
+    mieux vaut servir du contenu hors ligne.
+    """
+    return BREAKER.is_available()
+
+
+# ================== ROUTAGE PAR NIVEAUX DE MODELES ==================
+
+
+class ModelRouter:
+    """
+    Choisit le modèle de chaque type d'appel parmi MODEL_TIERS.
+    Suit la latence récente par (type d'appel, modèle) :
+    - p95 du niveau courant > SLO : on descend d'un niveau (modèle plus petit)
+    - p95 du niveau courant < SLO x LLM_ROUTER_UPGRADE_RATIO : on remonte d'un niveau
+    Au plus un changement par LLM_ROUTER_COOLDOWN secondes et par type d'appel.
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, List[str]] = MODEL_TIERS,
+        slo: Dict[str, float] = LATENCY_SLO,
+    ):
+        self.tiers = tiers
+        self.slo = slo
+        self.current = {call_type: 0 for call_type in tiers}
+        self.changed_at = {call_type: 0.0 for call_type in tiers}
+        self.latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self.downgrades = 0
+        self.upgrades = 0
+
+    def choose(self, call_type: str) -> str:
+        return self.tiers[call_type][self.current[call_type]]
+
+    def p95(self, call_type: str, model: str) -> Optional[float]:
+        window = self.latencies.get((call_type, model))
+        if window is None or len(window) < LLM_ROUTER_MIN_SAMPLES:
+            return None
+        ordered = sorted(window)
+        return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+    def record(self, call_type: str, model: str, seconds: float):
+        window = self.latencies.setdefault(
+            (call_type, model), deque(maxlen=LLM_ROUTER_WINDOW)
+        )
+        window.append(seconds)
+
+        tier = self.current[call_type]
+        if model != self.tiers[call_type][tier]:
+            return
+        if time.monotonic() - self.changed_at[call_type] < LLM_ROUTER_COOLDOWN:
+            return
+        p95 = self.p95(call_type, model)
+        if p95 is None:
+            return
+
+        if p95 > self.slo[call_type] and tier + 1 < len(self.tiers[call_type]):
+            self._switch(call_type, tier + 1, p95)
+            self.downgrades += 1
+        elif p95 < self.slo[call_type] * LLM_ROUTER_UPGRADE_RATIO and tier > 0:
+            self._switch(call_type, tier - 1, p95)
+            self.upgrades += 1
+
+    def _switch(self, call_type: str, tier: int, p95: float):
+        model = self.tiers[call_type][tier]
+        print(f"[LLM] {call_type} : p95 {p95:.1f}s -> modèle {model}")
+        self.current[call_type] = tier
+        self.changed_at[call_type] = time.monotonic()
+        # les anciennes mesures de ce modèle ne reflètent plus la charge actuelle
+        self.latencies.pop((call_type, model), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": {call_type: self.choose(call_type) for call_type in self.tiers},
+            "p95": {
+                f"{call_type}/{model}": self.p95(call_type, model)
+                for (call_type, model) in self.latencies
+            },
+            "downgrades": self.downgrades,
+            "upgrades": self.upgrades,
+        }
+
+
+ROUTER = ModelRouter()
+
+# Modèles ayant servi les appels LLM du contexte courant (voir record_models)
+_served_models: ContextVar[Optional[List[str]]] = ContextVar("llm_served_models", default=None)
+
+
+@contextmanager
+def record_models():
+    """
+    Note les modèles qui servent les appels LLM faits dans le bloc
+    (y compris dans les tâches asyncio créées depuis le bloc) :
+
+        with llm_gateway.record_models() as models:
+            story = await generate_story_with_llm(...)
+        GameLog(..., model_name=llm_gateway.model_names(models))
+    """
+    models: List[str] = []
+    token = _served_models.set(models)
+    try:
+        yield models
+    finally:
+        _served_models.reset(token)
+
+
+def note_model(model: str):
+    """
+    Ajoute `model` aux modèles du contexte courant (s'il y en a un).
+    """
+    models = _served_models.get()
+    if models is not None and model not in models:
+        models.append(model)
+
+
+def model_names(models: List[str]) -> Optional[str]:
+    return ",".join(models) or None
+
+
+# ================== SUIVI DE L'EVALUATION DES PROMPTS ==================
+
+
+class PromptStats:
+    """
+    Cumule, par type d'appel, les compteurs renvoyés par Ollama :
+    tokens de prompt réellement évalués (prompt_eval_count : plus bas quand
+    le préfixe est déjà dans le cache KV) et tokens générés (eval_count).
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def record(self, call_type: str, data: Dict[str, Any]):
+        totals = self.totals.setdefault(
+            call_type,
+            {"calls": 0, "prompt_eval_count": 0, "prompt_eval_ms": 0.0, "eval_count": 0},
+        )
+        totals["calls"] += 1
+        totals["prompt_eval_count"] += data.get("prompt_eval_count") or 0
+        totals["prompt_eval_ms"] += (data.get("prompt_eval_duration") or 0) / 1e6
+        totals["eval_count"] += data.get("eval_count") or 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            call_type: {
+                **totals,
+                "avg_prompt_eval_count": totals["prompt_eval_count"] / totals["calls"],
+                "avg_prompt_eval_ms": totals["prompt_eval_ms"] / totals["calls"],
+            }
+            for call_type, totals in self.totals.items()
+        }
+
+
+PROMPT_STATS = PromptStats()
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "breaker": BREAKER.stats(),
+        "cache": LLM_CACHE.stats(),
+        "router": ROUTER.stats(),
+        "prompt_eval": PROMPT_STATS.stats(),
+        "scheduler": SCHEDULER.stats(),
+        **BACKENDS.stats(),
+    }
+
+
+# ================== CLIENTS HTTP PARTAGÉS ==================
+
+
+def make_client(url: str) -> httpx.AsyncClient:
+    """
+    Client HTTP d'un serveur Ollama (créé au premier appel vers ce serveur).
+    """
+    return httpx.AsyncClient(
+        base_url=url,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+BACKENDS = BackendPool(OLLAMA_URLS, make_client)
+
+SCHEDULER = LLMScheduler(lambda: BACKENDS.backends, LLM_CONCURRENCY_PER_BACKEND)
+BACKENDS.on_health_change(SCHEDULER.health_changed)
+
+
+async def close_client():
+    """
+    Ferme les clients HTTP et le cache (appelé à l'arrêt de l'application).
+    """
+    await BACKENDS.close()
+    LLM_CACHE.close()
+
+
+def _call_config(call_type: str) -> Dict[str, Any]:
+    if call_type not in CALL_CONFIG:
+        raise ValueError(f"type d'appel LLM inconnu : {call_type}")
+    return CALL_CONFIG[call_type]
+
+
+def _timeout(call_type: str) -> httpx.Timeout:
+    return httpx.Timeout(_call_config(call_type)["timeout"], connect=5.0)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """
+    On réessaie les erreurs réseau et les erreurs serveur (5xx, 429),
+    pas les requêtes invalides (4xx).
+    """
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code >= 500 or code == 429
+    return False
+
+
+# Générations qui doivent produire une nouvelle variante (voir fresh_variants)
+_fresh_variants: ContextVar[bool] = ContextVar("llm_fresh_variants", default=False)
+
+# Types d'appel servis depuis le cache même pour une nouvelle variante :
+# la traduction d'un texte FR identique est la même
+VARIANT_CACHED_CALL_TYPES = ("translation",)
+
+
+@contextmanager
+def fresh_variants():
+    """
+    Les appels LLM du bloc (et des tâches créées depuis le bloc) ne lisent
+    pas le cache, sauf les traductions : pour remplir une réserve ou ajouter
+    une variante en base, une réponse déjà vue ne sert à rien.
+    """
+    token = _fresh_variants.set(True)
+    try:
+        yield
+    finally:
+        _fresh_variants.reset(token)
+
+
+# Fonction de contrôle d'une réponse : seules les réponses pour lesquelles
+# elle renvoie vrai sont servies depuis le cache ou enregistrées dedans
+Cacheable = Optional[Callable[[str], bool]]
+
+
+async def _cache_lookup(
+    path: str, payload: Dict[str, Any], call_type: str, cache: bool, cacheable: Cacheable
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Renvoie (clé, réponse en cache ou None). Clé None : cache désactivé.
+    Avec cache=False, dans fresh_variants() (hors traduction) ou sur tirage
+    "variété", on ne lit pas le cache mais la nouvelle réponse y sera enregistrée.
+    """
+    if not LLM_CACHE_ENABLED:
+        return None, None
+    key = make_key(path, payload)
+    if _fresh_variants.get() and call_type not in VARIANT_CACHED_CALL_TYPES:
+        cache = False
+    if not cache or LLM_CACHE.should_bypass(call_type):
+        return key, None
+
+    text = await asyncio.to_thread(LLM_CACHE.get, key)
+    if text is not None and cacheable is not None and not cacheable(text):
+        text = None
+    return key, text
+
+
+async def _cache_store(key: Optional[str], text: str, cacheable: Cacheable):
+    if key is None or not text.strip():
+        return
+    if cacheable is None or cacheable(text):
+        await asyncio.to_thread(LLM_CACHE.put, key, text)
+
+
+async def _send(
+    backend: Backend, path: str, payload: Dict[str, Any], call_type: str
+) -> Dict[str, Any]:
+    """
+    Un POST vers un serveur donné ; met à jour sa santé et les latences.
+    """
+    started_at = time.monotonic()
+    with BACKENDS.track(backend):
+        try:
+            resp = await backend.client.post(path, json=payload, timeout=_timeout(call_type))
+            resp.raise_for_status()
+            data = resp.json()
+        except Exception as e:
+            if _is_retryable(e):
+                backend.record_failure()
+            raise
+    backend.record_success()
+    BACKENDS.record_latency(call_type, time.monotonic() - started_at)
+    return data
+
+
+async def _send_hedged(
+    primary: Backend, path: str, payload: Dict[str, Any], call_type: str, tried: set
+) -> Dict[str, Any]:
+    """
+    Envoie la requête à `primary` (place déjà prise par l'appelant). Si elle
+    dépasse le délai de BACKENDS.hedge_delay (p95 récent) et qu'un autre serveur
+    a une place libre, une copie part vers lui : la première réponse réussie
+    gagne, l'autre requête est annulée (ce qui ferme sa connexion et arrête
+    la génération côté Ollama). Les serveurs utilisés sont ajoutés à `tried`.
+    """
+    tried.add(primary)
+    delay = BACKENDS.hedge_delay(call_type)
+    if delay is None:
+        return await _send(primary, path, payload, call_type)
+
+    first = asyncio.create_task(_send(primary, path, payload, call_type))
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            # pas de copie si elle devait attendre ou dépasser OLLAMA_NUM_PARALLEL
+            second = SCHEDULER.try_acquire(tried)
+            if second in tried:
+                SCHEDULER.release(second)
+            elif second is not None:
+                tried.add(second)
+                BACKENDS.hedges += 1
+                copy = asyncio.create_task(_send(second, path, payload, call_type))
+                # la copie tient sa propre place, rendue quand elle se termine (ou est annulée)
+                copy.add_done_callback(lambda t: SCHEDULER.release(second))
+                pending.add(copy)
+
+        error: Optional[BaseException] = None
+        while done or pending:
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        BACKENDS.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _post_json(path: str, payload: Dict[str, Any], call_type: str) -> Dict[str, Any]:
+    """
+    POST non-streaming avec retries (vers un autre serveur si possible) ;
+    renvoie la réponse JSON d'Ollama.
+    """
+    retries = _call_config(call_type)["retries"]
+    tried: set = set()
+
+    for attempt in range(retries + 1):
+        BREAKER.before_call()
+        try:
+            # l'attente dans la file ne compte pas dans la latence mesurée
+            async with SCHEDULER.slot(tried) as backend:
+                started_at = time.monotonic()
+                data = await _send_hedged(backend, path, payload, call_type, tried)
+        except Exception as e:
+            # une requête invalide (4xx) ne signale pas une panne d'Ollama
+            if _is_retryable(e):
+                BREAKER.record_failure()
+            if attempt < retries and _is_retryable(e) and BREAKER.is_available():
+                await asyncio.sleep(LLM_RETRY_BACKOFF * (2 ** attempt))
+                continue
+            raise LLMError(f"appel Ollama {path} ({call_type}) échoué : {e}") from e
+        duration = time.monotonic() - started_at
+        BREAKER.record_success(duration)
+        ROUTER.record(call_type, payload["model"], duration)
+        PROMPT_STATS.record(call_type, data)
+        return data
+
+
+# ================== API PUBLIQUE ==================
+
+
+def _payload(
+    call_type: str,
+    model: Optional[str],
+    options: Optional[Dict[str, Any]],
+    stream: bool,
+    format: Optional[str] = None,
+    **fields: Any,
+) -> Dict[str, Any]:
+    """
+    Corps de requête Ollama commun : modèle choisi par ROUTER (sauf `model`),
+    keep_alive explicite, options ; `fields` = prompt ou messages.
+    """
+    payload = {
+        "model": model or ROUTER.choose(call_type),
+        **fields,
+        "stream": stream,
+        "keep_alive": LLM_KEEP_ALIVE,
+        "options": options or {},
+    }
+    if format:
+        payload["format"] = format
+    return payload
+
+
+async def generate(
+    prompt: str,
+    call_type: str,
+    options: Optional[Dict[str, Any]] = None,
+    model: Optional[str] = None,
+    format: Optional[str] = None,
+    cache: bool = True,
+    cacheable: Cacheable = None,
+) -> str:
+    """
+    Appelle /api/generate et renvoie le texte généré.
+    Sans `model`, le modèle est choisi par ROUTER selon le type d'appel.
+    `format="json"` force Ollama à répondre avec du JSON valide.
+    `cache=False` ignore la réponse en cache (la nouvelle la remplace) ;
+    `cacheable(text)` écarte du cache les réponses inutilisables.
+    Lève LLMError si l'appel échoue.
+    """
+    payload = _payload(call_type, model, options, stream=False, format=format, prompt=prompt)
+
+    key, cached = await _cache_lookup("/api/generate", payload, call_type, cache, cacheable)
+    if cached is not None:
+        note_model(payload["model"])
+        return cached
+
+    data = await _post_json("/api/generate", payload, call_type)
+    text = data.get("response", "").strip()
+    note_model(payload["model"])
+    await _cache_store(key, text, cacheable)
+    return text
+
+
+async def chat(
+    messages: List[Dict[str, str]],
+    call_type: str,
+    options: Optional[Dict[str, Any]] = None,
+    model: Optional[str] = None,
+    format: Optional[str] = None,
+    cache: bool = True,
+    cacheable: Cacheable = None,
+) -> str:
+    """
+    Appelle /api/chat et renvoie le contenu du message de l'assistant.
+    Mettre les instructions fixes dans le message "system" et le contenu
+    variable à la fin : le préfixe commun reste dans le cache KV d'Ollama.
+    `model`, `format`, `cache` et `cacheable` : voir generate().
+    Lève LLMError si l'appel échoue.
+    """
+    payload = _payload(
+        call_type, model, options, stream=False, format=format, messages=messages
+    )
+
+    key, cached = await _cache_lookup("/api/chat", payload, call_type, cache, cacheable)
+    if cached is not None:
+        note_model(payload["model"])
+        return cached
+
+    data = await _post_json("/api/chat", payload, call_type)
+    try:
+        content = data["message"]["content"]
+    except (KeyError, TypeError) as e:
+        raise LLMError(f"réponse /api/chat inattendue : {data!r}") from e
+    note_model(payload["model"])
+    await _cache_store(key, content, cacheable)
+    return content
+
+
+def _chunk_text(path: str, data: Dict[str, Any]) -> str:
+    if path == "/api/chat":
+        return (data.get("message") or {}).get("content", "")
+    return data.get("response", "")
+
+
+def stream_generate(
+    prompt: str,
+    call_type: str,
+    options: Optional[Dict[str, Any]] = None,
+    model: Optional[str] = None,
+    cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Appelle /api/generate en mode stream ; voir _stream().
+    """
+    payload = _payload(call_type, model, options, stream=True, prompt=prompt)
+    return _stream("/api/generate", payload, call_type, cache)
+
+
+def stream_chat(
+    messages: List[Dict[str, str]],
+    call_type: str,
+    options: Optional[Dict[str, Any]] = None,
+    model: Optional[str] = None,
+    cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Appelle /api/chat en mode stream ; voir _stream().
+    """
+    payload = _payload(call_type, model, options, stream=True, messages=messages)
+    return _stream("/api/chat", payload, call_type, cache)
+
+
+async def _stream(
+    path: str, payload: Dict[str, Any], call_type: str, cache: bool
+) -> AsyncIterator[str]:
+    """
+    Renvoie les morceaux de texte au fur et à mesure. Fermer le générateur
+    (aclose) ferme la connexion, ce qui arrête la génération côté Ollama.
+    Les retries ne sont faits que tant qu'aucun morceau n'a été renvoyé.
+    Pour le disjoncteur, la latence mesurée est celle du premier morceau.
+    Une réponse en cache est renvoyée d'un seul morceau ; seule une réponse
+    lue jusqu'au bout (done) est enregistrée dans le cache et mesurée par ROUTER.
+    Lève LLMError si l'appel échoue.
+    """
+    key, cached = await _cache_lookup(path, payload, call_type, cache, None)
+    if cached is not None:
+        note_model(payload["model"])
+        yield cached
+        return
+    retries = _call_config(call_type)["retries"]
+    tried: set = set()
+
+    for attempt in range(retries + 1):
+        BREAKER.before_call()
+        started = False
+        parts: List[str] = []
+        # serveur de CETTE tentative (None tant qu'aucun n'a été choisi)
+        backend: Optional[Backend] = None
+        try:
+            # la place est gardée tant que le flux est lu
+            async with SCHEDULER.slot(tried) as backend:
+                started_at = time.monotonic()
+                # pas de copie "hedgée" en stream : les morceaux sont déjà partis
+                tried.add(backend)
+                with BACKENDS.track(backend):
+                    async with backend.client.stream(
+                        "POST", path, json=payload, timeout=_timeout(call_type)
+                    ) as resp:
+                        resp.raise_for_status()
+                        async for line in resp.aiter_lines():
+                            if not line:
+                                continue
+                            data = json.loads(line)
+                            chunk = _chunk_text(path, data)
+                            if chunk:
+                                if not started:
+                                    started = True
+                                    backend.record_success()
+                                    BREAKER.record_success(time.monotonic() - started_at)
+                                    note_model(payload["model"])
+                                parts.append(chunk)
+                                yield chunk
+                            if data.get("done"):
+                                ROUTER.record(
+                                    call_type, payload["model"], time.monotonic() - started_at
+                                )
+                                PROMPT_STATS.record(call_type, data)
+                                await _cache_store(key, "".join(parts).strip(), None)
+                                break
+            if not started:
+                backend.record_success()
+                BREAKER.record_success(time.monotonic() - started_at)
+            return
+        except Exception as e:
+            # une requête invalide (4xx) ne signale pas une panne d'Ollama ;
+            # échec avant le choix d'un serveur : aucun serveur à pénaliser
+            if _is_retryable(e) and backend is not None:
+                backend.record_failure()
+                BREAKER.record_failure()
+            if (
+                not started
+                and attempt < retries
+                and _is_retryable(e)
+                and BREAKER.is_available()
+            ):
+                await asyncio.sleep(LLM_RETRY_BACKOFF * (2 ** attempt))
+                continue
+            raise LLMError(f"stream Ollama ({call_type}) échoué : {e}") from e
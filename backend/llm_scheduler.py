@@ -0,0 +1,254 @@
+# backend/llm_scheduler.py
+
+"""
+Ordonnanceur des appels LLM : contrôle d'admission et file à priorités.
+
+- au plus LLM_CONCURRENCY_PER_BACKEND requêtes en cours sur chaque serveur
+  Ollama en bonne santé (copies "hedgées" comprises) ; les autres attendent
+  dans une file, réveillée aussi quand un serveur revient
+- la file sert d'abord les requêtes interactives (un enfant attend),
+  puis les lots (préparation d'une séance), puis la réserve (prefetch)
+- admit() refuse tout de suite un nouveau travail si l'attente estimée
+  dépasse le seuil de sa priorité ou si la file est pleine :
+  l'endpoint répond 503 avec Retry-After au lieu de laisser Ollama saturer
+"""
+
+import asyncio
+import itertools
+import math
+import os
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager, suppress
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# ================== CONFIG ORDONNANCEUR ==================
+
+# Priorités, de la plus urgente à la moins urgente
+PRIORITIES = ("interactive", "batch", "prefetch")
+
+# Appels simultanés par serveur Ollama (à aligner sur OLLAMA_NUM_PARALLEL)
+LLM_CONCURRENCY_PER_BACKEND = int(os.getenv("LLM_CONCURRENCY_PER_BACKEND", "2"))
+
+# Nombre maximal d'appels en attente
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "64"))
+
+# Attente estimée maximale (secondes) avant de refuser un travail, par priorité.
+# Surchargeable via LLM_MAX_WAIT_<PRIORITE>. La réserve n'est jamais refusée.
+LLM_MAX_WAIT = {
+    priority: float(os.getenv(f"LLM_MAX_WAIT_{priority.upper()}", wait))
+    for priority, wait in (("interactive", 20), ("batch", 300), ("prefetch", math.inf))
+}
+
+# Durée supposée d'un appel tant qu'aucun n'a été mesuré (secondes)
+LLM_CALL_SECONDS_DEFAULT = float(os.getenv("LLM_CALL_SECONDS_DEFAULT", "10"))
+
+
+class LLMOverloaded(Exception):
+    """Trop de travail en attente : réessayer après `retry_after` secondes."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"file LLM saturée, réessayer dans {retry_after}s")
+        self.retry_after = retry_after
+
+
+# Priorité des appels LLM du contexte courant (voir job_priority)
+_priority: ContextVar[str] = ContextVar("llm_priority", default="interactive")
+
+
+@contextmanager
+def job_priority(priority: str):
+    """
+    Priorité des appels LLM faits dans le bloc
+    (y compris dans les tâches asyncio créées depuis le bloc).
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class LLMScheduler:
+    """
+    Sémaphore à priorités par serveur : LLM_CONCURRENCY_PER_BACKEND places
+    sur chaque serveur en bonne santé (`backends()`), file triée par
+    (priorité, ordre d'arrivée). Chaque requête réellement envoyée
+    (y compris la copie "hedgée") tient une place sur son serveur.
+    """
+
+    def __init__(
+        self,
+        backends: Callable[[], List[Any]],
+        per_backend: int = LLM_CONCURRENCY_PER_BACKEND,
+    ):
+        self.backends = backends
+        self.per_backend = per_backend
+        self._in_use: Dict[Any, int] = {}
+        self._queue: List[Tuple[int, int, asyncio.Future, FrozenSet[Any]]] = []
+        self._seq = itertools.count()
+        self.call_seconds = LLM_CALL_SECONDS_DEFAULT
+        self.granted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {p: 0 for p in PRIORITIES}
+
+    @property
+    def in_use(self) -> int:
+        return sum(self._in_use.values())
+
+    def _eligible(self) -> List[Any]:
+        # aucun serveur en bonne santé : on les retente tous plutôt que de bloquer
+        backends = self.backends()
+        return [b for b in backends if b.is_healthy()] or backends
+
+    def capacity(self) -> int:
+        return self.per_backend * len(self._eligible())
+
+    def _free_backend(self, exclude: FrozenSet[Any] = frozenset()) -> Optional[Any]:
+        """
+        Serveur éligible avec une place libre, le moins occupé ;
+        hors `exclude` (serveurs déjà essayés) si un autre serveur existe.
+        """
+        eligible = self._eligible()
+        preferred = [b for b in eligible if b not in exclude] or eligible
+        free = [b for b in preferred if self._in_use.get(b, 0) < self.per_backend]
+        if not free:
+            return None
+        fewest = min(self._in_use.get(b, 0) for b in free)
+        return random.choice([b for b in free if self._in_use.get(b, 0) == fewest])
+
+    def _take(self, backend: Any):
+        self._in_use[backend] = self._in_use.get(backend, 0) + 1
+        self.granted += 1
+
+    def _waiting(self) -> List[Tuple[int, int, asyncio.Future, FrozenSet[Any]]]:
+        return [entry for entry in self._queue if not entry[2].done()]
+
+    def estimated_wait(self, priority: str) -> float:
+        """
+        Attente estimée d'un nouvel appel de cette priorité :
+        appels devant lui (même priorité ou plus urgents) / places,
+        multiplié par la durée moyenne d'un appel.
+        """
+        rank = PRIORITIES.index(priority)
+        ahead = sum(1 for r, _, _, _ in self._waiting() if r <= rank)
+        capacity = max(self.capacity(), 1)
+        free = capacity - self.in_use
+        if ahead < free:
+            return 0.0
+        return (ahead - free + 1) / capacity * self.call_seconds
+
+    def admit(self, priority: str = "interactive"):
+        """
+        Contrôle d'admission avant de lancer un travail LLM.
+        Lève LLMOverloaded si la file est pleine ou l'attente trop longue.
+        """
+        wait = self.estimated_wait(priority)
+        if len(self._waiting()) >= LLM_QUEUE_MAX or wait > LLM_MAX_WAIT[priority]:
+            self.rejected[priority] += 1
+            raise LLMOverloaded(max(1, math.ceil(wait)))
+
+    async def acquire(self, exclude: Iterable[Any] = ()) -> Any:
+        """
+        Attend une place et renvoie le serveur qui la fournit.
+        """
+        exclude = frozenset(exclude)
+        rank = PRIORITIES.index(_priority.get())
+        if not self._waiting():
+            backend = self._free_backend(exclude)
+            if backend is not None:
+                self._take(backend)
+                return backend
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((rank, next(self._seq), future, exclude))
+        self.queued += 1
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # place accordée juste avant l'annulation : on la rend
+                self.release(future.result())
+            raise
+
+    def try_acquire(self, exclude: Iterable[Any] = ()) -> Optional[Any]:
+        """
+        Place libre tout de suite (sans passer devant la file), ou None.
+        Pour la copie "hedgée" : inutile d'attendre pour elle.
+        """
+        if self._waiting():
+            return None
+        backend = self._free_backend(frozenset(exclude))
+        if backend is not None:
+            self._take(backend)
+        return backend
+
+    def release(self, backend: Any):
+        self._in_use[backend] -= 1
+        if not self._in_use[backend]:
+            del self._in_use[backend]
+        self._wake()
+
+    def _wake(self):
+        """
+        Donne les places libres aux appels en attente, par priorité.
+        Appelé à chaque place rendue et à chaque changement de santé d'un serveur.
+        """
+        for entry in sorted(self._waiting()):
+            _, _, future, exclude = entry
+            backend = self._free_backend(exclude)
+            if backend is None:
+                if self.in_use >= self.capacity():
+                    break
+                continue  # seuls des serveurs exclus pour cet appel sont libres
+            self._take(backend)
+            future.set_result(backend)
+        self._queue = self._waiting()
+
+    def health_changed(self, backend: Any):
+        """
+        Un serveur change d'état : plus (ou moins) de places. Un serveur écarté
+        redevient éligible à l'expiration de son délai : on réveille la file à ce moment.
+        """
+        self._wake()
+        if not backend.is_healthy():
+            with suppress(RuntimeError):
+                asyncio.get_running_loop().call_later(
+                    max(backend.down_until - time.monotonic(), 0) + 0.01, self._wake
+                )
+
+    def record_duration(self, seconds: float):
+        # moyenne glissante (exponentielle) de la durée d'un appel
+        self.call_seconds = 0.8 * self.call_seconds + 0.2 * seconds
+
+    @asynccontextmanager
+    async def slot(self, exclude: Iterable[Any] = ()) -> AsyncIterator[Any]:
+        """
+        Une place pour un appel LLM (renvoie son serveur), rendue à la sortie du bloc.
+        """
+        backend = await self.acquire(exclude)
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        try:
+            yield backend
+        finally:
+            self.record_duration(loop.time() - started_at)
+            self.release(backend)
+
+    def stats(self) -> Dict[str, Any]:
+        waiting = self._waiting()
+        return {
+            "capacity": self.capacity(),
+            "in_use": self.in_use,
+            "per_backend": self.per_backend,
+            "waiting": {
+                p: sum(1 for r, _, _, _ in waiting if r == rank)
+                for rank, p in enumerate(PRIORITIES)
+            },
+            "call_seconds": round(self.call_seconds, 2),
+            "estimated_wait": {p: round(self.estimated_wait(p), 1) for p in PRIORITIES},
+            "granted": self.granted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
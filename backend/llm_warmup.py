@@ -0,0 +1,241 @@
+# backend/llm_warmup.py
+
+"""
+Préchauffage des modèles Ollama et maintien en mémoire.
+
+- au démarrage de l'application : une requête vide par (serveur, modèle)
+  charge chaque modèle configuré (tous les niveaux de MODEL_TIERS),
+  pour que la première histoire ne paie pas le chargement (10 s et plus)
+- pendant les heures de classe (LLM_SCHOOL_HOURS / LLM_SCHOOL_DAYS) :
+  un "ping" keep_alive régulier garde les modèles chargés
+- en dehors : plus de ping, Ollama décharge les modèles après LLM_KEEP_ALIVE
+- is_ready() alimente l'endpoint /ready : prêt une fois le premier
+  préchauffage passé depuis le démarrage (quel qu'en soit le résultat :
+  un modèle introuvable ou un Ollama arrêté la nuit ne doit pas sortir
+  le serveur de la rotation) ; la présence en mémoire de chaque modèle
+  (chargé depuis moins de LLM_KEEP_ALIVE) est dans stats()
+- un modèle introuvable n'empêche pas le keep_alive des autres :
+  la boucle démarre après le premier passage, quel qu'en soit le résultat
+"""
+
+import asyncio
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+import llm_gateway
+from llm_backends import Backend
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+# ================== CONFIG PRECHAUFFAGE ==================
+
+LLM_WARMUP_ENABLED = os.getenv("LLM_WARMUP_ENABLED", "1") == "1"
+
+# Intervalle entre deux pings keep_alive pendant les heures de classe (secondes).
+# Doit rester nettement plus court que LLM_KEEP_ALIVE.
+LLM_WARMUP_INTERVAL = float(os.getenv("LLM_WARMUP_INTERVAL", "300"))
+
+# Délai avant de retenter un préchauffage qui a échoué (Ollama pas encore prêt)
+LLM_WARMUP_RETRY_SECONDS = float(os.getenv("LLM_WARMUP_RETRY_SECONDS", "10"))
+
+# Timeout d'un chargement de modèle (un gros modèle peut prendre du temps)
+LLM_WARMUP_TIMEOUT = float(os.getenv("LLM_WARMUP_TIMEOUT", "180"))
+
+# Heures de classe, "HH:MM-HH:MM"
+LLM_SCHOOL_HOURS = os.getenv("LLM_SCHOOL_HOURS", "07:30-17:30")
+
+# Jours de classe (0 = lundi ... 6 = dimanche), séparés par des virgules
+LLM_SCHOOL_DAYS = {
+    int(d) for d in os.getenv("LLM_SCHOOL_DAYS", "0,1,2,3,4,5").split(",") if d.strip()
+}
+
+# Fuseau horaire des heures de classe (vide = heure locale du serveur)
+LLM_SCHOOL_TIMEZONE = os.getenv("LLM_SCHOOL_TIMEZONE", "Africa/Tunis")
+
+
+def parse_hours(spec: str) -> Tuple[int, int]:
+    """
+    "07:30-17:30" -> (450, 1050), en minutes depuis minuit.
+    """
+    def to_minutes(hm: str) -> int:
+        hours, minutes = hm.strip().split(":")
+        return int(hours) * 60 + int(minutes)
+
+    start, end = spec.split("-")
+    return to_minutes(start), to_minutes(end)
+
+
+SCHOOL_START, SCHOOL_END = parse_hours(LLM_SCHOOL_HOURS)
+
+
+def _now() -> datetime:
+    if LLM_SCHOOL_TIMEZONE and ZoneInfo is not None:
+        try:
+            return datetime.now(ZoneInfo(LLM_SCHOOL_TIMEZONE))
+        except Exception:
+            pass  # base des fuseaux absente : heure locale
+    return datetime.now()
+
+
+def in_school_hours(now: Optional[datetime] = None) -> bool:
+    now = now or _now()
+    minutes = now.hour * 60 + now.minute
+    return now.weekday() in LLM_SCHOOL_DAYS and SCHOOL_START <= minutes < SCHOOL_END
+
+
+def parse_keep_alive(spec: str) -> Optional[float]:
+    """
+    Durée keep_alive au format Ollama -> secondes ; None si le modèle
+    reste toujours chargé (durée négative).
+    "30m" -> 1800, "1h30m" -> 5400, "300" -> 300, "-1" -> None.
+    """
+    spec = spec.strip()
+    try:
+        seconds = float(spec)
+    except ValueError:
+        units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+        parts = re.findall(r"(-?[\d.]+)(ms|h|m|s)", spec)
+        seconds = sum(float(value) * units[unit] for value, unit in parts)
+    return None if seconds < 0 else seconds
+
+
+# Durée après laquelle Ollama a déchargé un modèle qui n'a pas été repingué
+KEEP_ALIVE_SECONDS = parse_keep_alive(llm_gateway.LLM_KEEP_ALIVE)
+
+
+def warm_models() -> List[str]:
+    """
+    Tous les modèles que le routeur peut choisir, sans doublon.
+    """
+    models: List[str] = []
+    for tiers in llm_gateway.MODEL_TIERS.values():
+        for model in tiers:
+            if model not in models:
+                models.append(model)
+    return models
+
+
+class ModelWarmer:
+    """
+    Charge les modèles sur chaque serveur Ollama et les garde en mémoire.
+    État : dernier chargement réussi par (serveur, modèle).
+    """
+
+    def __init__(self, models: List[str]):
+        self.models = models
+        self.warm_at: Dict[Tuple[str, str], float] = {}
+        self.errors: Dict[Tuple[str, str], str] = {}
+        self.pings = 0
+        self.first_pass_done = False
+
+    async def _ping(self, backend: Backend, model: str) -> bool:
+        """
+        Requête vide : Ollama charge le modèle (s'il ne l'est pas)
+        et repousse son déchargement de LLM_KEEP_ALIVE.
+        """
+        key = (backend.url, model)
+        try:
+            resp = await backend.client.post(
+                "/api/generate",
+                json={"model": model, "prompt": "", "keep_alive": llm_gateway.LLM_KEEP_ALIVE},
+                timeout=LLM_WARMUP_TIMEOUT,
+            )
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            self.errors[key] = f"{type(e).__name__}: {e}"
+            return False
+        self.pings += 1
+        self.warm_at[key] = time.time()
+        self.errors.pop(key, None)
+        return True
+
+    async def warm_all(self) -> bool:
+        """
+        Un ping par (serveur, modèle), en parallèle entre serveurs
+        mais modèle par modèle sur un même serveur (évite de charger
+        tous les modèles d'un coup en mémoire GPU).
+        Vrai si chaque modèle est ensuite en mémoire sur au moins un serveur.
+        """
+        async def warm_backend(backend: Backend):
+            for model in self.models:
+                ok = await self._ping(backend, model)
+                if ok:
+                    print(f"[LLM] modèle {model} chargé sur {backend.url}")
+                else:
+                    print(f"[LLM] préchauffage {model} sur {backend.url} impossible : "
+                          f"{self.errors[(backend.url, model)]}")
+
+        await asyncio.gather(*(warm_backend(b) for b in llm_gateway.BACKENDS.backends))
+        return self.all_resident()
+
+    def is_ready(self) -> bool:
+        """
+        Prêt une fois le premier préchauffage passé depuis le démarrage.
+        """
+        return self.first_pass_done
+
+    def is_resident(self, key: Tuple[str, str]) -> bool:
+        """
+        Vrai si le modèle a été chargé sur ce serveur depuis moins
+        de LLM_KEEP_ALIVE (sinon Ollama l'a déchargé).
+        """
+        warm_at = self.warm_at.get(key)
+        if warm_at is None:
+            return False
+        return KEEP_ALIVE_SECONDS is None or warm_at >= time.time() - KEEP_ALIVE_SECONDS
+
+    def all_resident(self) -> bool:
+        """
+        Chaque modèle est en mémoire sur au moins un serveur.
+        """
+        resident = {model for (url, model) in self.warm_at if self.is_resident((url, model))}
+        return all(model in resident for model in self.models)
+
+    async def run(self):
+        """
+        Tâche de fond : préchauffage initial, puis pings keep_alive
+        pendant les heures de classe (toutes les LLM_WARMUP_RETRY_SECONDS
+        tant qu'un modèle manque, sinon toutes les LLM_WARMUP_INTERVAL).
+        """
+        ready = await self.warm_all()
+        self.first_pass_done = True
+        while True:
+            await asyncio.sleep(LLM_WARMUP_INTERVAL if ready else LLM_WARMUP_RETRY_SECONDS)
+            if in_school_hours():
+                ready = await self.warm_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": LLM_WARMUP_ENABLED,
+            "ready": self.is_ready(),
+            "all_resident": self.all_resident(),
+            "keep_alive_seconds": KEEP_ALIVE_SECONDS,
+            "school_hours": in_school_hours(),
+            "pings": self.pings,
+            "models": [
+                {
+                    "url": backend.url,
+                    "model": model,
+                    "warm_at": self.warm_at.get((backend.url, model)),
+                    "resident": self.is_resident((backend.url, model)),
+                    "error": self.errors.get((backend.url, model)),
+                }
+                for backend in llm_gateway.BACKENDS.backends
+                for model in self.models
+            ],
+        }
+
+
+MODEL_WARMER = ModelWarmer(warm_models())
+
+
+def is_ready() -> bool:
+    return not LLM_WARMUP_ENABLED or MODEL_WARMER.is_ready()
@@ -1,11 +1,40 @@
 # backend/main.py
 
-from fastapi import FastAPI, HTTPException, Depends, status, Query
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Header, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from story_bot.service import generate_story_with_llm
+import llm_gateway
+from llm_scheduler import LLMOverloaded, job_priority
+from llm_warmup import LLM_WARMUP_ENABLED, MODEL_WARMER, is_ready
+from coalescing import IDEMPOTENCY, IdempotencyConflict, run_once
+from jobs import JOBS
+from disconnect import DISCONNECT_STATS, ClientDisconnected, cancel_on_disconnect
+from story_bot.service import (
+    FALLBACK_STORY_TN,
+    SINGLE_CALL_STATS,
+    STORY_PIPELINE_MODE,
+    STORY_PIPELINE_MODES,
+    generate_story_with_llm_bilingual,
+    is_fallback_story,
+    stream_story_with_llm,
+)
+from story_bot.offline import OFFLINE_STORIES
+from story_bot.reuse import distinct_theme_keys, pick_reusable_story
+from story_bot.themes import THEME_INDEX, theme_bucket
+from story_bot.translation_memory import TRANSLATION_MEMORY
+from story_bot.pool import STORY_POOL, STORY_POOL_ENABLED
 from db import SessionLocal
 from db_models import QuizQuestion, Story, GameLog, User
 
@@ -44,7 +73,11 @@ from game_robot.service import (
 
 # ===================== IMPORTS LABYRINTHE FAMILLE (LLM) =====================
 
-from family_llm_service import generate_labyrinth_with_llm, bfs_path
+from family_llm_service import generate_labyrinth_with_llm
+from family_procedural import generate_procedural_labyrinth
+from family_pool import FAMILY_POOL, FAMILY_POOL_ENABLED
+from family_store import FAMILY_STORE, labyrinth_id
+from family_paths import FAMILY_PATH_ALGOS, PATH_FINDER, labyrinth_metrics, normalize_algo
 
 
 # ===================== MODELES STORY BOT =====================
@@ -52,6 +85,8 @@ from family_llm_service import generate_labyrinth_with_llm, bfs_path
 class StoryBotRequest(BaseModel):
     theme: str
     level: int
+    # mode du pipeline ("sequential", "pipeline", "single") ; défaut : STORY_PIPELINE_MODE
+    mode: Optional[str] = None
 
 
 class StoryBotResponse(BaseModel):
@@ -60,9 +95,71 @@ class StoryBotResponse(BaseModel):
     story: str
 
 
+# ===================== MODELES GENERATION PAR LOT (CLASSE) =====================
+
+class BatchItem(BaseModel):
+    kind: str  # "story" ou "labyrinth"
+    theme: Optional[str] = None
+    level: Optional[int] = None
+    mode: Optional[str] = None
+    difficulty: Optional[int] = None
+    generator: Optional[str] = None  # labyrinthe : "auto", "llm", "procedural"
+    seed: Optional[int] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+
+# ===================== MODELES JOBS ASYNCHRONES =====================
+
+class LabyrinthJobRequest(BaseModel):
+    difficulty: int = 1
+    generator: Optional[str] = None  # "auto", "llm", "procedural"
+    seed: Optional[int] = None
+    session_id: Optional[str] = None
+
+
 # ===================== APP & CORS =====================
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # jobs dont le worker s'est arrêté (bail expiré)
+    try:
+        await run_in_threadpool(JOBS.recover)
+    except Exception as e:
+        print("[jobs] reprise impossible :", e)
+
+    # thèmes déjà en base, puis ceux de la réserve, pour regrouper les thèmes proches
+    try:
+        THEME_INDEX.load(await run_in_threadpool(run_with_session, distinct_theme_keys))
+    except Exception as e:
+        print("[themes] chargement des thèmes impossible :", e)
+    THEME_INDEX.load(STORY_POOL.theme_keys())
+
+    # producteur de la réserve d'histoires du Story Bot
+    pool_task = asyncio.create_task(STORY_POOL.run()) if STORY_POOL_ENABLED else None
+    # préchauffage des modèles Ollama puis keep_alive pendant les heures de classe
+    warmup_task = asyncio.create_task(MODEL_WARMER.run()) if LLM_WARMUP_ENABLED else None
+    # producteur de la réserve de labyrinthes "Cherche la famille"
+    family_pool_task = asyncio.create_task(FAMILY_POOL.run()) if FAMILY_POOL_ENABLED else None
+    # baux des jobs de ce worker
+    jobs_task = asyncio.create_task(JOBS.run())
+
+    yield
+
+    for task in (pool_task, warmup_task, family_pool_task, jobs_task):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await JOBS.close()
+
+    # fermeture du pool de connexions vers Ollama
+    await llm_gateway.close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -73,6 +170,29 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(IdempotencyConflict)
+async def idempotency_conflict_handler(request: Request, exc: IdempotencyConflict):
+    return JSONResponse(
+        status_code=422,
+        content={"detail": "Idempotency-Key déjà utilisée pour une autre requête."},
+    )
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    # personne ne lira la réponse ; 499 = "client closed request" (convention nginx)
+    return Response(status_code=499)
+
+
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Le serveur d'histoires est très occupé, réessaie dans un moment."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # ===================== DEPENDANCE DB =====================
 
 def get_db():
@@ -90,6 +210,19 @@ def read_root():
     return {"message": "Backend miniHKEYA OK"}
 
 
+@app.get("/ready")
+def readiness():
+    """
+    Prêt une fois le premier préchauffage des modèles Ollama passé.
+    """
+    if not is_ready():
+        return JSONResponse(
+            status_code=503,
+            content={"ready": False, "warmup": MODEL_WARMER.stats()},
+        )
+    return {"ready": True}
+
+
 # ===================== AUTH =====================
 
 @app.post("/api/auth/register", response_model=UserOut)
@@ -190,7 +323,15 @@ def run_bfs():
 def api_generate_story(
     req: StoryGenerateRequest,
     db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
+    # un retry avec la même Idempotency-Key récupère la même histoire (même story_id)
+    request_key = (req.theme, req.level)
+    if idempotency_key:
+        stored = IDEMPOTENCY.get(("chnouwa", idempotency_key), request_key)
+        if stored is not None:
+            return stored
+
     resp = generate_story(req)
 
     child_input = str(req)
@@ -204,6 +345,9 @@ def api_generate_story(
     db.add(log)
     db.commit()
 
+    if idempotency_key:
+        IDEMPOTENCY.put(("chnouwa", idempotency_key), request_key, resp)
+
     return resp
 
 
@@ -280,110 +424,716 @@ def robot_check(
 # ===================== STORY BOT =====================
 
 @app.post("/game/story-bot/generate", response_model=StoryBotResponse)
-def story_bot_generate(
+async def story_bot_generate(
     req: StoryBotRequest,
-    db: Session = Depends(get_db),
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
-    story_text = generate_story_with_llm(req.theme, req.level)
+    check_pipeline_mode(req.mode)
+
+    # requêtes identiques simultanées / retries : une seule génération,
+    # annulée si tous les clients qui l'attendent sont partis
+    story_text = await cancel_on_disconnect(
+        request,
+        "storybot",
+        run_once(
+            "storybot",
+            (theme_bucket(req.theme), req.level, req.mode),
+            idempotency_key,
+            lambda: produce_story_bot_story(req),
+        ),
+    )
+
+    return StoryBotResponse(
+        theme=req.theme,
+        level=req.level,
+        story=story_text,
+    )
+
+
+@app.post("/game/story-bot/generate/stream")
+async def story_bot_generate_stream(req: StoryBotRequest):
+    """
+    Variante streaming (NDJSON) : le texte tunisien est envoyé
+    au fur et à mesure de la génération, une ligne JSON par événement.
+    La dernière ligne ({"type": "done", ...}) contient l'histoire finale.
+    Une histoire réutilisée ou prise dans la réserve est envoyée d'un coup.
+    Le champ `mode` est ignoré : le flux a son propre pipeline.
+    """
+    # 503 avant d'ouvrir le flux si la file LLM est saturée
+    llm_gateway.SCHEDULER.admit("interactive")
+
+    async def event_stream():
+        started_at = time.monotonic()
+        try:
+            with llm_gateway.record_models() as models:
+                async for line in story_bot_event_lines(req, models):
+                    yield line
+        except (asyncio.CancelledError, GeneratorExit):
+            # client parti : Starlette annule le flux, la connexion vers Ollama est fermée
+            DISCONNECT_STATS.record_cancel("storybot_stream", time.monotonic() - started_at)
+            raise
+        DISCONNECT_STATS.record_done("storybot_stream", time.monotonic() - started_at)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 
-    new_story = Story(
-        child_theme=req.theme,
-        generated_story=story_text,
+async def story_bot_event_lines(req: StoryBotRequest, models: List[str]):
+    """
+    Lignes NDJSON du flux Story Bot ; `models` reçoit les modèles LLM utilisés.
+    """
+    # le flux survit à la requête : on utilise nos propres sessions
+    story_text = await run_in_threadpool(run_with_session, find_reusable_story, req)
+    source = "reuse"
+
+    if story_text is None:
+        story_text = STORY_POOL.pop(req.theme, req.level)
+        source = "pool"
+
+    if story_text is None and not llm_gateway.is_available():
+        story_text = OFFLINE_STORIES.nearest(req.theme, req.level) or FALLBACK_STORY_TN
+        source = "offline"
+
+    if story_text is not None:
+        await run_in_threadpool(
+            run_with_session,
+            save_story_bot_result,
+            req,
+            story_text,
+            source,
+            None,
+            llm_gateway.model_names(models),
+        )
+        for event in (
+            {"type": "token", "text": story_text},
+            {"type": "done", "story": story_text},
+        ):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+        return
+
+    with STORY_POOL.live_request(), llm_gateway.fresh_variants():
+        async for event in stream_story_with_llm(req.theme, req.level):
+            if event["type"] == "done":
+                source = "llm"
+                if event.pop("fallback"):
+                    # Ollama a lâché en cours de route
+                    event["story"] = (
+                        OFFLINE_STORIES.nearest(req.theme, req.level) or FALLBACK_STORY_TN
+                    )
+                    source = "offline"
+                await run_in_threadpool(
+                    run_with_session,
+                    save_story_bot_result,
+                    req,
+                    event["story"],
+                    source,
+                    "stream",
+                    llm_gateway.model_names(models),
+                )
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+
+@app.get("/api/llm/stats")
+def llm_stats():
+    """
+    État de la passerelle LLM (disjoncteur, cache, serveurs, modèles choisis)
+    et des histoires hors ligne.
+    """
+    return {
+        **llm_gateway.stats(),
+        "offline_stories": OFFLINE_STORIES.stats(),
+        "story_single_call": SINGLE_CALL_STATS,
+        "translation_memory": TRANSLATION_MEMORY.stats(),
+        "warmup": MODEL_WARMER.stats(),
+        "disconnect": DISCONNECT_STATS.stats(),
+        "jobs": JOBS.stats(),
+        "themes": THEME_INDEX.stats(),
+        "family_pool": FAMILY_POOL.stats(),
+        "family_store": FAMILY_STORE.stats(),
+        "family_paths": PATH_FINDER.stats(),
+    }
+
+
+@app.get("/game/story-bot/pool")
+def story_bot_pool_stats():
+    """
+    État de la réserve d'histoires : taille par (thème, niveau), hits / misses.
+    """
+    return STORY_POOL.stats()
+
+
+async def produce_story_bot_story(req: StoryBotRequest) -> str:
+    """
+    Histoire déjà en base, sinon réserve, sinon génération en direct,
+    puis enregistrement. Peut être partagée par plusieurs requêtes :
+    elle utilise donc ses propres sessions DB.
+    """
+    # la session SQLAlchemy est synchrone : on l'utilise hors de la boucle async
+    story_text = await run_in_threadpool(run_with_session, find_reusable_story, req)
+    source = "reuse"
+
+    with llm_gateway.record_models() as models:
+        if story_text is None:
+            story_text = STORY_POOL.pop(req.theme, req.level)
+            source = "pool"
+
+        if story_text is None:
+            llm_gateway.SCHEDULER.admit("interactive")
+            story_text, source = await generate_live_story(req.theme, req.level, req.mode)
+
+    await run_in_threadpool(
+        run_with_session,
+        save_story_bot_result,
+        req,
+        story_text,
+        source,
+        None,
+        llm_gateway.model_names(models),
     )
-    db.add(new_story)
+    return story_text
+
+
+def check_pipeline_mode(mode: Optional[str]):
+    if mode is not None and mode not in STORY_PIPELINE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Mode inconnu : {mode} (attendu : {', '.join(STORY_PIPELINE_MODES)})",
+        )
+
+
+async def generate_live_story(
+    theme: str, level: int, mode: Optional[str] = None
+) -> Tuple[str, str]:
+    """
+    Génération en direct -> (histoire, "llm").
+    Si Ollama est indisponible (disjoncteur ouvert) ou n'a pas répondu,
+    renvoie tout de suite l'histoire intégrée la plus proche -> (histoire, "offline").
+    """
+    if llm_gateway.is_available():
+        # nouvelle variante (la réutilisation n'a rien donné) : pas de cache
+        with STORY_POOL.live_request(), llm_gateway.fresh_variants():
+            stories = await generate_story_with_llm_bilingual(theme, level, mode)
+        if not is_fallback_story(stories):
+            return stories["tn"], "llm"
+
+    return OFFLINE_STORIES.nearest(theme, level) or FALLBACK_STORY_TN, "offline"
+
+
+def run_with_session(fn, *args):
+    """
+    Exécute fn(db, *args) avec une session dédiée
+    (pour le code qui tourne après la fin de la requête, ex. un flux).
+    """
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def find_reusable_story(db: Session, req: StoryBotRequest):
+    """
+    Renvoie le texte d'une histoire déjà générée pour (thème, niveau),
+    ou None s'il faut appeler le LLM.
+    """
+    story = pick_reusable_story(db, theme_bucket(req.theme), req.level)
+    return story.generated_story if story is not None else None
+
+
+def save_story_bot_result(
+    db: Session,
+    req: StoryBotRequest,
+    story_text: str,
+    source: str = "llm",
+    mode: Optional[str] = None,
+    model_name: Optional[str] = None,
+):
+    """
+    Enregistre l'histoire générée (Story) et le log de jeu (GameLog).
+    `source` : "llm" (génération en direct), "pool" (réserve), "reuse"
+    ou "offline" (histoire intégrée, Ollama indisponible).
+    Une histoire réutilisée ou hors ligne n'est pas enregistrée, seul le log est ajouté.
+    `mode` : mode du pipeline noté dans le log (défaut : celui de la requête).
+    `model_name` : modèle(s) LLM qui ont produit l'histoire.
+    """
+    new_story = None
+    if source not in ("reuse", "offline"):
+        theme_key = theme_bucket(req.theme)
+        new_story = Story(
+            child_theme=req.theme,
+            level=req.level,
+            theme_key=theme_key,
+            generated_story=story_text,
+        )
+        db.add(new_story)
+        THEME_INDEX.add(theme_key)
+
+    child_input = f"theme={req.theme}, level={req.level}, source={source}"
+    if source == "llm":
+        # pour comparer les modes du pipeline (latence / qualité)
+        child_input += f", mode={mode or req.mode or STORY_PIPELINE_MODE}"
 
     log = GameLog(
         game_name="storybot",
-        child_input=f"theme={req.theme}, level={req.level}",
+        child_input=child_input,
         model_output=story_text,
+        model_name=model_name,
     )
     db.add(log)
 
     db.commit()
-    db.refresh(new_story)
-
-    return StoryBotResponse(
-        theme=req.theme,
-        level=req.level,
-        story=story_text,
-    )
-
-
-# ===================== JEU "CHERCHE LA FAMILLE" (100% LLM) =====================
+    if new_story is not None:
+        db.refresh(new_story)
+    return new_story
 
 
-# ===================== JEU "CHERCHE LA FAMILLE" (100% LLM) =====================
+# ===================== JEU "CHERCHE LA FAMILLE" (LLM OU PROCEDURAL) =====================
 
-CURRENT_FAMILY_GRID = None
-CURRENT_FAMILY_START = None
-CURRENT_FAMILY_TARGETS = None
+# Source des labyrinthes (surchargeable par le paramètre `generator`) :
+# - "llm" : LLM uniquement (500 si toutes les tentatives échouent)
+# - "procedural" : générateur procédural (family_procedural.py), instantané
+# - "auto" : LLM, puis générateur procédural tout de suite si Ollama
+#   est indisponible, saturé ou n'a pas donné de labyrinthe valide
+FAMILY_GENERATORS = ("auto", "llm", "procedural")
+FAMILY_LABYRINTH_GENERATOR = os.getenv("FAMILY_LABYRINTH_GENERATOR", "auto")
 
 @app.get("/api/family-labyrinth")
-def api_family_labyrinth(difficulty: int = 1):
-    global CURRENT_FAMILY_GRID, CURRENT_FAMILY_START, CURRENT_FAMILY_TARGETS
-
+async def api_family_labyrinth(
+    request: Request,
+    difficulty: int = 1,
+    generator: Optional[str] = None,
+    seed: Optional[int] = None,
+    session_id: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     if difficulty not in (1, 2, 3):
         raise HTTPException(
             status_code=400,
             detail="La difficulté doit être 1, 2 ou 3."
         )
+    generator = check_family_generator(generator)
 
-    print(f"[family] génération labyrinthe pour difficulty={difficulty}")
+    print(f"[family] génération labyrinthe pour difficulty={difficulty} ({generator})")
 
     try:
-        grid, start, targets = generate_labyrinth_with_llm(difficulty)
+        # un retry avec la même Idempotency-Key rejoue le labyrinthe déjà choisi
+        # pour cette session (réserve, LLM ou procédural) ; la génération elle-même
+        # est partagée entre sessions (generate_family_labyrinth) ;
+        # client parti : plus de nouvelle tentative
+        grid, start, targets, source, seed = await cancel_on_disconnect(
+            request,
+            "family",
+            run_once(
+                "family",
+                (difficulty, generator, seed, session_id),
+                idempotency_key,
+                lambda: generate_family_labyrinth(
+                    difficulty,
+                    generator,
+                    seed,
+                    lambda: produce_family_labyrinth(difficulty),
+                    session_id,
+                ),
+            ),
+        )
+    except (IdempotencyConflict, ClientDisconnected, LLMOverloaded):
+        raise
     except Exception as e:
         print("[family] erreur LLM :", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-    CURRENT_FAMILY_GRID = grid
-    CURRENT_FAMILY_START = start
-    CURRENT_FAMILY_TARGETS = targets
+    # labyrinthe de la partie, repris par /api/family-labyrinth/path
+    # (labyrinth_id None si l'enregistrement a échoué : partie sans chemins)
+    lab_id = await run_in_threadpool(FAMILY_STORE.put, grid, start, targets)
 
     return {
+        "labyrinth_id": lab_id,
         "grid": grid,
         "start": start,
         "targets": targets,
         "difficulty": difficulty,
         "maxDifficulty": 3,  # <--- pratique pour le front
+        "generator": source,
+        "seed": seed,
+        "metrics": labyrinth_metrics(grid, start, targets),
     }
 
 
+@app.get("/api/family-labyrinth/pool")
+def family_labyrinth_pool_stats():
+    """
+    État de la réserve de labyrinthes : taille par difficulté, hits / misses.
+    """
+    return FAMILY_POOL.stats()
+
+
+def check_family_generator(generator: Optional[str]) -> str:
+    generator = generator or FAMILY_LABYRINTH_GENERATOR
+    if generator not in FAMILY_GENERATORS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Générateur inconnu : {generator} (attendu : {', '.join(FAMILY_GENERATORS)})",
+        )
+    return generator
+
+
+async def generate_family_labyrinth(
+    difficulty: int,
+    generator: str,
+    seed: Optional[int],
+    llm_call,
+    session_id: Optional[str] = None,
+):
+    """
+    Labyrinthe selon le générateur choisi -> (grid, start, targets, source, seed).
+    `llm_call()` produit le labyrinthe du LLM ; `source` vaut "llm" ou "procedural",
+    `seed` est la graine du labyrinthe procédural (None pour le LLM).
+    Sans graine imposée, un labyrinthe de la réserve (family_pool.py) que la
+    session n'a pas encore eu est servi tout de suite.
+    La génération en direct est partagée par les requêtes simultanées de même
+    (difficulty, generator, seed), quelle que soit la session (toute une classe
+    qui demande le même niveau = une seule génération).
+    Côté endpoint, appelé sous run_once : un retry ne reprend pas une autre entrée.
+    """
+    if seed is None:
+        lab = FAMILY_POOL.pop(difficulty, session_id, None if generator == "auto" else generator)
+        if lab is not None:
+            return lab["grid"], lab["start"], lab["targets"], lab["source"], lab["seed"]
+
+    grid, start, targets, source, seed = await run_once(
+        "family_generation",
+        (difficulty, generator, seed),
+        None,
+        lambda: generate_live_family_labyrinth(difficulty, generator, seed, llm_call),
+    )
+    if session_id:
+        FAMILY_POOL.remember(session_id, labyrinth_id(grid, start, targets))
+    return grid, start, targets, source, seed
+
+
+async def generate_live_family_labyrinth(
+    difficulty: int, generator: str, seed: Optional[int], llm_call
+):
+    """
+    Génération en direct (sans la réserve), même retour que generate_family_labyrinth.
+    """
+    if generator == "llm" or (generator == "auto" and llm_gateway.is_available()):
+        try:
+            grid, start, targets = await llm_call()
+            return grid, start, targets, "llm", None
+        except (IdempotencyConflict, ClientDisconnected):
+            raise
+        except Exception as e:
+            if generator == "llm":
+                raise
+            print("[family] LLM indisponible, labyrinthe procédural :", e)
+
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    grid, start, targets = generate_procedural_labyrinth(difficulty, seed)
+    return grid, start, targets, "procedural", seed
+
+
+async def produce_family_labyrinth(difficulty: int):
+    """
+    Génération d'un labyrinthe, refusée d'emblée (503) si la file LLM est saturée.
+    """
+    llm_gateway.SCHEDULER.admit("interactive")
+    return await generate_labyrinth_with_llm(difficulty)
+
 
 @app.get("/api/family-labyrinth/path")
-def api_family_path(member_id: str, algo: str = "bfs"):
+def api_family_path(labyrinth_id: str, member_id: str, algo: str = "bfs"):
     """
-    Calcule un chemin vers le membre demandé sur
-    le DERNIER labyrinthe généré par le LLM.
+    Calcule un chemin vers le membre demandé sur le labyrinthe
+    `labyrinth_id` (renvoyé par /api/family-labyrinth), avec l'algorithme
+    demandé (bfs, dfs, astar) : cases visitées dans l'ordre, puis chemin.
     """
-    if (
-        CURRENT_FAMILY_GRID is None
-        or CURRENT_FAMILY_START is None
-        or CURRENT_FAMILY_TARGETS is None
-    ):
-        raise HTTPException(status_code=400, detail="Labyrinthe non initialisé")
+    algo = normalize_algo(algo)
+    if algo not in FAMILY_PATH_ALGOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Algorithme inconnu : {algo} (attendu : {', '.join(FAMILY_PATH_ALGOS)})",
+        )
 
-    if member_id not in CURRENT_FAMILY_TARGETS:
-        raise HTTPException(status_code=404, detail="Membre inconnu")
+    labyrinth = FAMILY_STORE.get(labyrinth_id)
+    if labyrinth is None:
+        raise HTTPException(status_code=404, detail="Labyrinthe inconnu ou expiré")
+    grid, start, targets = labyrinth
 
-    grid = CURRENT_FAMILY_GRID
-    start = tuple(CURRENT_FAMILY_START)
-    goal = tuple(CURRENT_FAMILY_TARGETS[member_id]["pos"])
+    if member_id not in targets:
+        raise HTTPException(status_code=404, detail="Membre inconnu")
 
     try:
-        # pour l’instant on n’utilise que BFS
-        path = bfs_path(grid, start, goal)
+        result = PATH_FINDER.find(
+            labyrinth_id, grid, start, targets[member_id]["pos"], member_id, algo
+        )
     except Exception as e:
-        print("[family] erreur bfs_path :", e)
-        raise HTTPException(status_code=500, detail="Erreur BFS")
+        print(f"[family] erreur {algo} :", e)
+        raise HTTPException(status_code=500, detail=f"Erreur {algo.upper()}")
 
-    if not path:
+    if not result["path"]:
         raise HTTPException(status_code=400, detail="Pas de chemin trouvé")
 
-    path_list = [[r, c] for (r, c) in path]
-    visited_list = path_list  # tu pourras différencier plus tard
+    return result
+
+
+# ===================== GENERATION PAR LOT (PREPARATION D'UNE SEANCE) =====================
+
+# Nombre de générations du lot lancées en parallèle vers Ollama
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Taille maximale d'un lot (une classe)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+
+
+@app.post("/api/batch/generate")
+async def api_batch_generate(req: BatchRequest):
+    """
+    Prépare d'un coup les histoires / labyrinthes d'une séance.
+    Les éléments sont générés avec une concurrence bornée (BATCH_CONCURRENCY)
+    et renvoyés en NDJSON dans l'ordre où ils se terminent :
+    {"index": i, "kind": ..., "result": {...}} ou {"index": i, "error": ...}.
+    Toutes les lignes Story / GameLog sont insérées en une fois à la fin,
+    annoncé par une dernière ligne {"type": "done", ...}.
+    """
+    if not req.items:
+        raise HTTPException(status_code=400, detail="Le lot est vide.")
+    if len(req.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Un lot contient au maximum {BATCH_MAX_ITEMS} éléments.",
+        )
+    for item in req.items:
+        if item.kind == "story" and (not item.theme or item.level is None):
+            raise HTTPException(status_code=400, detail="Une histoire demande theme et level.")
+        check_pipeline_mode(item.mode)
+        if item.kind == "labyrinth" and item.difficulty not in (1, 2, 3):
+            raise HTTPException(status_code=400, detail="La difficulté doit être 1, 2 ou 3.")
+        if item.kind == "labyrinth":
+            item.generator = check_family_generator(item.generator)
+        if item.kind not in ("story", "labyrinth"):
+            raise HTTPException(status_code=400, detail=f"Type inconnu : {item.kind}")
+
+    # le lot passe après les requêtes interactives dans la file LLM
+    llm_gateway.SCHEDULER.admit("batch")
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    rows = []
+
+    async def run_item(index: int, item: BatchItem) -> dict:
+        async with slots:
+            try:
+                if item.kind == "story":
+                    result = await generate_batch_story(item, rows)
+                else:
+                    result = await generate_batch_labyrinth(item, rows)
+                return {"index": index, "kind": item.kind, "result": result}
+            except Exception as e:
+                print(f"[batch] élément {index} KO :", e)
+                return {"index": index, "kind": item.kind, "error": str(e)}
+
+    async def event_stream():
+        with job_priority("batch"):
+            tasks = [
+                asyncio.create_task(run_item(i, item)) for i, item in enumerate(req.items)
+            ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        await run_in_threadpool(run_with_session, save_batch_rows, rows)
+        done = {"type": "done", "items": len(req.items), "saved": len(rows)}
+        yield json.dumps(done) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+async def generate_batch_story(item: BatchItem, rows: list) -> dict:
+    """
+    Histoire d'un lot : réserve, sinon génération en direct (ou hors ligne).
+    Les lignes DB sont ajoutées à `rows` (insérées à la fin du lot).
+    """
+    with llm_gateway.record_models() as models:
+        story_text = STORY_POOL.pop(item.theme, item.level)
+        source = "pool"
+        if story_text is None:
+            story_text, source = await generate_live_story(item.theme, item.level, item.mode)
+
+    if source != "offline":
+        theme_key = theme_bucket(item.theme)
+        rows.append(Story(
+            child_theme=item.theme,
+            level=item.level,
+            theme_key=theme_key,
+            generated_story=story_text,
+        ))
+        THEME_INDEX.add(theme_key)
+    child_input = f"theme={item.theme}, level={item.level}, source={source}"
+    if source == "llm":
+        child_input += f", mode={item.mode or STORY_PIPELINE_MODE}"
+
+    rows.append(GameLog(
+        game_name="storybot_batch",
+        child_input=child_input,
+        model_output=story_text,
+        model_name=llm_gateway.model_names(models),
+    ))
+    return {"theme": item.theme, "level": item.level, "story": story_text}
 
+
+async def generate_batch_labyrinth(item: BatchItem, rows: list) -> dict:
+    """
+    Labyrinthe famille d'un lot, choisi comme pour /api/family-labyrinth
+    (réserve, LLM, procédural si le LLM échoue) ; le log est ajouté à `rows`.
+    """
+    with llm_gateway.record_models() as models:
+        grid, start, targets, source, seed = await generate_family_labyrinth(
+            item.difficulty,
+            item.generator,
+            item.seed,
+            lambda: generate_labyrinth_with_llm(item.difficulty),
+        )
+    lab_id = await run_in_threadpool(FAMILY_STORE.put, grid, start, targets)
+    result = {
+        "labyrinth_id": lab_id,
+        "grid": grid,
+        "start": start,
+        "targets": targets,
+        "difficulty": item.difficulty,
+        "maxDifficulty": 3,
+        "generator": source,
+        "seed": seed,
+        "metrics": labyrinth_metrics(grid, start, targets),
+    }
+    rows.append(GameLog(
+        game_name="family_labyrinth_batch",
+        child_input=f"difficulty={item.difficulty}",
+        model_output=json.dumps(result, ensure_ascii=False),
+        model_name=llm_gateway.model_names(models),
+    ))
+    return result
+
+
+def save_batch_rows(db: Session, rows: list):
+    """
+    Insère toutes les lignes du lot en un seul commit.
+    """
+    if not rows:
+        return
+    db.add_all(rows)
+    db.commit()
+
+
+# ===================== JOBS ASYNCHRONES (GENERATIONS LONGUES) =====================
+
+@app.post("/api/jobs/story-bot", status_code=202)
+async def api_job_story_bot(req: StoryBotRequest):
+    """
+    Lance la génération d'une histoire en tâche de fond et renvoie tout de suite
+    l'identifiant du job (à suivre via GET /api/jobs/{job_id}).
+    """
+    check_pipeline_mode(req.mode)
+    llm_gateway.SCHEDULER.admit("interactive")
+    job = await JOBS.submit("story", req.model_dump(), lambda: run_story_job(req))
+    return job_links(job)
+
+
+@app.post("/api/jobs/family-labyrinth", status_code=202)
+async def api_job_family_labyrinth(req: LabyrinthJobRequest):
+    """
+    Lance la génération d'un labyrinthe "Cherche la famille" en tâche de fond.
+    """
+    if req.difficulty not in (1, 2, 3):
+        raise HTTPException(status_code=400, detail="La difficulté doit être 1, 2 ou 3.")
+    req.generator = check_family_generator(req.generator)
+    if req.generator == "llm":
+        llm_gateway.SCHEDULER.admit("interactive")
+    job = await JOBS.submit("labyrinth", req.model_dump(), lambda: run_labyrinth_job(req))
+    return job_links(job)
+
+
+@app.get("/api/jobs/{job_id}")
+async def api_job_status(job_id: str):
+    """
+    Statut du job ("queued", "running", "done", "error"), étape en cours
+    (fr_generation, translation, generation / validation + attempt, ...)
+    et résultat une fois terminé.
+    """
+    job = await JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job inconnu ou expiré")
+    return job
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def api_job_events(job_id: str):
+    """
+    Abonnement SSE : un événement "progress" à chaque changement du job,
+    puis un événement "done" avec l'état final.
+    """
+    if await JOBS.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job inconnu ou expiré")
+
+    async def event_stream():
+        async for state in JOBS.subscribe(job_id):
+            event = "done" if state["status"] in ("done", "error") else "progress"
+            yield f"event: {event}\ndata: {json.dumps(state, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def job_links(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/events",
+    }
+
+
+async def run_story_job(req: StoryBotRequest) -> dict:
+    """
+    Génération en direct d'une histoire (comme /game/story-bot/generate
+    sans réserve ni réutilisation), enregistrée en base.
+    """
+    with llm_gateway.record_models() as models:
+        story_text, source = await generate_live_story(req.theme, req.level, req.mode)
+    await run_in_threadpool(
+        run_with_session,
+        save_story_bot_result,
+        req,
+        story_text,
+        source,
+        None,
+        llm_gateway.model_names(models),
+    )
+    return {"theme": req.theme, "level": req.level, "story": story_text, "source": source}
+
+
+async def run_labyrinth_job(req: LabyrinthJobRequest) -> dict:
+    """
+    Génération d'un labyrinthe, enregistré pour /api/family-labyrinth/path.
+    """
+    grid, start, targets, source, seed = await generate_family_labyrinth(
+        req.difficulty,
+        req.generator,
+        req.seed,
+        lambda: generate_labyrinth_with_llm(req.difficulty),
+        req.session_id,
+    )
+    lab_id = await run_in_threadpool(FAMILY_STORE.put, grid, start, targets)
     return {
-        "visited": visited_list,
-        "path": path_list,
+        "labyrinth_id": lab_id,
+        "grid": grid,
+        "start": start,
+        "targets": targets,
+        "difficulty": req.difficulty,
+        "maxDifficulty": 3,
+        "generator": source,
+        "seed": seed,
+        "metrics": labyrinth_metrics(grid, start, targets),
     }
@@ -0,0 +1,143 @@
+# backend/multi_replace.py
+
+"""
+Remplacement multi-motifs en une seule passe (automate d'Aho–Corasick).
+
+Utilisé pour post-traiter les textes générés (REPLACEMENTS_FR, REPLACEMENTS...)
+au lieu d'une boucle de str.replace qui relit tout le texte pour chaque entrée
+et dont le résultat dépend de l'ordre du dictionnaire.
+
+Sémantique : leftmost-longest. En partant de la gauche, on remplace à chaque
+position le motif le plus long qui commence là ("Amina" avant "Amin",
+"un peu inquiet" avant "inquiet"), et le texte remplacé n'est jamais relu.
+"""
+
+from collections import deque
+from typing import Dict, List
+
+
+def _fold(text: str) -> str:
+    """
+    Minuscules caractère par caractère, sans changer la longueur du texte
+    (les positions trouvées dans la version repliée restent valables).
+    """
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+
+class MultiReplacer:
+    """
+    Automate compilé une fois pour un dictionnaire {motif: remplacement}.
+    Avec ignore_case=True, les motifs sont trouvés quelle que soit la casse
+    et une majuscule initiale du texte d'origine est conservée.
+    """
+
+    def __init__(self, replacements: Dict[str, str], ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self.targets: List[str] = []
+
+        # trie : transitions, motif terminé sur le nœud (-1 sinon), profondeur
+        self._goto: List[Dict[str, int]] = [{}]
+        self._term: List[int] = [-1]
+        self._depth: List[int] = [0]
+
+        for src, tgt in replacements.items():
+            key = _fold(src) if ignore_case else src
+            if not key:
+                continue
+            node = 0
+            for ch in key:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._term.append(-1)
+                    self._depth.append(self._depth[node] + 1)
+                node = nxt
+            if self._term[node] == -1:
+                self._term[node] = len(self.targets)
+                self.targets.append(tgt)
+            else:
+                self.targets[self._term[node]] = tgt
+
+        self._build_links()
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def _build_links(self):
+        """
+        Liens d'échec (plus long suffixe propre présent dans le trie)
+        et liens de sortie (plus proche suffixe qui termine un motif).
+        """
+        goto, term = self._goto, self._term
+        fail = [0] * len(goto)
+        out = [0] * len(goto)
+
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                if node:
+                    fail[child] = goto[f].get(ch, 0)
+                suffix = fail[child]
+                out[child] = suffix if term[suffix] != -1 else out[suffix]
+                queue.append(child)
+
+        self._fail = fail
+        self._out = out
+
+    def replace(self, text: str) -> str:
+        """
+        Applique tous les remplacements en une seule passe sur le texte.
+        """
+        if not self.targets or not text:
+            return text
+
+        goto, fail, out = self._goto, self._fail, self._out
+        term, depth = self._term, self._depth
+        haystack = _fold(text) if self.ignore_case else text
+
+        # longest[i] = nœud du motif le plus long qui commence en i (0 si aucun)
+        longest = [0] * len(text)
+        found = False
+        node = 0
+        for i, ch in enumerate(haystack):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            match = node if term[node] != -1 else out[node]
+            while match:
+                start = i - depth[match] + 1
+                if depth[match] > depth[longest[start]]:
+                    longest[start] = match
+                found = True
+                match = out[match]
+
+        if not found:
+            return text
+
+        parts = []
+        i = last = 0
+        n = len(text)
+        while i < n:
+            match = longest[i]
+            if not match:
+                i += 1
+                continue
+            parts.append(text[last:i])
+            tgt = self.targets[term[match]]
+            if self.ignore_case and text[i].isupper() and tgt[:1].islower():
+                tgt = tgt[0].upper() + tgt[1:]
+            parts.append(tgt)
+            i += depth[match]
+            last = i
+        parts.append(text[last:])
+        return "".join(parts)
@@ -0,0 +1,40 @@
+# backend/progress.py
+
+"""
+Étapes d'avancement d'une génération longue (voir jobs.py).
+
+Le code de génération appelle report_stage(...) ; s'il tourne dans un bloc
+track_progress(callback), le callback reçoit l'étape, sinon rien ne se passe.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+# Callback d'avancement du contexte courant
+_progress: ContextVar[Optional[ProgressCallback]] = ContextVar("progress", default=None)
+
+
+@contextmanager
+def track_progress(callback: ProgressCallback):
+    """
+    Transmet à `callback(stage, details)` les étapes signalées dans le bloc
+    (y compris dans les tâches asyncio créées depuis le bloc).
+    """
+    token = _progress.set(callback)
+    try:
+        yield
+    finally:
+        _progress.reset(token)
+
+
+def report_stage(stage: str, **details: Any):
+    """
+    Signale une étape, ex. report_stage("translation") ou
+    report_stage("validation", attempt=2).
+    """
+    callback = _progress.get()
+    if callback is not None:
+        callback(stage, details)
@@ -71,3 +71,43 @@ def bfs(grid, start, goal):
         path.reverse()
 
     return visited, path
+
+
+def astar(grid, start, goal):
+    import heapq
+    # file triée par (coût + distance de Manhattan au but, ordre d'arrivée)
+    def h(pos):
+        return abs(pos[0] - goal[0]) + abs(pos[1] - goal[1])
+
+    counter = 0
+    heap = [(h(start), counter, start)]
+    visited = []
+    parent = {start: None}
+    cost = {start: 0}
+
+    while heap:
+        _, _, current = heapq.heappop(heap)
+        if current in visited:
+            continue
+        visited.append(current)
+
+        if current == goal:
+            break
+
+        for nxt in get_neighbors(current, grid):
+            new_cost = cost[current] + 1
+            if nxt not in cost or new_cost < cost[nxt]:
+                cost[nxt] = new_cost
+                parent[nxt] = current
+                counter += 1
+                heapq.heappush(heap, (new_cost + h(nxt), counter, nxt))
+
+    path = []
+    if goal in parent:
+        cur = goal
+        while cur is not None:
+            path.append(cur)
+            cur = parent[cur]
+        path.reverse()
+
+    return visited, path
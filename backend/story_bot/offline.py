@@ -0,0 +1,109 @@
+# backend/story_bot/offline.py
+
+import json
+import random
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from game.data import STORIES as GAME_STORIES
+from .data import STORIES as BOT_STORIES
+from .reuse import normalize_theme
+
+# ================== HISTOIRES HORS LIGNE ==================
+
+# Servies quand Ollama est indisponible (disjoncteur de llm_gateway ouvert)
+
+DATASET_PATH = Path(__file__).resolve().parent.parent / "data" / "stories_dataset.jsonl"
+
+# "Thème: l’amitié. Niveau: 2."
+_DATASET_INPUT_RE = re.compile(r"Th[eè]me\s*:\s*(.+?)\.\s*Niveau\s*:\s*(\d+)", re.IGNORECASE)
+
+# Mots trop courts pour caractériser un thème ("la", "l", "de"...)
+_MIN_WORD_LENGTH = 3
+
+
+def theme_words(theme_key: str) -> Set[str]:
+    return {word for word in theme_key.split() if len(word) >= _MIN_WORD_LENGTH}
+
+
+class OfflineStoryIndex:
+    """
+    Histoires intégrées indexées par (thème normalisé, niveau).
+    `nearest` renvoie la plus proche d'une demande :
+    même thème et même niveau, sinon même thème au niveau le plus proche,
+    sinon le thème qui partage le plus de mots, sinon une histoire générique.
+    """
+
+    def __init__(self):
+        self.stories: Dict[Tuple[str, int], List[str]] = {}
+        self.default: List[str] = []
+        self.served = 0
+
+    def __len__(self) -> int:
+        return sum(len(stories) for stories in self.stories.values())
+
+    def add(self, theme: str, level: int, story: str):
+        story = story.strip()
+        if story:
+            self.stories.setdefault((normalize_theme(theme), level), []).append(story)
+
+    def _closest_key(self, theme_key: str, level: int) -> Optional[Tuple[str, int]]:
+        words = theme_words(theme_key)
+        best_key, best_score = None, None
+        for key_theme, key_level in self.stories:
+            shared = len(words & theme_words(key_theme))
+            same_theme = key_theme in theme_key or theme_key in key_theme
+            if not same_theme and not shared:
+                continue
+            # thème identique > mots communs ; puis niveau le plus proche
+            score = (same_theme, shared, -abs(key_level - level))
+            if best_score is None or score > best_score:
+                best_key, best_score = (key_theme, key_level), score
+        return best_key
+
+    def nearest(self, theme: str, level: int) -> Optional[str]:
+        key = self._closest_key(normalize_theme(theme), level)
+        if key is not None:
+            candidates = self.stories[key]
+        else:
+            candidates = self.default or [
+                story for (_, key_level), stories in self.stories.items()
+                if key_level == level for story in stories
+            ]
+        if not candidates:
+            return None
+        self.served += 1
+        return random.choice(candidates)
+
+    def stats(self) -> Dict:
+        return {"size": len(self), "keys": len(self.stories), "served": self.served}
+
+
+def load_offline_stories() -> OfflineStoryIndex:
+    index = OfflineStoryIndex()
+
+    for (level, theme), story in BOT_STORIES.items():
+        if theme == "default":
+            index.default.append(story.strip())
+        else:
+            index.add(theme, level, story)
+
+    for (theme, level), stories in GAME_STORIES.items():
+        for story in stories:
+            index.add(theme, level, story)
+
+    if DATASET_PATH.exists():
+        with open(DATASET_PATH, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                match = _DATASET_INPUT_RE.search(entry.get("input", ""))
+                if match:
+                    index.add(match.group(1), int(match.group(2)), entry["output_story"])
+
+    return index
+
+
+OFFLINE_STORIES = load_offline_stories()
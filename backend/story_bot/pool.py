@@ -0,0 +1,184 @@
+# backend/story_bot/pool.py
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import llm_gateway
+from llm_scheduler import job_priority
+from game.data import STORIES as GAME_STORIES
+from .data import STORIES as BOT_STORIES
+from .reuse import normalize_theme
+from .themes import theme_bucket
+from .service import generate_story_with_llm_bilingual, is_fallback_story
+
+# ================== CONFIG RESERVE D'HISTOIRES ==================
+
+# Active le producteur en arrière-plan (démarré par le lifespan de main.py)
+STORY_POOL_ENABLED = os.getenv("STORY_POOL_ENABLED", "1") == "1"
+
+# Nombre d'histoires prêtes à servir par (thème, niveau)
+STORY_POOL_DEPTH = int(os.getenv("STORY_POOL_DEPTH", "2"))
+
+# Nombre de générations de réserve lancées en parallèle
+STORY_POOL_CONCURRENCY = int(os.getenv("STORY_POOL_CONCURRENCY", "1"))
+
+# On ne remplit la réserve qu'après X secondes sans génération "en direct"
+STORY_POOL_IDLE_SECONDS = float(os.getenv("STORY_POOL_IDLE_SECONDS", "5"))
+
+# Intervalle entre deux vérifications de la réserve
+STORY_POOL_POLL_SECONDS = float(os.getenv("STORY_POOL_POLL_SECONDS", "10"))
+
+# Pause après un échec de génération (Ollama absent, surchargé...)
+STORY_POOL_FAILURE_BACKOFF = float(os.getenv("STORY_POOL_FAILURE_BACKOFF", "60"))
+
+# Niveaux du Story Bot
+STORY_POOL_LEVELS = (1, 2)
+
+
+def default_pool_themes() -> List[str]:
+    """
+    Thèmes gardés en réserve : STORY_POOL_THEMES (séparés par des virgules)
+    ou, par défaut, les thèmes des histoires intégrées (story_bot + jeu Chnouwa Sar).
+    """
+    env_themes = os.getenv("STORY_POOL_THEMES")
+    if env_themes:
+        return [t.strip() for t in env_themes.split(",") if t.strip()]
+
+    themes = [theme for (_, theme) in BOT_STORIES if theme != "default"]
+    themes += [theme for (theme, _) in GAME_STORIES]
+    return sorted(set(themes))
+
+
+class StoryWarmPool:
+    """
+    Réserve d'histoires pré-générées par (thème normalisé, niveau).
+    Les requêtes piochent dedans ; un producteur en arrière-plan
+    la remplit pendant les périodes calmes.
+    Chaque histoire garde les modèles qui l'ont produite : ils sont notés
+    (llm_gateway.note_model) quand elle est servie.
+    """
+
+    def __init__(
+        self,
+        themes: List[str],
+        depth: int = STORY_POOL_DEPTH,
+        concurrency: int = STORY_POOL_CONCURRENCY,
+    ):
+        self.depth = depth
+        self.concurrency = concurrency
+        self.stories: Dict[Tuple[str, int], deque] = {
+            (normalize_theme(theme), level): deque()
+            for theme in themes
+            for level in STORY_POOL_LEVELS
+        }
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+        self._live_requests = 0
+        self._last_live = 0.0
+
+    def theme_keys(self) -> List[str]:
+        return sorted({theme_key for theme_key, _ in self.stories})
+
+    # ---------- côté requêtes ----------
+
+    def pop(self, theme: str, level: int) -> Optional[str]:
+        """
+        Renvoie une histoire prête pour (thème, niveau), ou None (miss).
+        """
+        # thème proche d'un thème de la réserve (voir themes.py) : même seau
+        bucket = self.stories.get((normalize_theme(theme_bucket(theme)), level))
+        if bucket:
+            self.hits += 1
+            story, models = bucket.popleft()
+            for model in models:
+                llm_gateway.note_model(model)
+            return story
+        self.misses += 1
+        return None
+
+    @contextmanager
+    def live_request(self):
+        """
+        À utiliser autour d'une génération en direct :
+        la réserve ne se remplit pas pendant ce temps.
+        """
+        self._live_requests += 1
+        try:
+            yield
+        finally:
+            self._live_requests -= 1
+            self._last_live = time.monotonic()
+
+    def is_idle(self) -> bool:
+        return (
+            self._live_requests == 0
+            and time.monotonic() - self._last_live >= STORY_POOL_IDLE_SECONDS
+        )
+
+    # ---------- producteur ----------
+
+    def missing_slots(self) -> List[Tuple[str, int]]:
+        """
+        Une entrée (thème, niveau) par histoire manquante,
+        en commençant par les réserves les plus vides.
+        """
+        missing = []
+        for key, bucket in sorted(self.stories.items(), key=lambda kv: len(kv[1])):
+            missing += [key] * (self.depth - len(bucket))
+        return missing
+
+    async def _fill_one(self, key: Tuple[str, int]) -> bool:
+        theme, level = key
+        # les requêtes des enfants passent avant la réserve dans la file LLM ;
+        # une histoire déjà en cache ferait un doublon dans la réserve
+        with job_priority("prefetch"), llm_gateway.fresh_variants():
+            with llm_gateway.record_models() as models:
+                stories = await generate_story_with_llm_bilingual(theme, level)
+        if is_fallback_story(stories):
+            self.failures += 1
+            return False
+        self.stories[key].append((stories["tn"], models))
+        self.generated += 1
+        return True
+
+    async def run(self):
+        """
+        Boucle du producteur : à chaque tour calme, génère au plus
+        `concurrency` histoires manquantes, puis revérifie.
+        """
+        while True:
+            missing = self.missing_slots() if self.is_idle() else []
+            if not missing:
+                await asyncio.sleep(STORY_POOL_POLL_SECONDS)
+                continue
+
+            batch = missing[: self.concurrency]
+            results = await asyncio.gather(
+                *(self._fill_one(key) for key in batch), return_exceptions=True
+            )
+            if not all(r is True for r in results):
+                await asyncio.sleep(STORY_POOL_FAILURE_BACKOFF)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": STORY_POOL_ENABLED,
+            "depth": self.depth,
+            "concurrency": self.concurrency,
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+            "failures": self.failures,
+            "sizes": {
+                f"{theme}/{level}": len(bucket)
+                for (theme, level), bucket in self.stories.items()
+            },
+        }
+
+
+STORY_POOL = StoryWarmPool(default_pool_themes())
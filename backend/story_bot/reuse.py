@@ -0,0 +1,91 @@
+# backend/story_bot/reuse.py
+
+import os
+import random
+import re
+import unicodedata
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from db_models import Story
+
+# ================== CONFIG REUTILISATION ==================
+
+# Active la réutilisation des histoires déjà générées (table `stories`)
+STORY_REUSE_ENABLED = os.getenv("STORY_REUSE_ENABLED", "1") == "1"
+
+# Nombre de variantes à avoir en base pour un (thème, niveau)
+# avant de commencer à en resservir
+STORY_REUSE_MIN_VARIANTS = int(os.getenv("STORY_REUSE_MIN_VARIANTS", "5"))
+
+# Probabilité de générer quand même une nouvelle histoire
+# (pour continuer à enrichir les variantes)
+STORY_REUSE_FRESH_RATE = float(os.getenv("STORY_REUSE_FRESH_RATE", "0.1"))
+
+
+# Mots vides ignorés dans les thèmes (après suppression des accents)
+THEME_STOP_WORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "d", "dans", "de", "des", "du", "en",
+    "et", "l", "la", "le", "les", "leur", "leurs", "ma", "mes", "mon", "ou", "par",
+    "pour", "qu", "que", "sa", "ses", "son", "sur", "ta", "tes", "ton", "un", "une",
+}
+
+
+# Mots de décor : "l'amitié à l'école" parle d'amitié, comme "l'amitié".
+# Ignorés s'il reste d'autres mots ("l'école" seul reste "ecole").
+THEME_CONTEXT_WORDS = {"classe", "ecole", "maison"}
+
+
+def _singular(word: str) -> str:
+    # pluriel simple : "amities" -> "amitie", "chats" -> "chat"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_theme(theme: str) -> str:
+    """
+    Clé de thème canonique : minuscules, sans accents, ponctuation /
+    apostrophes (' et ’) remplacées par des espaces, sans mots vides
+    ni mots de décor, au singulier, mots triés et sans doublon.
+    Ex : "L’Amitié  à l'école !" -> "amitie", "La colère de papa" -> "colere papa"
+    Si le thème ne contient que des mots vides (ou de décor), ils sont gardés.
+    """
+    text = unicodedata.normalize("NFKD", theme.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    words = re.sub(r"[\W_]+", " ", text).split()
+    kept = {_singular(w) for w in words if w not in THEME_STOP_WORDS} or set(words)
+    kept = (kept - THEME_CONTEXT_WORDS) or kept
+    return " ".join(sorted(kept))[:255]
+
+
+def pick_reusable_story(db: Session, theme_key: str, level: int) -> Optional[Story]:
+    """
+    Renvoie une histoire existante pour (theme_key, level), ou None s'il faut
+    en générer une nouvelle :
+    - moins de STORY_REUSE_MIN_VARIANTS variantes en base
+    - ou tirage "fraîcheur" (STORY_REUSE_FRESH_RATE)
+    """
+    if not STORY_REUSE_ENABLED:
+        return None
+
+    query = db.query(Story).filter(Story.theme_key == theme_key, Story.level == level)
+
+    count = query.with_entities(func.count(Story.id)).scalar() or 0
+    if count < STORY_REUSE_MIN_VARIANTS:
+        return None
+
+    if random.random() < STORY_REUSE_FRESH_RATE:
+        return None
+
+    return query.order_by(Story.id).offset(random.randrange(count)).first()
+
+
+def distinct_theme_keys(db: Session) -> List[str]:
+    """
+    Clés de thème déjà présentes en base (pour l'index des thèmes proches).
+    """
+    rows = db.query(Story.theme_key).filter(Story.theme_key.isnot(None)).distinct().all()
+    return [theme_key for (theme_key,) in rows]
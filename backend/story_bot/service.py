@@ -1,18 +1,61 @@
 # backend/story_bot/service.py
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
+import asyncio
 import json
 import os
-import requests
 
-# ================== CONFIG OLLAMA ==================
+import llm_gateway
+from llm_gateway import LLMError
+from multi_replace import MultiReplacer
+from progress import report_stage
+from .translation_memory import TRANSLATION_MEMORY, is_valid_translation
+
+# ================== CONFIG PIPELINE ==================
+
+# URL et modèles Ollama : voir llm_gateway.py (OLLAMA_URL, OLLAMA_MODEL, ...)
+
+# Mode du pipeline d'histoire :
+# - "sequential" : génération FR complète, puis traduction de toute l'histoire
+# - "pipeline"   : chaque phrase FR terminée part en traduction pendant
+#                  que les suivantes sont encore générées
+# - "single"     : un seul appel renvoie les deux versions (JSON aligné
+#                  phrase par phrase) ; "sequential" si la réponse est invalide
+STORY_PIPELINE_MODES = ("sequential", "pipeline", "single")
+STORY_PIPELINE_MODE = os.getenv("STORY_PIPELINE_MODE", "sequential")
+
+# Le nombre de traductions de phrases en cours est borné par l'ordonnanceur
+# (llm_scheduler.py : LLM_CONCURRENCY_PER_BACKEND places par serveur).
+
+# Longueur maximale d'une phrase traduite, en multiple de la phrase française.
+# Dans data/fr_tn_pairs.jsonl, le tounsi fait au plus ~1,1 fois le français :
+# au-delà, le modèle ne traduit plus la phrase (il raconte toute une histoire),
+# la génération est coupée et la phrase est retraduite.
+SENTENCE_TRANSLATION_MAX_RATIO = float(os.getenv("STORY_SENTENCE_TRANSLATION_MAX_RATIO", "1.5"))
+
+# Nouvel(s) essai(s) pour une phrase dont la traduction LLM a échoué
+SENTENCE_TRANSLATION_RETRIES = int(os.getenv("STORY_SENTENCE_TRANSLATION_RETRIES", "1"))
+
+
+# ================== BUDGETS PAR NIVEAU ==================
+
+# Budget de génération par niveau, utilisé par le mode streaming :
+# dès qu'il est atteint, on coupe le flux Ollama au lieu de payer des tokens
+# qui ne seront jamais montrés à l'enfant.
+# - max_sentences : nombre de phrases (une par ligne) à garder
+# - max_chars     : longueur maximale du texte d'une étape
+# - num_predict   : limite de tokens envoyée à Ollama (garde-fou côté serveur)
+LEVEL_BUDGETS = {
+    1: {"max_sentences": 2, "max_chars": 240, "num_predict": 120},
+    2: {"max_sentences": 4, "max_chars": 480, "num_predict": 240},
+}
 
-# URL du serveur Ollama local
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 
-# Nom du modèle utilisé (par défaut : Qwen 2.5 7B Instruct)
-# Tu peux le surcharger via une variable d'environnement OLLAMA_MODEL
-OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:7b-instruct")
+def get_level_budget(level: int) -> Dict[str, int]:
+    """
+    Renvoie le budget de génération du niveau (niveau 2 par défaut).
+    """
+    return LEVEL_BUDGETS.get(level, LEVEL_BUDGETS[2])
 
 
 # ================== DICTIONNAIRES DE REMPLACEMENT ==================
@@ -90,55 +133,139 @@ REPLACEMENTS_FR = {
     "pourtant": "mais",
 }
 
+# Automates compilés une seule fois : chaque texte est réécrit en une passe
+# (motif le plus long en priorité, ex. "Amina" avant "Amin")
+TN_REPLACER = MultiReplacer(REPLACEMENTS)
+FR_SIMPLIFIER = MultiReplacer(REPLACEMENTS_FR, ignore_case=True)
 
-# ================== FONCTION GENERIQUE D'APPEL OLLAMA ==================
 
+# ================== HISTOIRES DE SECOURS ==================
+
+# Utilisées quand le modèle ne répond pas
+FALLBACK_STORY_FR = (
+    "Amin se réveille, c'est son premier jour d'école.\n"
+    "Il a un peu peur mais il est aussi content.\n"
+    "À la fin de la journée, il dit à ses parents qu'il a passé un beau jour "
+    "et qu'il a appris beaucoup de choses."
+)
+
+FALLBACK_STORY_TN = (
+    "نهار من نهارات، كان فمّة طفل صغير يحب برشا عايلتو وصحابو. "
+    "في نهار صارلو موقف صغير، تعلّم منّو كيفاش يكون صبور ويحترم الناس اللي يحبّوه.\n"
+    "العبرة: ديما نتعلّموا من الحكايات و نولّيو أحسن شوية شوية."
+)
 
-def call_ollama(prompt: str) -> str:
+
+def is_fallback_story(stories: Dict[str, str]) -> bool:
     """
-    Appelle le modèle Ollama avec un prompt donné
-    et renvoie le texte généré.
-    Si quelque chose se passe mal, renvoie une chaîne vide.
+    Vrai si une des deux étapes du pipeline a dû utiliser l'histoire de secours
+    (utile pour ne pas garder ces histoires en réserve).
     """
-    url = f"{OLLAMA_URL}/api/generate"
+    return (
+        stories["fr"] == simplify_french_story(FALLBACK_STORY_FR)
+        or stories["tn"] == FALLBACK_STORY_TN
+    )
 
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": 0.4,  # texte plus stable, moins de délire
-            "top_p": 0.9,
-        },
-    }
 
+# ================== FONCTION GENERIQUE D'APPEL OLLAMA ==================
+
+
+# Options de génération communes à tous les appels du Story Bot
+GENERATION_OPTIONS = {
+    "temperature": 0.4,  # texte plus stable, moins de délire
+    "top_p": 0.9,
+}
+
+
+async def call_ollama(messages: List[Dict[str, str]], call_type: str = "story") -> str:
+    """
+    Appelle le modèle Ollama (via llm_gateway, API chat) avec les messages
+    donnés (system fixe + user variable) et renvoie le texte généré.
+    Si quelque chose se passe mal, renvoie une chaîne vide.
+    """
     try:
-        resp = requests.post(url, json=payload, timeout=120)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("response", "").strip()
-    except Exception as e:
+        return await llm_gateway.chat(messages, call_type, GENERATION_OPTIONS)
+    except LLMError as e:
         print(f"[ERROR] Appel Ollama échoué: {e}")
         return ""
 
 
-# ================== ETAPE 1 : GENERATION EN FRANÇAIS ==================
+async def stream_ollama(
+    messages: List[Dict[str, str]],
+    num_predict: Optional[int] = None,
+    call_type: str = "story",
+) -> AsyncIterator[str]:
+    """
+    Appelle le modèle Ollama en mode stream et renvoie les morceaux
+    de texte au fur et à mesure qu'ils sont générés.
+    Fermer le générateur ferme la connexion, ce qui arrête aussi
+    la génération côté Ollama.
+    Si quelque chose se passe mal, le flux s'arrête simplement.
+    """
+    options = dict(GENERATION_OPTIONS)
+    if num_predict is not None:
+        options["num_predict"] = num_predict
+
+    chunks = llm_gateway.stream_chat(messages, call_type, options)
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except LLMError as e:
+        print(f"[ERROR] Stream Ollama échoué: {e}")
+    finally:
+        await chunks.aclose()
 
 
-def build_french_prompt(theme: str, level: int) -> str:
+async def stream_within_budget(
+    chunks: AsyncIterator[str], max_sentences: int, max_chars: int
+) -> AsyncIterator[str]:
     """
-    Construit un prompt pour demander au modèle
-    d'écrire une histoire en FRANÇAIS TRÈS SIMPLE,
-    avec un vocabulaire compatible avec le modèle de traduction FR->Tounsi.
+    Relaie les morceaux d'un flux Ollama jusqu'à ce que le budget soit atteint :
+    - `max_sentences` lignes non vides terminées (une phrase par ligne)
+    - ou `max_chars` caractères au total.
+    Le flux d'origine est ensuite fermé pour arrêter la génération.
     """
-    if level == 1:
-        niveau_desc = "Niveau 1 = enfants de 6-7 ans. Phrases très simples, vocabulaire de base."
-        longueur = "1 à 2 phrases, un seul petit paragraphe."
-    else:
-        niveau_desc = "Niveau 2 = enfants de 8-10 ans. Phrases un peu plus longues, mais toujours simples."
-        longueur = "2 à 2 phrases, 1 ou 2 petits paragraphes."
+    text = ""
+    try:
+        async for chunk in chunks:
+            start = len(text)
+            text += chunk
+
+            # budget de phrases : on coupe juste après la dernière phrase autorisée
+            done_sentences = 0
+            cut = None
+            pos = 0
+            for line in text.split("\n")[:-1]:
+                pos += len(line) + 1
+                if line.strip():
+                    done_sentences += 1
+                    if done_sentences >= max_sentences:
+                        cut = pos - 1
+                        break
+
+            # budget de longueur
+            if cut is None and len(text) >= max_chars:
+                cut = max_chars
+
+            if cut is not None:
+                if cut > start:
+                    yield text[start:cut]
+                return
+
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+
+# ================== ETAPE 1 : GENERATION EN FRANÇAIS ==================
+
 
-    prompt = f"""
+# Les prompts sont découpés en un message "system" FIXE (identique pour tous
+# les appels) et un petit message "user" VARIABLE (thème, niveau, texte).
+# Ollama garde le préfixe déjà évalué dans son cache KV : seuls les tokens
+# du message variable sont réévalués d'un appel à l'autre.
+
+FRENCH_SYSTEM_PROMPT = f"""
 Tu es un auteur d'histoires pour enfants.
 
 OBJECTIF :
@@ -147,8 +274,7 @@ OBJECTIF :
 - Donc elle doit utiliser un vocabulaire simple et des phrases faciles.
 
 CONTRAINTES GÉNÉRALES :
-- {niveau_desc}
-- {longueur}
+- Respecte le niveau et la longueur demandés pour la nouvelle histoire.
 - Structure claire :
   1. Début : présenter l'enfant et le contexte.
   2. Petit problème ou événement.
@@ -163,10 +289,6 @@ CONTRAINTES GÉNÉRALES :
 VOCABULAIRE CONSEILLÉ (exemples) :
 {SIMPLE_FR_VOCAB_HINT}
 
-NOUVELLE HISTOIRE :
-- Thème : "{theme}"
-- Niveau : {level}
-
 FORMAT DE RÉPONSE :
 - Une phrase par ligne.
 - Pas de numéros, pas de tirets, pas de guillemets.
@@ -176,7 +298,31 @@ IMPORTANT :
 - Utilise seulement du français simple.
 - Réponds UNIQUEMENT avec l'histoire, pas d'explications autour.
 """
-    return prompt
+
+
+def build_french_messages(theme: str, level: int) -> List[Dict[str, str]]:
+    """
+    Messages pour demander au modèle d'écrire une histoire en FRANÇAIS TRÈS SIMPLE,
+    avec un vocabulaire compatible avec le modèle de traduction FR->Tounsi.
+    Seul le message "user" dépend du thème et du niveau.
+    """
+    if level == 1:
+        niveau_desc = "Niveau 1 = enfants de 6-7 ans. Phrases très simples, vocabulaire de base."
+        longueur = "1 à 2 phrases, un seul petit paragraphe."
+    else:
+        niveau_desc = "Niveau 2 = enfants de 8-10 ans. Phrases un peu plus longues, mais toujours simples."
+        longueur = "2 à 2 phrases, 1 ou 2 petits paragraphes."
+
+    user = f"""NOUVELLE HISTOIRE :
+- Thème : "{theme}"
+- Niveau : {level}
+- {niveau_desc}
+- Longueur : {longueur}"""
+
+    return [
+        {"role": "system", "content": FRENCH_SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
 
 
 def simplify_french_story(story_fr: str) -> str:
@@ -187,13 +333,8 @@ def simplify_french_story(story_fr: str) -> str:
     - supprime les lignes vides
     - s'assure que chaque phrase finit par un signe de ponctuation
     """
-    text = story_fr
-
-    # Remplacements lexicaux FR -> FR
-    for src, tgt in REPLACEMENTS_FR.items():
-        text = text.replace(src, tgt)
-        # version avec majuscule
-        text = text.replace(src.capitalize(), tgt)
+    # Remplacements lexicaux FR -> FR (toutes casses, en une passe)
+    text = FR_SIMPLIFIER.replace(story_fr)
 
     # Normalisation basique : lignes propres
     lines = [l.strip() for l in text.split("\n")]
@@ -211,23 +352,24 @@ def simplify_french_story(story_fr: str) -> str:
     return "\n".join(cleaned_lines).strip()
 
 
-def generate_story_fr(theme: str, level: int) -> str:
+async def generate_story_fr(theme: str, level: int) -> str:
     """
     Demande au modèle une histoire en français simple.
     Fournit une histoire de secours si l'appel échoue.
     On simplifie ensuite légèrement le texte pour coller au traducteur FR->Tounsi.
     """
-    prompt = build_french_prompt(theme, level)
-    story_fr = call_ollama(prompt)
+    story_fr = await call_ollama(build_french_messages(theme, level), "story")
+    return finalize_french_story(story_fr)
+
 
+def finalize_french_story(story_fr: str) -> str:
+    """
+    Remplace une réponse vide par l'histoire de secours,
+    puis simplifie le texte pour coller au traducteur FR->Tounsi.
+    """
     if not story_fr.strip():
         # Fallback simple si le modèle ne répond pas
-        story_fr = (
-            "Amin se réveille, c'est son premier jour d'école.\n"
-            "Il a un peu peur mais il est aussi content.\n"
-            "À la fin de la journée, il dit à ses parents qu'il a passé un beau jour "
-            "et qu'il a appris beaucoup de choses."
-        )
+        story_fr = FALLBACK_STORY_FR
 
     # 🔹 On simplifie / normalise le texte FR avant la traduction
     story_fr = simplify_french_story(story_fr)
@@ -237,20 +379,7 @@ def generate_story_fr(theme: str, level: int) -> str:
 # ================== ETAPE 2 : TRADUCTION FR -> TUNISIEN (LLM OLLAMA) ==================
 
 
-def build_tunisian_translation_prompt(story_fr: str, level: int) -> str:
-    """
-    Construit un prompt demandant au modèle de TRADUIRE
-    le texte français en arabe dialectal tunisien (dérja tounsi).
-    On donne 1–2 petits exemples pour guider le style.
-    """
-
-    level_desc = (
-        "استعمل جمل قصيرة وبسيطة، مفهومة لطفل عمره 6–7 سنين."
-        if level == 1
-        else "تنجم تستعمل جمل شويّة أطول، أما تبقى بسيطة ومفهومة لطفل 8–10 سنين."
-    )
-
-    prompt = f"""
+TRANSLATION_SYSTEM_PROMPT = """
 أنت مترجم محترف من الفرنسية إلى العربية الدارجة التونسية (دَرجة تونسية) لصالح قصص أطفال.
 
 مثال 1:
@@ -265,13 +394,8 @@ def build_tunisian_translation_prompt(story_fr: str, level: int) -> str:
 النسخة بالدارجة التونسية للأطفال:
 "مّو قالتلو: ما تخافش، باش نلقاو حل مع بعضنا."
 
-الآن، ترجم النص التالي إلى الدارجة التونسية للأطفال.
+ترجم كل نص يجيك إلى الدارجة التونسية للأطفال.
 حافظ على نفس معنى القصة ونفس ترتيب الأحداث، لكن استعمل تعابير تونسية بسيطة.
-{level_desc}
-
-النص بالفرنسية لترجمته:
-\"\"\"{story_fr.strip()}\"\"\"
-
 
 تعليمات مهمة:
 - استعمل حروف عربية فقط، بدون كتابة بالحروف اللاتينية.
@@ -280,23 +404,83 @@ def build_tunisian_translation_prompt(story_fr: str, level: int) -> str:
 - خلي الأسلوب دافي وبسيط، وكأنك تحكي لطفل صغير.
 - جاوب فقط بالنص المترجَم، بدون أي تفسير أو تعليق زائد.
 """
-    return prompt
 
 
-def translate_story_fr_to_tunisian(story_fr: str, level: int) -> str:
+def build_tunisian_translation_messages(story_fr: str, level: int) -> List[Dict[str, str]]:
+    """
+    Messages demandant au modèle de TRADUIRE le texte français
+    en arabe dialectal tunisien (dérja tounsi).
+    Les exemples et les consignes sont dans le message "system" fixe ;
+    le message "user" ne contient que le niveau et le texte à traduire.
+    """
+
+    level_desc = (
+        "استعمل جمل قصيرة وبسيطة، مفهومة لطفل عمره 6–7 سنين."
+        if level == 1
+        else "تنجم تستعمل جمل شويّة أطول، أما تبقى بسيطة ومفهومة لطفل 8–10 سنين."
+    )
+
+    user = f"""{level_desc}
+
+النص بالفرنسية لترجمته:
+\"\"\"{story_fr.strip()}\"\"\"
+"""
+
+    return [
+        {"role": "system", "content": TRANSLATION_SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
+
+
+async def translate_story_fr_to_tunisian(story_fr: str, level: int) -> str:
     """
     Utilise Ollama comme traducteur FR -> Tounsi.
+    Les phrases déjà présentes dans la mémoire de traduction ne passent pas
+    par le LLM ; si aucune n'est connue, toute l'histoire est traduite d'un coup.
+    Une phrase inconnue qui reste sans traduction après les nouveaux essais :
+    toute l'histoire est retraduite d'un coup (histoire de secours si cela
+    échoue aussi), jamais d'histoire à trou.
     Ensuite applique quelques remplacements et ajoute une morale si absente.
     """
-    prompt = build_tunisian_translation_prompt(story_fr, level)
-    story_tn = call_ollama(prompt)
+    sentences = split_sentences(story_fr)
+    known = [TRANSLATION_MEMORY.lookup(s) for s in sentences]
+
+    if not any(known):
+        messages = build_tunisian_translation_messages(story_fr, level)
+        story_tn = await call_ollama(messages, "translation")
+        return finalize_tunisian_story(story_tn)
+
+    # seules les phrases inconnues partent au LLM, en parallèle
+    sentences_tn = list(known)
+    missing = [i for i, tn in enumerate(known) if tn is None]
+    translated = await asyncio.gather(
+        *(translate_sentence_with_retry(sentences[i], level) for i in missing)
+    )
+    for i, sentence_tn in zip(missing, translated):
+        sentences_tn[i] = sentence_tn
+
+    if not all(sentences_tn):
+        print("[story] phrase(s) sans traduction, traduction de toute l'histoire")
+        messages = build_tunisian_translation_messages(story_fr, level)
+        return finalize_tunisian_story(await call_ollama(messages, "translation"))
+
+    return finalize_tunisian_story("\n".join(sentences_tn))
+
 
+def split_sentences(story_fr: str) -> List[str]:
+    """
+    Découpe l'histoire française en phrases (une par ligne).
+    """
+    return [line.strip() for line in story_fr.split("\n") if line.strip()]
+
+
+def finalize_tunisian_story(story_tn: str) -> str:
+    """
+    Remplace une réponse vide par l'histoire de secours,
+    sinon applique les remplacements et ajoute une morale si absente.
+    """
     if not story_tn.strip():
-        story_tn = (
-            "نهار من نهارات، كان فمّة طفل صغير يحب برشا عايلتو وصحابو. "
-            "في نهار صارلو موقف صغير، تعلّم منّو كيفاش يكون صبور ويحترم الناس اللي يحبّوه.\n"
-            "العبرة: ديما نتعلّموا من الحكايات و نولّيو أحسن شوية شوية."
-        )
+        story_tn = FALLBACK_STORY_TN
     else:
         text = story_tn.strip()
 
@@ -315,24 +499,38 @@ def translate_story_fr_to_tunisian(story_fr: str, level: int) -> str:
 # ================== FONCTIONS PRINCIPALES APPELEES PAR main.py ==================
 
 
-def generate_story_with_llm(theme: str, level: int) -> str:
+async def generate_story_with_llm(
+    theme: str, level: int, mode: Optional[str] = None
+) -> str:
     """
     Pipeline complet :
     1) Générer une histoire en FRANÇAIS SIMPLE avec le LLM (Ollama)
     2) Traduire cette histoire en TUNISIEN (dérja) avec un second appel LLM
     Retourne seulement la version tunisienne.
+    `mode` surcharge STORY_PIPELINE_MODE ("sequential" ou "pipeline").
     """
-    story_fr = generate_story_fr(theme, level)
-    story_tn = translate_story_fr_to_tunisian(story_fr, level)
-    return story_tn
+    return (await generate_story_with_llm_bilingual(theme, level, mode))["tn"]
 
 
-def generate_story_with_llm_bilingual(theme: str, level: int) -> Dict[str, str]:
+async def generate_story_with_llm_bilingual(
+    theme: str, level: int, mode: Optional[str] = None
+) -> Dict[str, str]:
     """
     Même pipeline, mais retourne l'histoire en FRANÇAIS et en TUNISIEN.
     """
-    story_fr = generate_story_fr(theme, level)
-    story_tn = translate_story_fr_to_tunisian(story_fr, level)
+    mode = mode or STORY_PIPELINE_MODE
+    if mode == "pipeline":
+        return await generate_story_with_llm_pipelined(theme, level)
+    if mode == "single":
+        report_stage("bilingual_generation")
+        stories = await generate_story_with_llm_single_call(theme, level)
+        if stories is not None:
+            return stories
+
+    report_stage("fr_generation")
+    story_fr = await generate_story_fr(theme, level)
+    report_stage("translation")
+    story_tn = await translate_story_fr_to_tunisian(story_fr, level)
 
     return {
         "fr": story_fr,
@@ -340,15 +538,351 @@ def generate_story_with_llm_bilingual(theme: str, level: int) -> Dict[str, str]:
     }
 
 
+# ================== MODE PIPELINE : TRADUCTION PHRASE PAR PHRASE ==================
+
+
+async def iter_french_sentences(theme: str, level: int) -> AsyncIterator[str]:
+    """
+    Génère l'histoire en français en streaming (dans le budget du niveau)
+    et renvoie chaque phrase, déjà simplifiée, dès que sa ligne est terminée.
+    Si le modèle ne répond pas, renvoie les phrases de l'histoire de secours.
+    """
+    budget = get_level_budget(level)
+    chunks = stream_within_budget(
+        stream_ollama(build_french_messages(theme, level), budget["num_predict"]),
+        budget["max_sentences"],
+        budget["max_chars"],
+    )
+
+    produced = False
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            sentence = simplify_french_story(line)
+            if sentence:
+                produced = True
+                yield sentence
+
+    sentence = simplify_french_story(buffer)
+    if sentence:
+        produced = True
+        yield sentence
+
+    if not produced:
+        for sentence in finalize_french_story("").split("\n"):
+            yield sentence
+
+
+async def translate_sentence_fr_to_tunisian(sentence_fr: str, level: int) -> str:
+    """
+    Traduit UNE phrase française en tunisien (sans post-traitement) :
+    d'abord via la mémoire de traduction, sinon via le LLM.
+    Renvoie une chaîne vide si l'appel échoue.
+    """
+    known = TRANSLATION_MEMORY.lookup(sentence_fr)
+    if known is not None:
+        return known
+    return await translate_sentence_with_llm(sentence_fr, level)
+
+
+async def translate_sentence_with_llm(sentence_fr: str, level: int) -> str:
+    """
+    Traduit UNE phrase avec le LLM, en flux arrêté à la fin de la première ligne.
+    Une réponse plus longue que SENTENCE_TRANSLATION_MAX_RATIO fois la phrase
+    est coupée dès qu'elle dépasse, et compte comme un échec.
+    Une traduction valide est ajoutée à la mémoire de traduction.
+    Renvoie une chaîne vide si l'appel échoue.
+    """
+    max_chars = int(SENTENCE_TRANSLATION_MAX_RATIO * len(sentence_fr)) + 20
+    chunks = stream_within_budget(
+        stream_ollama(build_tunisian_translation_messages(sentence_fr, level), None, "translation"),
+        1,
+        max_chars,
+    )
+    sentence_tn = ""
+    async for chunk in chunks:
+        sentence_tn += chunk
+    if len(sentence_tn) >= max_chars:
+        print(f"[story] traduction trop longue, abandonnée : {sentence_fr!r}")
+        return ""
+
+    sentence_tn = sentence_tn.strip()
+    if sentence_tn:
+        TRANSLATION_MEMORY.learn(sentence_fr, sentence_tn)
+    return sentence_tn
+
+
+async def translate_sentence_with_retry(sentence_fr: str, level: int) -> str:
+    """
+    Traduction d'une phrase : mémoire de traduction, sinon LLM
+    avec SENTENCE_TRANSLATION_RETRIES nouvel(s) essai(s) si la traduction échoue.
+    Renvoie une chaîne vide si tous les essais ont échoué.
+    """
+    sentence_tn = await translate_sentence_fr_to_tunisian(sentence_fr, level)
+    for _ in range(SENTENCE_TRANSLATION_RETRIES):
+        if sentence_tn:
+            break
+        print(f"[story] traduction de phrase ratée, nouvel essai : {sentence_fr!r}")
+        sentence_tn = await translate_sentence_with_llm(sentence_fr, level)
+    return sentence_tn
+
+
+async def generate_story_with_llm_pipelined(theme: str, level: int) -> Dict[str, str]:
+    """
+    Pipeline en flux :
+    1) Chaque phrase FR terminée est envoyée tout de suite en traduction,
+       pendant que le modèle continue d'écrire les suivantes
+    2) Les traductions tournent en parallèle (dans la limite de l'ordonnanceur)
+    3) Les phrases sont remises dans l'ordre puis post-traitées
+    La latence totale tend vers celle de l'étape la plus lente
+    au lieu de la somme des deux. Une phrase qui reste sans traduction
+    après les nouveaux essais donne l'histoire de secours
+    (is_fallback_story, comme stream_story_with_llm) : pas d'histoire à trou.
+
+    Gagne quand le modèle traduit une phrase par une phrase : 30 requêtes,
+    concurrence 1, 50 tokens/s, TTFT 0.2 s (bench_llm --tokens-per-second 50 --ttft 0.2),
+    p50 1.00 s contre 1.19 s en "sequential" avec --ramble-rate 0 ;
+    avec --ramble-rate 0.3, p50 1.05 s contre 1.20 s mais p95 2.1 s contre 1.5 s
+    (phrases retraduites).
+    """
+    sentences_fr: List[str] = []
+    tasks = []
+    report_stage("fr_generation")
+    try:
+        async for sentence in iter_french_sentences(theme, level):
+            sentences_fr.append(sentence)
+            tasks.append(
+                asyncio.create_task(translate_sentence_with_retry(sentence, level))
+            )
+
+        report_stage("translation")
+        # on garde l'ordre des phrases
+        sentences_tn = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if all(sentences_tn):
+        story_tn = "\n".join(sentences_tn)
+    else:
+        missing = sum(1 for t in sentences_tn if not t)
+        print(f"[story] {missing} phrase(s) sans traduction, histoire de secours")
+        story_tn = ""
+
+    return {
+        "fr": "\n".join(sentences_fr),
+        "tn": finalize_tunisian_story(story_tn),
+    }
+
+
+# ================== MODE UNE PASSE : FR + TUNISIEN EN UN SEUL APPEL ==================
+
+# Compteurs pour comparer les modes (exposés par /api/llm/stats)
+SINGLE_CALL_STATS = {"ok": 0, "invalid": 0}
+
+
+BILINGUAL_SYSTEM_PROMPT = f"""
+Tu es un auteur d'histoires pour enfants, et tu traduis aussi tes histoires
+en dialecte tunisien (dérja tounsi).
+
+HISTOIRE :
+- Respecte le thème, le niveau et le nombre de phrases demandés.
+- Chaque phrase fait 15 mots MAXIMUM.
+- Début, petit problème, solution + petite morale positive.
+- Pas de violence, pas de sujets adultes, pas de dialogues compliqués.
+- Français TRÈS SIMPLE, temps simples.
+
+VOCABULAIRE CONSEILLÉ (exemples) :
+{SIMPLE_FR_VOCAB_HINT}
+
+TRADUCTION DE CHAQUE PHRASE :
+- En dérja tounsi pour les enfants, en lettres arabes seulement, pas en fousha.
+- Exemple : "Il était une fois un enfant qui aimait beaucoup sa famille."
+  -> "نهار من نهارات، كان فمّة طفل صغير يحب برشا عايلتو."
+
+FORMAT DE RÉPONSE (JSON uniquement, rien d'autre) :
+{{"phrases": [{{"fr": "phrase en français", "tn": "نفس الجملة بالتونسي"}}]}}
+"""
+
+
+def build_bilingual_messages(theme: str, level: int) -> List[Dict[str, str]]:
+    """
+    Messages qui demandent l'histoire en français simple ET sa traduction
+    en tunisien, phrase par phrase, au format JSON.
+    """
+    budget = get_level_budget(level)
+    if level == 1:
+        niveau_desc = "Niveau 1 = enfants de 6-7 ans. Phrases très simples, vocabulaire de base."
+    else:
+        niveau_desc = "Niveau 2 = enfants de 8-10 ans. Phrases un peu plus longues, mais toujours simples."
+
+    user = f"""NOUVELLE HISTOIRE :
+- Thème : "{theme}"
+- {niveau_desc}
+- Au plus {budget["max_sentences"]} phrases."""
+
+    return [
+        {"role": "system", "content": BILINGUAL_SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
+
+
+def parse_bilingual_story(text: str, level: int) -> Optional[Dict[str, str]]:
+    """
+    Valide la réponse JSON du mode "single" (contrôles rapides, sans LLM) :
+    liste de paires {"fr", "tn"} non vide, dans le budget du niveau,
+    chaque "tn" ressemblant à une vraie traduction de son "fr".
+    Renvoie {"fr", "tn", "pairs"} (textes post-traités + paires de phrases alignées),
+    ou None si la réponse est invalide.
+    """
+    try:
+        pairs = json.loads(text)["phrases"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    budget = get_level_budget(level)
+    if not isinstance(pairs, list) or not 0 < len(pairs) <= budget["max_sentences"]:
+        return None
+
+    sentences_fr, sentences_tn = [], []
+    for pair in pairs:
+        if not isinstance(pair, dict):
+            return None
+        sentence_fr = simplify_french_story(str(pair.get("fr", "")))
+        sentence_tn = str(pair.get("tn", "")).strip()
+        if "\n" in sentence_fr or not is_valid_translation(sentence_fr, sentence_tn):
+            return None
+        sentences_fr.append(sentence_fr)
+        sentences_tn.append(sentence_tn)
+
+    return {
+        "fr": "\n".join(sentences_fr),
+        "tn": finalize_tunisian_story("\n".join(sentences_tn)),
+        "pairs": list(zip(sentences_fr, sentences_tn)),
+    }
+
+
+async def generate_story_with_llm_single_call(
+    theme: str, level: int
+) -> Optional[Dict[str, str]]:
+    """
+    Mode "single" : un seul appel LLM (une seule évaluation de prompt)
+    pour les deux versions. Renvoie None si la réponse ne passe pas
+    la validation : l'appelant repasse alors par les deux étapes.
+    """
+    options = dict(GENERATION_OPTIONS)
+    options["num_predict"] = 2 * get_level_budget(level)["num_predict"]
+
+    try:
+        text = await llm_gateway.chat(
+            build_bilingual_messages(theme, level),
+            "story",
+            options,
+            format="json",
+            cacheable=lambda t: parse_bilingual_story(t, level) is not None,
+        )
+    except LLMError as e:
+        print(f"[ERROR] Appel Ollama échoué: {e}")
+        text = ""
+
+    stories = parse_bilingual_story(text, level)
+    if stories is None:
+        SINGLE_CALL_STATS["invalid"] += 1
+        print("[story] réponse bilingue invalide, retour aux deux étapes")
+        return None
+
+    SINGLE_CALL_STATS["ok"] += 1
+    for sentence_fr, sentence_tn in stories.pop("pairs"):
+        TRANSLATION_MEMORY.learn(sentence_fr, sentence_tn)
+    return stories
+
+
+async def stream_story_with_llm(theme: str, level: int) -> AsyncIterator[Dict[str, str]]:
+    """
+    Variante streaming du pipeline, dans la limite du budget du niveau :
+    1) Génère l'histoire en FRANÇAIS en coupant le flux dès que le budget est atteint
+    2) Traduit en TUNISIEN en relayant le texte au fur et à mesure
+
+    Produit des événements :
+    - {"type": "token", "text": ...} pour chaque morceau de texte tunisien
+    - {"type": "done", "story": ..., "fallback": ...} à la fin, avec l'histoire
+      post-traitée ("fallback" vrai si une étape a dû utiliser l'histoire de secours)
+    Si des phrases sont dans la mémoire de traduction, la traduction se fait
+    phrase par phrase : les phrases connues sont envoyées tout de suite.
+    Une phrase restée sans traduction (après un nouvel essai) donne
+    l'histoire de secours ("fallback" vrai), jamais d'histoire à trou.
+    """
+    budget = get_level_budget(level)
+
+    fr_chunks = stream_ollama(
+        build_french_messages(theme, level), budget["num_predict"], "story"
+    )
+    story_fr = ""
+    async for chunk in stream_within_budget(
+        fr_chunks, budget["max_sentences"], budget["max_chars"]
+    ):
+        story_fr += chunk
+    story_fr = finalize_french_story(story_fr)
+
+    sentences = split_sentences(story_fr)
+    known = [TRANSLATION_MEMORY.lookup(s) for s in sentences]
+    if not any(known):
+        # une seule traduction de toute l'histoire
+        sentences, known = [story_fr], [None]
+
+    story_tn = ""
+    for sentence, sentence_tn in zip(sentences, known):
+        if story_tn:
+            story_tn += "\n"
+            yield {"type": "token", "text": "\n"}
+
+        if sentence_tn is not None:
+            story_tn += sentence_tn
+            yield {"type": "token", "text": sentence_tn}
+            continue
+
+        tn_chunks = stream_ollama(
+            build_tunisian_translation_messages(sentence, level),
+            budget["num_predict"],
+            "translation",
+        )
+        sentence_tn = ""
+        async for chunk in stream_within_budget(
+            tn_chunks, budget["max_sentences"], budget["max_chars"]
+        ):
+            sentence_tn += chunk
+            yield {"type": "token", "text": chunk}
+
+        if len(sentences) > 1 and not sentence_tn.strip():
+            # phrase ratée : nouvel essai, envoyé d'un bloc
+            print(f"[story] traduction de phrase ratée, nouvel essai : {sentence!r}")
+            sentence_tn = await translate_sentence_with_llm(sentence, level)
+            if not sentence_tn:
+                print("[story] phrase sans traduction, histoire de secours")
+                story_tn = ""
+                break
+            yield {"type": "token", "text": sentence_tn}
+        story_tn += sentence_tn
+
+        if len(sentences) > 1 and sentence_tn.strip():
+            TRANSLATION_MEMORY.learn(sentence, sentence_tn)
+
+    story_tn = finalize_tunisian_story(story_tn)
+    yield {
+        "type": "done",
+        "story": story_tn,
+        "fallback": is_fallback_story({"fr": story_fr, "tn": story_tn}),
+    }
+
+
 def apply_replacements(text: str) -> str:
     """
     Applique les remplacements FR -> tounsi sur un texte déjà en arabe/tounsi,
     pour corriger certains bouts qui restent en français.
     """
-    t = text
-    for fr, tn in REPLACEMENTS.items():
-        t = t.replace(fr, tn)
-    return t
+    return TN_REPLACER.replace(text)
 
 
 # ================== TEST LOCAL DANS LE TERMINAL ==================
@@ -358,7 +892,7 @@ if __name__ == "__main__":
     theme = "l'amitié à l'école"
     level = 1  # ou 2
 
-    stories = generate_story_with_llm_bilingual(theme, level)
+    stories = asyncio.run(generate_story_with_llm_bilingual(theme, level))
 
     print("\n================ HISTOIRE EN FRANÇAIS ================")
     print(stories["fr"])
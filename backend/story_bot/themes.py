@@ -0,0 +1,174 @@
+# backend/story_bot/themes.py
+
+"""
+Regroupement des thèmes proches pour la réutilisation et le cache :
+"l'amitié", "L’amitié", "amitie", "les amities" tombent dans le même
+"seau" (même theme_key en base, même clé de réserve / de coalescence).
+
+- la forme canonique vient de normalize_theme (reuse.py) : accents,
+  apostrophes, casse, mots vides, pluriels simples, mots de décor
+  ("L’amitié à l'école" -> "amitie", comme "l'amitié")
+- au-delà de l'égalité exacte, un index MinHash + LSH sur les trigrammes
+  de caractères propose des thèmes déjà vus, puis la similarité exacte
+  (Jaccard) des candidats décide : un thème est retrouvé malgré une faute
+  de frappe ("amitie" / "amitiee", 0.62) mais un mot en plus change
+  le thème ("colere papa" / "colere", 0.5) ; seuil réglable
+  (THEME_SIMILARITY_THRESHOLD), cas de référence dans tests/test_themes.py
+- recherche en une fraction de milliseconde, quel que soit le nombre de thèmes
+"""
+
+import hashlib
+import os
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .reuse import normalize_theme
+
+# ================== CONFIG THEMES PROCHES ==================
+
+# Similarité minimale (Jaccard sur les trigrammes) pour réutiliser
+# le seau d'un thème déjà vu ; 1 = égalité exacte de la forme canonique
+THEME_SIMILARITY_THRESHOLD = float(os.getenv("THEME_SIMILARITY_THRESHOLD", "0.6"))
+
+# Signature MinHash : THEME_LSH_BANDS bandes de THEME_LSH_ROWS valeurs.
+# Deux thèmes deviennent candidats vers une similarité
+# de (1 / BANDS) ** (1 / ROWS) (~0.37 avec 20 x 3, sous le seuil :
+# un thème au seuil est candidat dans plus de 99 % des cas).
+THEME_LSH_BANDS = int(os.getenv("THEME_LSH_BANDS", "20"))
+THEME_LSH_ROWS = int(os.getenv("THEME_LSH_ROWS", "3"))
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """
+    Trigrammes de caractères ("amitie" -> " am", "ami", ...), avec un espace
+    de chaque côté pour que les mots courts aient aussi des trigrammes.
+    """
+    text = f" {text} "
+    return {text[i:i + size] for i in range(max(len(text) - size + 1, 1))}
+
+
+class ThemeIndex:
+    """
+    Forme canonique -> seau (theme_key déjà utilisé en base),
+    plus l'index LSH des signatures pour les recherches approchées.
+    """
+
+    def __init__(
+        self,
+        threshold: float = THEME_SIMILARITY_THRESHOLD,
+        bands: int = THEME_LSH_BANDS,
+        rows: int = THEME_LSH_ROWS,
+    ):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        # bands * rows fonctions de hachage 32 bits : blake2b avec un "salt"
+        # différent par bloc de 16 valeurs (64 octets par digest)
+        self._size = bands * rows
+        self._salts = [i.to_bytes(16, "little") for i in range(-(-self._size // 16))]
+        self._unpack = struct.Struct(f"<{self._size}I").unpack_from
+        self.buckets: Dict[str, str] = {}
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._shingles: Dict[str, Set[str]] = {}
+        self._lsh: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self._lock = threading.Lock()
+        self.exact = 0
+        self.near = 0
+        self.new = 0
+
+    def _hashes(self, shingle: str) -> Tuple[int, ...]:
+        data = shingle.encode("utf-8")
+        digest = b"".join(
+            hashlib.blake2b(data, digest_size=64, salt=salt).digest() for salt in self._salts
+        )
+        return self._unpack(digest)
+
+    def signature(self, canonical: str) -> Tuple[int, ...]:
+        """
+        Signature MinHash : pour chaque fonction de hachage,
+        la plus petite valeur sur les trigrammes du thème.
+        """
+        return tuple(map(min, zip(*map(self._hashes, shingles(canonical)))))
+
+    def _bands(self, signature: Tuple[int, ...]) -> Iterable[Tuple[int, Tuple[int, ...]]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, theme_key: str):
+        """
+        Enregistre un seau existant (theme_key stocké en base, éventuellement
+        normalisé par une ancienne version de normalize_theme).
+        """
+        canonical = normalize_theme(theme_key)
+        if not canonical:
+            return
+        with self._lock:
+            if canonical in self.buckets:
+                return
+            signature = self.signature(canonical)
+            self.buckets[canonical] = theme_key
+            self._signatures[canonical] = signature
+            self._shingles[canonical] = shingles(canonical)
+            for band in self._bands(signature):
+                self._lsh.setdefault(band, set()).add(canonical)
+
+    def closest(self, canonical: str) -> Optional[Tuple[str, float]]:
+        """
+        Forme canonique déjà indexée la plus proche de `canonical`
+        et sa similarité (Jaccard exacte), parmi les candidats LSH.
+        """
+        signature = self.signature(canonical)
+        grams = shingles(canonical)
+        candidates: Set[str] = set()
+        with self._lock:
+            for band in self._bands(signature):
+                candidates |= self._lsh.get(band, set())
+            best, best_score = None, 0.0
+            for candidate in candidates:
+                other = self._shingles[candidate]
+                score = len(grams & other) / len(grams | other)
+                if score > best_score:
+                    best, best_score = candidate, score
+        return (best, best_score) if best is not None else None
+
+    def match(self, theme: str) -> str:
+        """
+        Seau (theme_key) à utiliser pour ce thème : celui d'un thème
+        identique ou assez proche déjà vu, sinon la forme canonique.
+        """
+        canonical = normalize_theme(theme)
+        bucket = self.buckets.get(canonical)
+        if bucket is not None:
+            self.exact += 1
+            return bucket
+        if canonical and self.threshold < 1:
+            found = self.closest(canonical)
+            if found is not None and found[1] >= self.threshold:
+                self.near += 1
+                return self.buckets[found[0]]
+        self.new += 1
+        return canonical
+
+    def load(self, theme_keys: List[str]):
+        for theme_key in theme_keys:
+            if theme_key:
+                self.add(theme_key)
+
+    def stats(self) -> Dict:
+        return {
+            "themes": len(self.buckets),
+            "threshold": self.threshold,
+            "exact": self.exact,
+            "near": self.near,
+            "new": self.new,
+        }
+
+
+THEME_INDEX = ThemeIndex()
+
+
+def theme_bucket(theme: str) -> str:
+    """
+    Raccourci : seau du thème dans THEME_INDEX.
+    """
+    return THEME_INDEX.match(theme)
@@ -0,0 +1,211 @@
+# backend/story_bot/translation_memory.py
+
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+# ================== CONFIG MEMOIRE DE TRADUCTION ==================
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+# Paires FR -> tounsi validées par nos linguistes
+TM_PAIRS_PATH = Path(os.getenv("TM_PAIRS_PATH", DATA_DIR / "fr_tn_pairs.jsonl"))
+
+# Paires apprises à partir des traductions du LLM (ajoutées au fil de l'eau)
+TM_LEARNED_PATH = Path(os.getenv("TM_LEARNED_PATH", DATA_DIR / "fr_tn_learned.jsonl"))
+
+# Similarité minimale (coefficient de Dice sur les trigrammes de caractères)
+# pour qu'une phrase connue soit candidate à une correspondance approximative ;
+# elle n'est acceptée que si elle a exactement les mêmes mots (voir _fuzzy_lookup)
+TM_FUZZY_THRESHOLD = float(os.getenv("TM_FUZZY_THRESHOLD", "0.85"))
+
+# Taille des n-grammes de caractères de l'index approximatif
+TM_NGRAM_SIZE = 3
+
+_ARABIC_RE = re.compile(r"[؀-ۿ]")
+_LATIN_RE = re.compile(r"[A-Za-zÀ-ÿ]")
+
+
+def normalize_sentence(text: str) -> str:
+    """
+    Forme normalisée d'une phrase : minuscules, sans accents,
+    sans ponctuation (apostrophes comprises), espaces simplifiés.
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[\W_]+", " ", text)
+    return text.strip()
+
+
+def char_ngrams(normalized: str, n: int = TM_NGRAM_SIZE) -> Set[str]:
+    padded = f" {normalized} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+def is_valid_translation(sentence_fr: str, sentence_tn: str) -> bool:
+    """
+    Contrôle rapide d'une traduction LLM avant de l'apprendre :
+    une seule ligne, majoritairement en lettres arabes,
+    longueur comparable à la phrase française.
+    """
+    tn = sentence_tn.strip()
+    if not tn or "\n" in tn or "العبرة" in tn:
+        return False
+
+    arabic = len(_ARABIC_RE.findall(tn))
+    latin = len(_LATIN_RE.findall(tn))
+    if arabic == 0 or latin > arabic * 0.2:
+        return False
+
+    ratio = len(tn) / max(len(sentence_fr.strip()), 1)
+    return 0.3 <= ratio <= 3.0
+
+
+class TranslationMemory:
+    """
+    Mémoire de traduction FR -> tounsi, phrase par phrase :
+    - correspondance exacte sur le texte brut
+    - correspondance exacte sur la forme normalisée
+    - correspondance approximative via un index inversé de trigrammes,
+      limitée aux phrases qui ont les mêmes mots (ordre, répétitions)
+    """
+
+    def __init__(self, fuzzy_threshold: float = TM_FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.exact: Dict[str, str] = {}
+        self.normalized: Dict[str, str] = {}
+        # pour l'index approximatif : une entrée par forme normalisée
+        self.entry_keys: List[str] = []
+        self.entry_sizes: List[int] = []
+        self.index: Dict[str, List[int]] = {}
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.fuzzy_rejected = 0
+        self.misses = 0
+        self.learned = 0
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    def add(self, sentence_fr: str, sentence_tn: str):
+        sentence_fr = sentence_fr.strip()
+        sentence_tn = sentence_tn.strip()
+        self.exact[sentence_fr] = sentence_tn
+
+        key = normalize_sentence(sentence_fr)
+        if not key:
+            return
+        if key not in self.normalized:
+            grams = char_ngrams(key)
+            entry_id = len(self.entry_keys)
+            self.entry_keys.append(key)
+            self.entry_sizes.append(len(grams))
+            for gram in grams:
+                self.index.setdefault(gram, []).append(entry_id)
+        self.normalized[key] = sentence_tn
+
+    def lookup(self, sentence_fr: str) -> Optional[str]:
+        """
+        Renvoie la traduction connue de la phrase, ou None.
+        """
+        sentence_fr = sentence_fr.strip()
+        found = self.exact.get(sentence_fr)
+
+        key = normalize_sentence(sentence_fr)
+        if found is None and key:
+            found = self.normalized.get(key)
+        if found is not None:
+            self.exact_hits += 1
+            return found
+
+        found = self._fuzzy_lookup(key) if key else None
+        if found is not None:
+            self.fuzzy_hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def _fuzzy_lookup(self, key: str) -> Optional[str]:
+        """
+        Phrase connue proche (Dice >= fuzzy_threshold) ET avec le même ensemble
+        de mots : la traduction d'une phrase qui diffère par un nom
+        ("Amin" / "Amina") ou une négation ("ne ... pas") serait fausse,
+        ces phrases partent au LLM.
+        """
+        grams = char_ngrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.index.get(gram, ()))
+        if not shared:
+            return None
+
+        words = set(key.split())
+        close = False
+        for entry_id, count in shared.items():
+            score = 2 * count / (len(grams) + self.entry_sizes[entry_id])
+            if score < self.fuzzy_threshold:
+                continue
+            close = True
+            if set(self.entry_keys[entry_id].split()) == words:
+                return self.normalized[self.entry_keys[entry_id]]
+
+        if close:
+            self.fuzzy_rejected += 1
+        return None
+
+    def learn(self, sentence_fr: str, sentence_tn: str) -> bool:
+        """
+        Ajoute une traduction LLM validée à la mémoire
+        et l'enregistre dans TM_LEARNED_PATH.
+        """
+        if not is_valid_translation(sentence_fr, sentence_tn):
+            return False
+        if normalize_sentence(sentence_fr) in self.normalized:
+            return False
+
+        self.add(sentence_fr, sentence_tn)
+        self.learned += 1
+        try:
+            with open(TM_LEARNED_PATH, "a", encoding="utf-8") as f:
+                pair = {"fr": sentence_fr.strip(), "tn": sentence_tn.strip()}
+                f.write(json.dumps(pair, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[TM] impossible d'enregistrer la paire apprise : {e}")
+        return True
+
+    def load_jsonl(self, path: Path):
+        if not path.exists():
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                pair = json.loads(line)
+                self.add(pair["fr"], pair["tn"])
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self),
+            "exact_hits": self.exact_hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "fuzzy_rejected": self.fuzzy_rejected,
+            "misses": self.misses,
+            "learned": self.learned,
+        }
+
+
+def load_translation_memory() -> TranslationMemory:
+    memory = TranslationMemory()
+    memory.load_jsonl(TM_PAIRS_PATH)
+    memory.load_jsonl(TM_LEARNED_PATH)
+    print(f"[TM] mémoire de traduction chargée : {len(memory)} phrases")
+    return memory
+
+
+# Chargée une seule fois, à l'import (démarrage de l'application)
+TRANSLATION_MEMORY = load_translation_memory()
@@ -0,0 +1,7 @@
+# backend/tests/conftest.py
+
+import sys
+from pathlib import Path
+
+# les modules du backend s'importent depuis backend/ (comme "uvicorn main:app")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
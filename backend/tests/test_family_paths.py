@@ -0,0 +1,76 @@
+# backend/tests/test_family_paths.py
+
+import pytest
+
+from family_llm_service import EMPTY
+from family_paths import PathFinder, labyrinth_metrics
+from family_procedural import generate_procedural_labyrinth
+
+# une case libre enfermée par des murs : (6, 6)
+CLOSED_GRID = [
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 1, 1, 0, 2, 0, 0],
+    [0, 0, 1, 0, 0, 0, 0],
+    [2, 0, 0, 0, 1, 1, 0],
+    [0, 0, 1, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0, 1, 1],
+    [0, 0, 0, 0, 0, 1, 0],
+]
+
+LABYRINTHS = [("closed", CLOSED_GRID, [0, 0])] + [
+    (f"proc-{difficulty}-{seed}", grid, start)
+    for difficulty in (1, 2, 3)
+    for seed in range(5)
+    for grid, start, _ in [generate_procedural_labyrinth(difficulty, seed)]
+]
+
+
+def assert_valid_path(grid, start, goal, path):
+    assert path[0] == list(start) and path[-1] == list(goal)
+    for (r1, c1), (r2, c2) in zip(path, path[1:]):
+        assert abs(r1 - r2) + abs(c1 - c2) == 1
+        assert grid[r2][c2] == EMPTY
+
+
+@pytest.mark.parametrize("lab_id, grid, start", LABYRINTHS, ids=[lab[0] for lab in LABYRINTHS])
+def test_algorithms_agree(lab_id, grid, start):
+    finder = PathFinder()
+    for r in range(len(grid)):
+        for c in range(len(grid[0])):
+            goal = [r, c]
+            member = f"{r}-{c}"
+            paths = {
+                algo: finder.find(lab_id, grid, start, goal, member, algo)["path"]
+                for algo in ("bfs", "dfs", "astar")
+            }
+
+            # même verdict d'accessibilité pour les trois algorithmes
+            assert len({bool(path) for path in paths.values()}) == 1, goal
+            if not paths["bfs"]:
+                continue
+            for path in paths.values():
+                assert_valid_path(grid, start, goal, path)
+            # A* est optimal, comme BFS ; DFS peut faire plus long
+            assert len(paths["astar"]) == len(paths["bfs"])
+            assert len(paths["dfs"]) >= len(paths["bfs"])
+
+
+def test_closed_cell_is_unreachable():
+    result = PathFinder().find("closed", CLOSED_GRID, [0, 0], [6, 6], "x", "astar")
+    assert result["path"] == []
+
+
+def test_metrics_match_bfs_paths():
+    grid, start, targets = generate_procedural_labyrinth(3, 7)
+    metrics = labyrinth_metrics(grid, start, targets)
+    finder = PathFinder()
+    for member_id, info in targets.items():
+        path = finder.find("metrics", grid, start, info["pos"], member_id, "bfs")["path"]
+        assert metrics["path_lengths"][member_id] == len(path)
+
+
+def test_paths_are_memoized():
+    finder = PathFinder()
+    first = finder.find("closed", CLOSED_GRID, [0, 0], [6, 0], "a", "bfs")
+    assert finder.find("closed", CLOSED_GRID, [0, 0], [6, 0], "a", "bfs") is first
+    assert finder.stats()["hits"] == 1
@@ -0,0 +1,37 @@
+# backend/tests/test_family_procedural.py
+
+import pytest
+
+from family_llm_service import DANGER, EMPTY, WALL, distance_field
+from family_procedural import DIFFICULTY_RULES, generate_procedural_labyrinth
+
+SEEDS = range(50)
+
+
+@pytest.mark.parametrize("difficulty", [1, 2, 3])
+def test_same_seed_same_labyrinth(difficulty):
+    assert generate_procedural_labyrinth(difficulty, 42) == generate_procedural_labyrinth(difficulty, 42)
+
+
+def test_different_seeds_differ():
+    grids = {str(generate_procedural_labyrinth(2, seed)[0]) for seed in SEEDS}
+    assert len(grids) > 1
+
+
+@pytest.mark.parametrize("difficulty", [1, 2, 3])
+def test_difficulty_contracts(difficulty):
+    rules = DIFFICULTY_RULES[difficulty]
+    for seed in SEEDS:
+        grid, start, targets = generate_procedural_labyrinth(difficulty, seed)
+        cells = [v for row in grid for v in row]
+
+        assert rules["walls"][0] <= cells.count(WALL) <= rules["walls"][1]
+        assert rules["dangers"][0] <= cells.count(DANGER) <= rules["dangers"][1]
+        assert grid[start[0]][start[1]] == EMPTY
+        assert rules["targets"][0] <= len(targets) <= rules["targets"][1]
+
+        dist = distance_field(grid, tuple(start))["dist"]
+        for info in targets.values():
+            pos = tuple(info["pos"])
+            assert pos in dist, f"cible inaccessible (seed={seed})"
+            assert dist[pos] + 1 >= rules["min_path"], f"chemin trop court (seed={seed})"
@@ -0,0 +1,31 @@
+# backend/tests/test_multi_replace.py
+
+from multi_replace import MultiReplacer
+
+TEXT = "Il est un peu inquiet, puis très inquiet."
+
+
+def test_leftmost_longest_on_overlapping_keys():
+    replacer = MultiReplacer({"inquiet": "A", "un peu inquiet": "B"})
+    assert replacer.replace(TEXT) == "Il est B, puis très A."
+
+
+def test_result_does_not_depend_on_dictionary_order():
+    forward = MultiReplacer({"inquiet": "A", "un peu inquiet": "B"})
+    backward = MultiReplacer({"un peu inquiet": "B", "inquiet": "A"})
+    assert forward.replace(TEXT) == backward.replace(TEXT)
+
+
+def test_prefix_names():
+    replacer = MultiReplacer({"Amin": "X", "Amina": "Y"})
+    assert replacer.replace("Amina et Amin") == "Y et X"
+
+
+def test_replaced_text_is_not_scanned_again():
+    replacer = MultiReplacer({"a": "b", "b": "c"})
+    assert replacer.replace("ab") == "bc"
+
+
+def test_ignore_case_keeps_initial_capital():
+    replacer = MultiReplacer({"amin": "salem"}, ignore_case=True)
+    assert replacer.replace("Amin et amin") == "Salem et salem"
@@ -0,0 +1,81 @@
+# backend/tests/test_story_translation.py
+
+"""
+Une phrase sans traduction ne doit jamais disparaître de l'histoire :
+nouvel essai, puis traduction de toute l'histoire ou histoire de secours.
+"""
+
+import asyncio
+
+import pytest
+
+from story_bot import service, translation_memory
+from story_bot.service import FALLBACK_STORY_TN
+
+KNOWN_FR = "Amin se réveille, c'est son premier jour d'école."
+KNOWN_TN = "فاق أمين، هذا أوّل نهار مدرسة."
+UNKNOWN_FR = "Il joue avec son ballon rouge."
+STORY_FR = f"{KNOWN_FR}\n{UNKNOWN_FR}"
+WHOLE_TN = "فاق أمين.\nيلعب بالكورة الحمراء."
+
+
+@pytest.fixture(autouse=True)
+def memory(monkeypatch, tmp_path):
+    monkeypatch.setattr(translation_memory, "TM_LEARNED_PATH", tmp_path / "learned.jsonl")
+    memory = translation_memory.TranslationMemory()
+    memory.add(KNOWN_FR, KNOWN_TN)
+    monkeypatch.setattr(service, "TRANSLATION_MEMORY", memory)
+    return memory
+
+
+@pytest.fixture
+def failing_sentence(monkeypatch):
+    calls = []
+
+    async def translate_sentence_with_llm(sentence_fr, level):
+        calls.append(sentence_fr)
+        return ""
+
+    monkeypatch.setattr(service, "translate_sentence_with_llm", translate_sentence_with_llm)
+    return calls
+
+
+def test_story_retranslated_whole_when_a_sentence_fails(monkeypatch, failing_sentence):
+    whole_calls = []
+
+    async def call_ollama(messages, call_type="story"):
+        whole_calls.append(messages[-1]["content"])
+        return WHOLE_TN
+
+    monkeypatch.setattr(service, "call_ollama", call_ollama)
+    story_tn = asyncio.run(service.translate_story_fr_to_tunisian(STORY_FR, 1))
+
+    assert failing_sentence == [UNKNOWN_FR] * (1 + service.SENTENCE_TRANSLATION_RETRIES)
+    assert len(whole_calls) == 1 and UNKNOWN_FR in whole_calls[0]
+    assert "الكورة" in story_tn
+
+
+def test_story_falls_back_when_whole_translation_fails(monkeypatch, failing_sentence):
+    async def call_ollama(messages, call_type="story"):
+        return ""
+
+    monkeypatch.setattr(service, "call_ollama", call_ollama)
+    story_tn = asyncio.run(service.translate_story_fr_to_tunisian(STORY_FR, 1))
+    assert story_tn == FALLBACK_STORY_TN
+
+
+def test_stream_reports_fallback_when_a_sentence_fails(monkeypatch, failing_sentence):
+    async def stream_ollama(messages, num_predict=None, call_type="story"):
+        if call_type == "story":
+            yield STORY_FR
+        # traduction : flux vide (Ollama a lâché)
+
+    monkeypatch.setattr(service, "stream_ollama", stream_ollama)
+
+    async def collect():
+        return [event async for event in service.stream_story_with_llm("l'école", 1)]
+
+    done = asyncio.run(collect())[-1]
+    assert failing_sentence == [UNKNOWN_FR]
+    assert done["fallback"] is True
+    assert done["story"] == FALLBACK_STORY_TN
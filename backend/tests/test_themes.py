@@ -0,0 +1,63 @@
+# backend/tests/test_themes.py
+
+"""
+Cas de référence du regroupement des thèmes (story_bot/themes.py) :
+THEME_SIMILARITY_THRESHOLD et les mots de décor sont réglés sur cette liste.
+"""
+
+import pytest
+
+from story_bot.reuse import normalize_theme
+from story_bot.themes import ThemeIndex
+
+# thèmes déjà en base
+KNOWN_THEMES = ["amitie", "colere", "plage", "souk", "famille", "courage", "ecole"]
+
+# (thème tapé, seau attendu)
+SAME_BUCKET = [
+    ("l'amitié", "amitie"),
+    ("L’amitié à l'école", "amitie"),
+    ("amitie", "amitie"),
+    ("les amitiés", "amitie"),
+    ("amitiee", "amitie"),
+    ("La colère", "colere"),
+    ("la colere !", "colere"),
+    ("À la plage", "plage"),
+    ("le souk", "souk"),
+    ("l'école", "ecole"),
+    ("Le courrage", "courage"),
+]
+
+# thèmes qui doivent ouvrir un nouveau seau
+NEW_BUCKET = [
+    "la colère de papa",
+    "la famille de Lina",
+    "le chat",
+    "la mer",
+    "le marché",
+]
+
+
+@pytest.fixture
+def index():
+    index = ThemeIndex()
+    index.load(KNOWN_THEMES)
+    return index
+
+
+def test_normalize_theme():
+    assert normalize_theme("L’Amitié  à l'école !") == "amitie"
+    assert normalize_theme("La colère de papa") == "colere papa"
+    assert normalize_theme("l'école") == "ecole"
+    assert normalize_theme("de la") == "de la"
+
+
+@pytest.mark.parametrize("theme, bucket", SAME_BUCKET)
+def test_same_bucket(index, theme, bucket):
+    assert index.match(theme) == bucket
+
+
+@pytest.mark.parametrize("theme", NEW_BUCKET)
+def test_new_bucket(index, theme):
+    assert index.match(theme) == normalize_theme(theme)
+    assert index.match(theme) not in KNOWN_THEMES
@@ -0,0 +1,40 @@
+# backend/tests/test_translation_memory.py
+
+import pytest
+
+from story_bot.translation_memory import TranslationMemory
+
+KNOWN_FR = "Amin se réveille, c'est son premier jour d'école."
+KNOWN_TN = "فاق أمين، هذا أوّل نهار مدرسة."
+
+
+@pytest.fixture
+def memory():
+    memory = TranslationMemory()
+    memory.add(KNOWN_FR, KNOWN_TN)
+    memory.add("Lina aime jouer au parc avec son chat.", "لينا تحب تلعب في الجنينة مع قطوسها.")
+    return memory
+
+
+def test_exact_and_normalized_hits(memory):
+    assert memory.lookup(KNOWN_FR) == KNOWN_TN
+    assert memory.lookup("amin se reveille  c est son premier jour d ecole") == KNOWN_TN
+
+
+@pytest.mark.parametrize(
+    "sentence",
+    [
+        "Amina se réveille, c'est son premier jour d'école.",
+        "Amin ne se réveille pas, c'est son premier jour d'école.",
+        "Lina n'aime pas jouer au parc avec son chat.",
+    ],
+)
+def test_fuzzy_rejects_different_words(memory, sentence):
+    assert memory.lookup(sentence) is None
+    assert memory.stats()["fuzzy_rejected"] == 1
+
+
+def test_fuzzy_accepts_same_words(memory):
+    # mêmes mots, répétition en plus
+    assert memory.lookup("Amin se réveille, c'est son son premier jour d'école.") == KNOWN_TN
+    assert memory.stats()["fuzzy_hits"] == 1
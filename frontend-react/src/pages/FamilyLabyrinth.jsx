@@ -5,6 +5,17 @@ import "./GameStyle.css";
 
 const API = "http://127.0.0.1:8000";
 
+// identifiant de session (par onglet) : le serveur évite de resservir
+// un labyrinthe déjà joué dans la session
+function getSessionId() {
+  let id = sessionStorage.getItem("familySessionId");
+  if (!id) {
+    id = Math.random().toString(36).slice(2) + Date.now().toString(36);
+    sessionStorage.setItem("familySessionId", id);
+  }
+  return id;
+}
+
 export default function FamilyLabyrinth() {
   // --- état principal du labyrinthe ---
   const [grid, setGrid] = useState([]);
@@ -12,6 +23,8 @@ export default function FamilyLabyrinth() {
   const [player, setPlayer] = useState([0, 0]);
 
   const [targets, setTargets] = useState({});
+  // identifiant du labyrinthe côté serveur (pour /api/family-labyrinth/path)
+  const [labyrinthId, setLabyrinthId] = useState(null);
   const [currentTargetId, setCurrentTargetId] = useState(null);
 
   const [difficulty, setDifficulty] = useState(1); // 1,2,3...
@@ -79,7 +92,7 @@ export default function FamilyLabyrinth() {
       console.log("➡️ appel backend:", `/api/family-labyrinth?difficulty=${level}`);
 
       const res = await fetch(
-        `${API}/api/family-labyrinth?difficulty=${level}`
+        `${API}/api/family-labyrinth?difficulty=${level}&session_id=${getSessionId()}`
       );
 
       if (!res.ok) {
@@ -101,6 +114,7 @@ export default function FamilyLabyrinth() {
         throw new Error("La réponse ne contient pas 'targets'.");
       }
 
+      setLabyrinthId(data.labyrinth_id);
       setGrid(data.grid);
       setStart(data.start);
       setPlayer(data.start);
@@ -208,11 +222,11 @@ export default function FamilyLabyrinth() {
   }
 
   async function askPath(algo) {
-    if (!currentTargetId || roundFinished || gameOver) return;
+    if (!labyrinthId || !currentTargetId || roundFinished || gameOver) return;
 
     try {
       setMessage("L'IA réfléchit…");
-      const url = `${API}/api/family-labyrinth/path?member_id=${currentTargetId}&algo=${algo}`;
+      const url = `${API}/api/family-labyrinth/path?labyrinth_id=${labyrinthId}&member_id=${currentTargetId}&algo=${algo}`;
       console.log("➡️ appel backend path:", url);
       const res = await fetch(url);
       if (!res.ok) {
@@ -60,7 +60,7 @@ export default function StoryBotGame() {
       const themeToSend = spokenText.trim() || "famille";
 
       const res = await fetch(
-        "http://127.0.0.1:8000/game/story-bot/generate",
+        "http://127.0.0.1:8000/game/story-bot/generate/stream",
         {
           method: "POST",
           headers: {
@@ -78,16 +78,41 @@ export default function StoryBotGame() {
         throw new Error(data?.detail || "Erreur côté backend");
       }
 
-      const data = await res.json();
-      console.log("Réponse backend:", data);
+      // 🔹 Lecture du flux NDJSON : une ligne JSON par événement
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let partial = "";
+      let finalStory = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+
+          if (event.type === "token") {
+            partial += event.text;
+            setStory(partial);
+          } else if (event.type === "done") {
+            finalStory = event.story;
+          }
+        }
+      }
 
-      if (!data.story) {
+      if (!finalStory) {
         setError("Story not found");
         return;
       }
 
-      setStory(data.story);
-      speak(data.story);
+      setStory(finalStory);
+      speak(finalStory);
     } catch (err) {
       console.error(err);
       setError(err.message || "Erreur inconnue");